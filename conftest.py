@@ -30,3 +30,13 @@ def app(request, admin_user):
     request.addfinalizer(wtm._unpatch_settings)
     # XXX change this admin user to "saploper"
     return OurTestApp(default_user=admin_user.username)
+
+
+@pytest.fixture(autouse=True)
+def limpa_cache_configuracoes():
+    # o cache de AppConfig/CasaLegislativa e o índice de filiações
+    # sobrevivem ao rollback de cada teste
+    from sapl.base.configuracoes import invalida_configuracoes
+    from sapl.parlamentares.filiacoes import invalida_filiacoes
+    invalida_configuracoes()
+    invalida_filiacoes()
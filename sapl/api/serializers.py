@@ -1,6 +1,7 @@
 from rest_framework import serializers
 
-from sapl.base.models import Autor, CasaLegislativa
+from sapl.base.configuracoes import get_casa_legislativa
+from sapl.base.models import Autor
 from sapl.materia.models import MateriaLegislativa
 from sapl.sessao.models import OrdemDia, SessaoPlenaria
 
@@ -170,5 +171,5 @@ class SessaoPlenariaSerializer(serializers.ModelSerializer):
         return self.casa().nome
 
     def casa(self):
-        casa = CasaLegislativa.objects.first()
+        casa = get_casa_legislativa()
         return casa
@@ -1,9 +1,8 @@
-import sapl
-
 from django.http import HttpResponse
 from django.core.urlresolvers import reverse
 from django.views.decorators.clickjacking import xframe_options_exempt
 from django.views.generic import UpdateView
+from sapl.base.configuracoes import get_config_aplicacao
 from sapl.crud.base import RP_DETAIL, RP_LIST, Crud, MasterDetailCrud
 
 from .forms import AudienciaForm, AnexoAudienciaPublicaForm
@@ -75,7 +74,7 @@ class AudienciaCrud(Crud):
 class AudienciaPublicaMixin:
 
     def has_permission(self):
-        app_config = sapl.base.models.AppConfig.objects.last()
+        app_config = get_config_aplicacao()
         if app_config and app_config.documentos_administrativos == 'O':
             return True
 
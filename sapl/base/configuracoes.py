@@ -0,0 +1,68 @@
+"""
+Acesso em cache aos registros únicos de configuração: AppConfig e
+CasaLegislativa.
+
+As instâncias ficam no cache configurado (compartilhado entre os workers)
+até que sejam alteradas ou excluídas, quando os receivers de
+sapl.base.receivers removem a chave correspondente, de imediato e novamente
+após o commit.
+"""
+from collections import Counter
+import logging
+
+from django.core.cache import cache
+
+from sapl.base.models import AppConfig, CasaLegislativa
+
+CHAVE_APPCONFIG = 'base:appconfig'
+CHAVE_CASA_LEGISLATIVA = 'base:casalegislativa'
+
+CHAVES = {AppConfig: CHAVE_APPCONFIG,
+          CasaLegislativa: CHAVE_CASA_LEGISLATIVA}
+
+# acertos e faltas do cache neste processo, para depuração
+contadores = Counter()
+
+logger = logging.getLogger(__name__)
+
+# marca a ausência de registro, para que ela também fique em cache
+_VAZIO = 'vazio'
+
+
+def _get_singleton(model):
+    chave = CHAVES[model]
+    obj = cache.get(chave)
+    if obj is not None:
+        contadores['hits'] += 1
+        return None if obj == _VAZIO else obj
+
+    contadores['misses'] += 1
+    logger.debug('{} lido do banco (hits={}, misses={}).'.format(
+        model.__name__, contadores['hits'], contadores['misses']))
+    obj = model.objects.first()
+    cache.set(chave, _VAZIO if obj is None else obj, None)
+    return obj
+
+
+def get_config_aplicacao():
+    """
+    Configuração da aplicação. Assim como AppConfig.attr, cria a
+    configuração padrão caso ela ainda não exista.
+    """
+    config = _get_singleton(AppConfig)
+    if config is None:
+        config = AppConfig()
+        config.save()
+        cache.set(CHAVE_APPCONFIG, config, None)
+    return config
+
+
+def get_casa_legislativa():
+    """
+    Dados da Casa Legislativa ou None, se ainda não cadastrados.
+    """
+    return _get_singleton(CasaLegislativa)
+
+
+def invalida_configuracoes(*models):
+    cache.delete_many([CHAVES[model] for model in models or CHAVES])
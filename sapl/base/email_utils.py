@@ -6,7 +6,7 @@ from django.core.urlresolvers import reverse
 from django.template import Context, loader
 from django.utils import timezone
 
-from sapl.base.models import CasaLegislativa
+from sapl.base.configuracoes import get_casa_legislativa
 from sapl.materia.models import AcompanhamentoMateria
 from sapl.protocoloadm.models import AcompanhamentoDocumento
 from sapl.settings import EMAIL_SEND_USER
@@ -220,7 +220,7 @@ def do_envia_email_tramitacao(base_url, tipo, doc_mat, status, unidade_destino):
         destinatarios = AcompanhamentoDocumento.objects.filter(documento=doc_mat,
                                                                confirmado=True)
 
-    casa = CasaLegislativa.objects.first()
+    casa = get_casa_legislativa()
 
     sender = EMAIL_SEND_USER
     # FIXME i18nn
@@ -38,6 +38,7 @@ from sapl.utils import (RANGE_ANOS, YES_NO_CHOICES,
                         choice_anos_com_normas, choice_anos_com_materias,
                         FilterOverridesMetaMixin)
 
+from .configuracoes import get_casa_legislativa
 from .models import AppConfig, CasaLegislativa
 
 
@@ -1174,7 +1175,7 @@ class ConfiguracoesAppForm(ModelForm):
     def clean_mostrar_brasao_painel(self):
         mostrar_brasao_painel = self.cleaned_data.get(
             'mostrar_brasao_painel', False)
-        casa = CasaLegislativa.objects.first()
+        casa = get_casa_legislativa()
 
         if not casa:
             self.logger.error('Não há casa legislativa relacionada.')
@@ -0,0 +1,203 @@
+"""
+Infraestrutura de indexação em segundo plano.
+
+A extração de texto dos arquivos (Solr ou textract) é feita fora da
+requisição HTTP: o signal processor marca o objeto salvo como pendente, na
+mesma transação do save, e uma thread de fundo o indexa, delegando o
+textract a um pool de processos. Pendências perdidas (reciclagem do worker,
+erros) são indexadas pelo comando reindexa_alterados.
+
+O texto extraído é gravado em TextoExtraido pelo hash do arquivo, de forma
+que um anexo não alterado nunca é processado novamente; os hashes dos
+arquivos de cada objeto indexado ficam em ObjetoIndexado.
+"""
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import logging
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+from haystack.exceptions import NotHandled
+from haystack.signals import RealtimeSignalProcessor
+import textract
+
+from sapl.base.models import ModeloIndexado, ObjetoIndexado, TextoExtraido
+from sapl.utils import update_em_lote
+
+PROCESSOS_EXTRACAO = getattr(settings, 'INDEXACAO_PROCESSOS', 2)
+
+logger = logging.getLogger(__name__)
+
+_fila = None
+_pool = None
+
+
+def get_fila():
+    global _fila
+    if _fila is None:
+        _fila = ThreadPoolExecutor(max_workers=1)
+    return _fila
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=PROCESSOS_EXTRACAO)
+    return _pool
+
+
+def _textract_process(path):
+    return textract.process(
+        path, language='pt-br').decode('utf-8').replace(
+            '\n', ' ').replace('\t', ' ')
+
+
+def textract_process(path):
+    """
+    Executa o textract em um processo do pool de extração.
+    """
+    return get_pool().submit(_textract_process, path).result()
+
+
+def get_texto_extraido(hash_arquivo):
+    return TextoExtraido.objects.filter(
+        hash_arquivo=hash_arquivo).values_list('texto', flat=True).first()
+
+
+def set_texto_extraido(hash_arquivo, texto):
+    try:
+        with transaction.atomic():
+            TextoExtraido.objects.update_or_create(
+                hash_arquivo=hash_arquivo, defaults={'texto': texto})
+    except IntegrityError:
+        # extraído por outro processo ao mesmo tempo
+        pass
+
+
+def get_hashes_indexados(model):
+    """
+    :return: dicionário pk -> hashes dos arquivos na última indexação
+    """
+    return dict(ObjetoIndexado.objects.filter(
+        content_type=ContentType.objects.get_for_model(model)).values_list(
+            'object_id', 'hashes'))
+
+
+def set_hashes_indexados(model, hashes):
+    """
+    Grava os hashes (pk -> hashes) que diferem dos já gravados.
+    """
+    content_type = ContentType.objects.get_for_model(model)
+    anteriores = get_hashes_indexados(model)
+    alterados = {}
+    novos = []
+    for pk, valor in hashes.items():
+        if pk not in anteriores:
+            novos.append(ObjetoIndexado(
+                content_type=content_type, object_id=pk, hashes=valor))
+        elif anteriores[pk] != valor:
+            alterados[pk] = valor
+    if alterados:
+        ids = dict(ObjetoIndexado.objects.filter(
+            content_type=content_type,
+            object_id__in=alterados).values_list('object_id', 'id'))
+        update_em_lote(ObjetoIndexado, 'hashes', {
+            ids[pk]: valor for pk, valor in alterados.items()})
+    ObjetoIndexado.objects.bulk_create(novos, batch_size=1000)
+
+
+def marca_pendente(model, pk, data=None):
+    """
+    Registra que o objeto foi alterado em `data` e ainda não foi indexado.
+    """
+    data = data or timezone.now()
+    content_type = ContentType.objects.get_for_model(model)
+    try:
+        with transaction.atomic():
+            ObjetoIndexado.objects.update_or_create(
+                content_type=content_type, object_id=pk,
+                defaults={'pendente_desde': data})
+    except IntegrityError:
+        ObjetoIndexado.objects.filter(
+            content_type=content_type, object_id=pk).update(
+                pendente_desde=data)
+
+
+def get_pendentes(model):
+    return ObjetoIndexado.objects.filter(
+        content_type=ContentType.objects.get_for_model(model),
+        pendente_desde__isnull=False)
+
+
+def conclui_pendentes(model, pks, data):
+    """
+    Retira a pendência dos objetos indexados, exceto os alterados
+    novamente depois de `data`.
+    """
+    get_pendentes(model).filter(
+        object_id__in=pks, pendente_desde__lte=data).update(
+            pendente_desde=None)
+
+
+def get_ultima_indexacao(model):
+    return ModeloIndexado.objects.filter(
+        content_type=ContentType.objects.get_for_model(model)).values_list(
+            'ultima_indexacao', flat=True).first()
+
+
+def set_ultima_indexacao(model, data):
+    ModeloIndexado.objects.update_or_create(
+        content_type=ContentType.objects.get_for_model(model),
+        defaults={'ultima_indexacao': data})
+
+
+class BackgroundSignalProcessor(RealtimeSignalProcessor):
+    """
+    Como o RealtimeSignalProcessor, mas a atualização do índice após o
+    save é feita em uma thread de fundo, depois do commit da transação.
+    """
+
+    def handle_save(self, sender, instance, **kwargs):
+        indexados = self.connections['default'].get_unified_index(
+        ).get_indexed_models()
+        if sender not in indexados:
+            return
+
+        pk = instance.pk
+        data = timezone.now()
+        marca_pendente(sender, pk, data)
+        transaction.on_commit(
+            lambda: get_fila().submit(
+                self._indexa_em_segundo_plano, sender, pk, data))
+
+    def handle_delete(self, sender, instance, **kwargs):
+        super().handle_delete(sender, instance, **kwargs)
+        ObjetoIndexado.objects.filter(
+            content_type=ContentType.objects.get_for_model(sender),
+            object_id=instance.pk).delete()
+
+    def indexa(self, sender, pk, data):
+        """
+        Atualiza o índice do objeto e retira sua pendência, se ele não foi
+        alterado novamente depois de `data`.
+        """
+        instance = sender._default_manager.filter(pk=pk).first()
+        if instance is not None:
+            for using in self.connection_router.for_write(instance=instance):
+                try:
+                    index = self.connections[using].get_unified_index(
+                    ).get_index(sender)
+                    index.update_object(instance, using=using)
+                except NotHandled:
+                    pass
+        conclui_pendentes(sender, [pk], data)
+
+    def _indexa_em_segundo_plano(self, sender, pk, data):
+        try:
+            self.indexa(sender, pk, data)
+        except Exception as e:
+            logger.error('Erro indexando {} (pk={}): {}'.format(
+                sender._meta.label, pk, e))
+        finally:
+            connection.close()
@@ -0,0 +1,84 @@
+import os.path
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from haystack import connections
+
+from sapl.base.indexacao import (conclui_pendentes, get_hashes_indexados,
+                                 get_pendentes, get_ultima_indexacao,
+                                 set_hashes_indexados, set_ultima_indexacao)
+from sapl.utils import md5_arquivo
+
+
+def hashes_arquivos(obj, attrs):
+    hashes = []
+    for attr in attrs:
+        arquivo = getattr(obj, attr)
+        if arquivo and os.path.exists(arquivo.path):
+            hashes.append(md5_arquivo(arquivo.path))
+        else:
+            hashes.append('')
+    return ','.join(hashes)
+
+
+class Command(BaseCommand):
+
+    help = ('Atualiza o índice de busca somente para os objetos alterados '
+            '(data_ultima_atualizacao ou hash dos arquivos) desde a última '
+            'execução e os que ficaram pendentes na indexação em segundo '
+            'plano')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-b', '--batch-size',
+            type=int,
+            default=100,
+            dest='batch_size',
+            help='Quantidade de objetos enviados por vez ao backend',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        backend = connections['default'].get_backend()
+        unified_index = connections['default'].get_unified_index()
+
+        for model in unified_index.get_indexed_models():
+            inicio = timezone.now()
+            ultima = get_ultima_indexacao(model)
+            index = unified_index.get_index(model)
+            qs = index.index_queryset()
+
+            updated_field = index.get_updated_field()
+            if ultima and updated_field:
+                alterados = set(qs.filter(**{
+                    updated_field + '__gte': ultima}).values_list(
+                        'pk', flat=True))
+            else:
+                alterados = set(qs.values_list('pk', flat=True))
+
+            pendentes = set(get_pendentes(model).values_list(
+                'object_id', flat=True))
+            alterados |= pendentes
+
+            campo = index.fields[index.get_content_field()]
+            attrs = campo.file_attrs() if hasattr(campo, 'file_attrs') else []
+            if attrs:
+                anteriores = get_hashes_indexados(model)
+                atuais = {}
+                for obj in qs.only('pk', *attrs).iterator():
+                    atuais[obj.pk] = hashes_arquivos(obj, attrs)
+                    if anteriores.get(obj.pk) != atuais[obj.pk]:
+                        alterados.add(obj.pk)
+
+            alterados = sorted(alterados)
+            for i in range(0, len(alterados), batch_size):
+                backend.update(
+                    index, qs.filter(pk__in=alterados[i:i + batch_size]))
+
+            if attrs:
+                set_hashes_indexados(model, atuais)
+            conclui_pendentes(model, pendentes, inicio)
+            set_ultima_indexacao(model, inicio)
+
+            self.stdout.write('{}: {} objetos reindexados.'.format(
+                model._meta.verbose_name_plural, len(alterados)))
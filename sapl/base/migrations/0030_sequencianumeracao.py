@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0029_remove_appconfig_relatorios_atos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SequenciaNumeracao',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sequencia', models.CharField(max_length=50, verbose_name='Sequência')),
+                ('escopo', models.CharField(max_length=20, verbose_name='Escopo')),
+                ('ultimo_numero', models.PositiveIntegerField(default=0, verbose_name='Último Número')),
+            ],
+            options={
+                'verbose_name': 'Sequência de Numeração',
+                'verbose_name_plural': 'Sequências de Numeração',
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='sequencianumeracao',
+            unique_together=set([('sequencia', 'escopo')]),
+        ),
+    ]
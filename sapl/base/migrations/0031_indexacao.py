@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('base', '0030_sequencianumeracao'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ModeloIndexado',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ultima_indexacao', models.DateTimeField(verbose_name='Última Indexação')),
+                ('content_type', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.ContentType')),
+            ],
+            options={
+                'verbose_name': 'Modelo Indexado',
+                'verbose_name_plural': 'Modelos Indexados',
+            },
+        ),
+        migrations.CreateModel(
+            name='ObjetoIndexado',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveIntegerField()),
+                ('hashes', models.TextField(blank=True, verbose_name='Hashes')),
+                ('pendente_desde', models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='Pendente Desde')),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.ContentType')),
+            ],
+            options={
+                'verbose_name': 'Objeto Indexado',
+                'verbose_name_plural': 'Objetos Indexados',
+            },
+        ),
+        migrations.CreateModel(
+            name='TextoExtraido',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hash_arquivo', models.CharField(max_length=32, unique=True, verbose_name='Hash do Arquivo')),
+                ('texto', models.TextField(blank=True, verbose_name='Texto')),
+                ('data', models.DateTimeField(auto_now=True, verbose_name='Data')),
+            ],
+            options={
+                'verbose_name': 'Texto Extraído',
+                'verbose_name_plural': 'Textos Extraídos',
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='objetoindexado',
+            unique_together=set([('content_type', 'object_id')]),
+        ),
+    ]
@@ -168,19 +168,90 @@ class AppConfig(models.Model):
 
     @classmethod
     def attr(cls, attr):
-        config = AppConfig.objects.first()
-
-        if not config:
-            config = AppConfig()
-            config.save()
-
-        return getattr(config, attr)
+        from sapl.base.configuracoes import get_config_aplicacao
+        return getattr(get_config_aplicacao(), attr)
 
     def __str__(self):
         return _('Configurações da Aplicação - %(id)s') % {
             'id': self.id}
 
 
+class SequenciaNumeracao(models.Model):
+    """
+    Último número atribuído em uma sequência de numeração (protocolos,
+    matérias e documentos administrativos, por tipo) dentro de um escopo
+    (ano, legislatura ou único). Ver sapl.base.numeracao.
+    """
+    sequencia = models.CharField(max_length=50, verbose_name=_('Sequência'))
+    escopo = models.CharField(max_length=20, verbose_name=_('Escopo'))
+    ultimo_numero = models.PositiveIntegerField(
+        default=0, verbose_name=_('Último Número'))
+
+    class Meta:
+        verbose_name = _('Sequência de Numeração')
+        verbose_name_plural = _('Sequências de Numeração')
+        unique_together = (('sequencia', 'escopo'), )
+
+    def __str__(self):
+        return '%s (%s): %s' % (self.sequencia, self.escopo,
+                                self.ultimo_numero)
+
+
+class TextoExtraido(models.Model):
+    """
+    Texto extraído de um arquivo para o índice de busca, pelo hash do
+    conteúdo do arquivo. Ver sapl.base.indexacao.
+    """
+    hash_arquivo = models.CharField(
+        max_length=32, unique=True, verbose_name=_('Hash do Arquivo'))
+    texto = models.TextField(blank=True, verbose_name=_('Texto'))
+    data = models.DateTimeField(auto_now=True, verbose_name=_('Data'))
+
+    class Meta:
+        verbose_name = _('Texto Extraído')
+        verbose_name_plural = _('Textos Extraídos')
+
+    def __str__(self):
+        return self.hash_arquivo
+
+
+class ObjetoIndexado(models.Model):
+    """
+    Situação de um objeto no índice de busca: hashes dos arquivos na
+    última indexação e, se houver, a data da alteração ainda não indexada.
+    """
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    hashes = models.TextField(blank=True, verbose_name=_('Hashes'))
+    pendente_desde = models.DateTimeField(
+        blank=True, null=True, db_index=True,
+        verbose_name=_('Pendente Desde'))
+
+    class Meta:
+        verbose_name = _('Objeto Indexado')
+        verbose_name_plural = _('Objetos Indexados')
+        unique_together = (('content_type', 'object_id'), )
+
+    def __str__(self):
+        return '%s %s' % (self.content_type, self.object_id)
+
+
+class ModeloIndexado(models.Model):
+    """
+    Início da última execução de reindexa_alterados para o model.
+    """
+    content_type = models.OneToOneField(ContentType, on_delete=models.CASCADE)
+    ultima_indexacao = models.DateTimeField(
+        verbose_name=_('Última Indexação'))
+
+    class Meta:
+        verbose_name = _('Modelo Indexado')
+        verbose_name_plural = _('Modelos Indexados')
+
+    def __str__(self):
+        return '%s: %s' % (self.content_type, self.ultima_indexacao)
+
+
 @reversion.register()
 class TipoAutor(models.Model):
     descricao = models.CharField(
@@ -0,0 +1,156 @@
+"""
+Sequências de numeração de protocolos, matérias e documentos
+administrativos.
+
+Cada sequência tem um contador por escopo (o ano, a legislatura ou um
+escopo único, conforme a sequência de numeração configurada), em
+SequenciaNumeracao. O próximo número é obtido travando a linha do contador
+com select_for_update, sem percorrer a tabela numerada, e dois usuários
+simultâneos nunca recebem o mesmo número: o segundo espera a transação do
+primeiro terminar.
+
+O contador de um escopo é criado no primeiro uso a partir do maior número
+já gravado. Números gravados por outros caminhos (cadastro manual, API) são
+registrados pelos receivers de sapl.base.receivers.
+"""
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.translation import ugettext_lazy as _
+
+from sapl.base.configuracoes import get_config_aplicacao
+from sapl.base.models import SequenciaNumeracao
+from sapl.materia.models import MateriaLegislativa
+from sapl.parlamentares.models import Legislatura
+from sapl.protocoloadm.models import DocumentoAdministrativo, Protocolo
+
+SEQUENCIA_PROTOCOLO = 'protocolo'
+SEQUENCIA_MATERIA = 'materia:%s'
+SEQUENCIA_DOCUMENTO = 'documento:%s'
+
+
+def _legislatura(ano):
+    legislatura = Legislatura.objects.filter(
+        data_inicio__year__lte=ano,
+        data_fim__year__gte=ano).order_by('-data_inicio').first()
+    if legislatura is None:
+        raise ValidationError(
+            _('Não há legislatura cadastrada para o ano de {}.').format(ano))
+    return legislatura
+
+
+def escopo_numeracao(numeracao, ano):
+    """
+    Escopo do contador e filtro dos registros numerados nesse escopo, pelo
+    campo `ano` (numeração por ano ou por legislatura) ou todos (única).
+    """
+    if numeracao == 'A':
+        return 'A%s' % ano, {'ano': ano}
+    if numeracao == 'L':
+        legislatura = _legislatura(ano)
+        return 'L%s' % legislatura.pk, {
+            'ano__gte': legislatura.data_inicio.year,
+            'ano__lte': legislatura.data_fim.year}
+    return 'U', {}
+
+
+def _get_contador(sequencia, escopo, queryset):
+    contadores = SequenciaNumeracao.objects.select_for_update().filter(
+        sequencia=sequencia, escopo=escopo)
+    contador = contadores.first()
+    if contador is None:
+        try:
+            with transaction.atomic():
+                SequenciaNumeracao.objects.create(
+                    sequencia=sequencia, escopo=escopo,
+                    ultimo_numero=queryset.aggregate(
+                        Max('numero'))['numero__max'] or 0)
+        except IntegrityError:
+            # criado por outra transação ao mesmo tempo
+            pass
+        contador = contadores.get()
+    return contador
+
+
+def proximo_numero(sequencia, escopo, queryset, numero=None):
+    """
+    Atribui o próximo número da sequência no escopo.
+
+    Deve ser chamada na mesma transação que grava o registro numerado: o
+    contador fica travado até o fim dela.
+
+    :param queryset: registros já numerados no escopo, usados apenas para
+        criar o contador
+    :param numero: número informado pelo usuário, que deve ser maior que o
+        último atribuído
+    :raise ValidationError: se `numero` não for maior que o último
+    """
+    with transaction.atomic():
+        contador = _get_contador(sequencia, escopo, queryset)
+        if numero is None:
+            numero = contador.ultimo_numero + 1
+        elif numero <= contador.ultimo_numero:
+            raise ValidationError(
+                _('Número deve ser maior que {}').format(
+                    contador.ultimo_numero))
+        contador.ultimo_numero = numero
+        contador.save(update_fields=['ultimo_numero'])
+    return numero
+
+
+def ultimo_numero(sequencia, escopo, queryset):
+    """
+    Último número atribuído, sem travar o contador (para sugestões).
+    """
+    ultimo = SequenciaNumeracao.objects.filter(
+        sequencia=sequencia, escopo=escopo).values_list(
+            'ultimo_numero', flat=True).first()
+    if ultimo is None:
+        ultimo = queryset.aggregate(Max('numero'))['numero__max'] or 0
+    return ultimo
+
+
+def registra_numero(sequencia, escopo, numero):
+    """
+    Avança o contador, se existir, para um número gravado fora de
+    proximo_numero.
+    """
+    SequenciaNumeracao.objects.filter(
+        sequencia=sequencia, escopo=escopo,
+        ultimo_numero__lt=numero).update(ultimo_numero=numero)
+
+
+def sequencia_protocolo(ano=None):
+    """
+    :return: tupla (sequência, escopo, queryset) dos protocolos do ano
+    """
+    ano = ano or timezone.now().year
+    escopo, filtro = escopo_numeracao(
+        get_config_aplicacao().sequencia_numeracao, ano)
+    return (SEQUENCIA_PROTOCOLO, escopo,
+            Protocolo.objects.filter(**filtro))
+
+
+def sequencia_materia(tipo, ano=None):
+    """
+    :return: tupla (sequência, escopo, queryset) das matérias do tipo,
+        conforme a numeração do tipo ou, se não definida, a da aplicação
+    """
+    ano = ano or timezone.now().year
+    escopo, filtro = escopo_numeracao(
+        tipo.sequencia_numeracao or
+        get_config_aplicacao().sequencia_numeracao, ano)
+    return (SEQUENCIA_MATERIA % tipo.pk, escopo,
+            MateriaLegislativa.objects.filter(tipo=tipo, **filtro))
+
+
+def sequencia_documento(tipo, ano=None):
+    """
+    :return: tupla (sequência, escopo, queryset) dos documentos
+        administrativos do tipo, numerados por ano
+    """
+    ano = ano or timezone.now().year
+    escopo, filtro = escopo_numeracao('A', ano)
+    return (SEQUENCIA_DOCUMENTO % tipo.pk, escopo,
+            DocumentoAdministrativo.objects.filter(tipo=tipo, **filtro))
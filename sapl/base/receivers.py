@@ -1,9 +1,21 @@
-from django.db.models.signals import post_delete, post_save
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
 
-from sapl.materia.models import Tramitacao
-from sapl.protocoloadm.models import TramitacaoAdministrativo
+from sapl.base.configuracoes import invalida_configuracoes
+from sapl.base.models import AppConfig, CasaLegislativa
+from sapl.base.numeracao import (registra_numero, sequencia_documento,
+                                 sequencia_materia, sequencia_protocolo)
+from sapl.materia.models import MateriaLegislativa, Tramitacao
+from sapl.parlamentares.filiacoes import invalida_filiacoes
+from sapl.parlamentares.models import Filiacao, Partido
+from sapl.protocoloadm.models import (DocumentoAdministrativo, Protocolo,
+                                      TramitacaoAdministrativo)
 from sapl.base.signals import tramitacao_signal
+from sapl.base.templatetags.menus import invalida_permissoes_menus
 from sapl.utils import get_base_url
 
 from sapl.base.email_utils import do_envia_email_tramitacao
@@ -40,3 +52,68 @@ def status_tramitacao_materia(sender, instance, **kwargs):
             documento = instance.documento
             documento.tramitacao = True
             documento.save()
+
+
+@receiver(post_save, sender=Tramitacao)
+@receiver(post_delete, sender=Tramitacao)
+def atualiza_ultima_tramitacao(sender, instance, **kwargs):
+    ultima = Tramitacao.objects.filter(
+        materia_id=instance.materia_id).order_by(
+            '-id').values_list('id', flat=True).first()
+    MateriaLegislativa.objects.filter(
+        pk=instance.materia_id).update(ultima_tramitacao=ultima)
+
+    # Mantém coerente a instância já carregada, evitando que um save
+    # posterior da matéria sobrescreva o valor atualizado acima.
+    if Tramitacao.materia.is_cached(instance):
+        instance.materia.ultima_tramitacao_id = ultima
+
+
+@receiver(post_save, sender=AppConfig)
+@receiver(post_delete, sender=AppConfig)
+@receiver(post_save, sender=CasaLegislativa)
+@receiver(post_delete, sender=CasaLegislativa)
+def invalida_cache_configuracoes(sender, instance, **kwargs):
+    invalida_configuracoes(sender)
+    # até o commit, uma leitura concorrente ainda encontra o registro
+    # anterior no banco e pode devolvê-lo ao cache
+    transaction.on_commit(lambda: invalida_configuracoes(sender))
+
+
+@receiver(post_save, sender=Protocolo)
+@receiver(post_save, sender=MateriaLegislativa)
+@receiver(post_save, sender=DocumentoAdministrativo)
+def registra_numero_sequencia(sender, instance, created, **kwargs):
+    # mantém o contador à frente de números gravados fora de
+    # sapl.base.numeracao.proximo_numero (cadastro manual, API...)
+    if not created or not instance.numero or not instance.ano:
+        return
+    try:
+        if sender == Protocolo:
+            sequencia, escopo, __ = sequencia_protocolo(instance.ano)
+        elif sender == MateriaLegislativa:
+            sequencia, escopo, __ = sequencia_materia(
+                instance.tipo, instance.ano)
+        else:
+            sequencia, escopo, __ = sequencia_documento(
+                instance.tipo, instance.ano)
+    except ValidationError:
+        # numeração por legislatura sem legislatura cadastrada no ano
+        return
+    registra_numero(sequencia, escopo, instance.numero)
+
+
+@receiver(m2m_changed, sender=get_user_model().groups.through)
+@receiver(m2m_changed, sender=get_user_model().user_permissions.through)
+@receiver(m2m_changed, sender=Group.permissions.through)
+@receiver(post_delete, sender=Group)
+def invalida_cache_permissoes(sender, **kwargs):
+    invalida_permissoes_menus()
+
+
+@receiver(post_save, sender=Filiacao)
+@receiver(post_delete, sender=Filiacao)
+@receiver(post_save, sender=Partido)
+@receiver(post_delete, sender=Partido)
+def invalida_cache_filiacoes(sender, instance, **kwargs):
+    invalida_filiacoes()
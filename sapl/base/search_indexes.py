@@ -1,5 +1,4 @@
 import os.path
-import textract
 import logging
 
 from django.db.models import F, Q, Value
@@ -13,12 +12,14 @@ from haystack.indexes import SearchIndex
 from haystack.utils import get_model_ct_tuple
 from textract.exceptions import ExtensionNotSupported
 
+from sapl.base.indexacao import (get_texto_extraido, set_texto_extraido,
+                                 textract_process)
 from sapl.compilacao.models import (STATUS_TA_IMMUTABLE_PUBLIC,
                                     STATUS_TA_PUBLIC, Dispositivo)
 from sapl.materia.models import DocumentoAcessorio, MateriaLegislativa
 from sapl.norma.models import NormaJuridica
 from sapl.settings import SOLR_URL
-from sapl.utils import RemoveTag
+from sapl.utils import RemoveTag, md5_arquivo
 
 
 class TextExtractField(CharField):
@@ -43,10 +44,10 @@ class TextExtractField(CharField):
                     return ''
                 data = content['contents']
         except Exception as e:
-            print('erro processando arquivo: ' % arquivo.path)
+            print('erro processando arquivo: %s' % arquivo.path)
             self.logger.error(arquivo.path)
-            self.logger.error('erro processando arquivo: ' % arquivo.path)
-            data = ''
+            self.logger.error('erro processando arquivo: %s' % arquivo.path)
+            data = None
         return data
 
     def whoosh_extraction(self, arquivo):
@@ -57,10 +58,7 @@ class TextExtractField(CharField):
                 return RemoveTag(content)
 
         else:
-            return textract.process(
-                arquivo.path,
-                language='pt-br').decode('utf-8').replace('\n', ' ').replace(
-                '\t', ' ')
+            return textract_process(arquivo.path)
 
     def print_error(self, arquivo, error):
         msg = 'Erro inesperado processando arquivo %s erro: %s' % (
@@ -73,6 +71,17 @@ class TextExtractField(CharField):
                 not os.path.splitext(arquivo.path)[1][:1]:
             return ''
 
+        # O texto extraído é mantido em cache pelo hash do arquivo,
+        # assim um arquivo não alterado não é extraído novamente.
+        hash_arquivo = md5_arquivo(arquivo.path)
+        data = get_texto_extraido(hash_arquivo)
+        if data is None:
+            data = self.extract_file(arquivo)
+            if data is not None:
+                set_texto_extraido(hash_arquivo, data)
+        return data or ''
+
+    def extract_file(self, arquivo):
         # Em ambiente de produção utiliza-se o SOLR
         if SOLR_URL:
             try:
@@ -87,14 +96,18 @@ class TextExtractField(CharField):
             try:
                 self.logger.debug("Tentando whoosh_extraction no arquivo {}".format(arquivo.path))
                 return self.whoosh_extraction(arquivo)
-                self.print_error(arquivo)
             except ExtensionNotSupported as err:
                 print(str(err))
                 self.logger.error(str(err))
+                return ''
             except Exception as err:
                 print(str(err))
                 self.print_error(arquivo, str(err))
-        return ''
+        return None
+
+    def file_attrs(self):
+        return [attr for attr, func in self.model_attr
+                if func == 'file_extractor']
 
     def ta_extractor(self, value):
         r = []
@@ -4,7 +4,7 @@ from django.template.defaultfilters import stringfilter
 from sapl.base.models import AppConfig
 from sapl.materia.models import DocumentoAcessorio, MateriaLegislativa, Proposicao
 from sapl.norma.models import NormaJuridica
-from sapl.parlamentares.models import Filiacao
+from sapl.parlamentares.filiacoes import get_indice_filiacoes
 from sapl.utils import filiacao_data, SEPARADOR_HASH_PROPOSICAO
 
 
@@ -160,15 +160,7 @@ def get_delete_perm(value, arg):
 
 @register.filter
 def ultima_filiacao(value):
-    parlamentar = value
-
-    ultima_filiacao = Filiacao.objects.filter(
-        parlamentar=parlamentar).order_by('-data').first()
-
-    if ultima_filiacao:
-        return ultima_filiacao.partido
-    else:
-        return None
+    return get_indice_filiacoes().ultima_filiacao(value)
 
 
 @register.filter
@@ -1,15 +1,33 @@
+import copy
 import logging
+import uuid
 
 from django import template
-from django.core.urlresolvers import reverse
+from django.core.cache import cache
+from django.core.urlresolvers import NoReverseMatch, reverse
+from django.utils import translation
 from django.utils.translation import ugettext_lazy as _
 import yaml
 
+from sapl.base.configuracoes import get_config_aplicacao
+
 
 register = template.Library()
 
 logger = logging.getLogger(__name__)
 
+# ocupa o lugar do pk do master nas urls compiladas
+MARCADOR_PK = '987654321'
+
+LIMITE_MENUS_COMPILADOS = 500
+
+CHAVE_VERSAO_PERMISSOES = 'menus:permissoes:versao'
+CHAVE_PERMISSOES = 'menus:permissoes:%s:%s'
+TIMEOUT_PERMISSOES = 60 * 60
+
+_menus_compilados = {}
+_urls_por_crud = {}
+
 
 @register.inclusion_tag('menus/menu.html', takes_context=True)
 def menu(context, path=None):
@@ -72,21 +90,12 @@ def nav_run(context, path=None):
         if not yaml_path:
             return
 
-            """
-            Por padrão, são carragados dois Loaders,
-            filesystem.Loader - busca em TEMPLATE_DIRS do projeto atual
-            app_directories.Loader - busca em todas apps instaladas
-            A função nativa abaixo busca em todos os Loaders Configurados.
-            """
         try:
-            yaml_template = template.loader.get_template(yaml_path)
-        except:
-            return
-
-        try:
-            rendered = yaml_template.template.render(context)
-            menu = yaml.load(rendered)
+            menu = copy.deepcopy(
+                get_menu_compilado(yaml_path, rm.app_name, context))
             resolve_urls_inplace(menu, root_pk, rm, context)
+        except template.TemplateDoesNotExist:
+            return
         except Exception as e:
             raise Exception(_("""Erro na conversão do yaml %s. App: %s.
                                     Erro:
@@ -97,7 +106,143 @@ def nav_run(context, path=None):
     return {'menu': menu}
 
 
+def _assinatura_configuracao():
+    config = get_config_aplicacao()
+    return tuple(f.value_from_object(config)
+                 for f in config._meta.concrete_fields)
+
+
+def get_menu_compilado(yaml_path, app_name, context):
+    """
+    Menu do yaml, já convertido e com as urls resolvidas (ver
+    compila_urls_inplace). A compilação é feita uma vez por processo para
+    cada yaml, app, idioma e configuração da aplicação, que é tudo de que
+    os yamls de menu podem depender.
+    """
+    chave = (yaml_path, app_name, translation.get_language(),
+             _assinatura_configuracao())
+    menu = _menus_compilados.get(chave)
+    if menu is None:
+        """
+        Por padrão, são carragados dois Loaders,
+        filesystem.Loader - busca em TEMPLATE_DIRS do projeto atual
+        app_directories.Loader - busca em todas apps instaladas
+        A função nativa abaixo busca em todos os Loaders Configurados.
+        """
+        yaml_template = template.loader.get_template(yaml_path)
+        rendered = yaml_template.template.render(context)
+        menu = yaml.load(rendered)
+        compila_urls_inplace(menu, app_name)
+
+        if len(_menus_compilados) >= LIMITE_MENUS_COMPILADOS:
+            _menus_compilados.clear()
+        _menus_compilados[chave] = menu
+    return menu
+
+
+def _erro_url(menu):
+    # tem que ser root_pk pois quando está sendo
+    # renderizado um detail, update, delete
+    # e ainda sim é necessário colocar o menu,
+    # nestes, casos o pk da url é do detail, e não
+    # do master, porém, os menus do subnav, apontam para
+    # outras áreas que as urls destas são construídas
+    # com pk do master, e não do detail... por isso
+    # no contexto deve ter, ou root_pk, ou object
+    # sendo que qualquer um dos dois,deverá ser o
+    # master.
+    # Estes detalhes são relevantes quando usa-se
+    # o menu isolado. Por outro lado, quando usado
+    # conjuntamente com o crud, este configura o contexto
+    # como se deve para o menus.py
+    log = """
+    Erro na construção do Menu:
+    menu: {}
+    url: {}
+    1) Verifique se a url existe
+    2) Se existe no contexto um desses itens:
+        - context['root_pk'] pk do master
+        - context['object'] objeto do master
+    """.format(menu['title'], menu['url_name'])
+    logger.error(log)
+    return Exception(log)
+
+
+def compila_urls_inplace(menu, app_name):
+    """
+    Resolve as urls do menu. Urls que dependem do pk do master ficam com
+    MARCADOR_PK no lugar dele, substituído a cada requisição.
+    """
+    if isinstance(menu, list):
+        for item in menu:
+            compila_urls_inplace(item, app_name)
+        return
+
+    if 'url' in menu:
+        url_name = menu['url_name'] = menu['url']
+        menu['com_pk'] = False
+
+        if '/' not in url_name:
+            if ':' not in url_name:
+                url_name = '%s:%s' % (app_name, url_name)
+            try:
+                menu['url'] = reverse(url_name)
+            except NoReverseMatch:
+                try:
+                    menu['url'] = reverse(url_name,
+                                          kwargs={'pk': MARCADOR_PK})
+                    menu['com_pk'] = True
+                except NoReverseMatch:
+                    raise _erro_url(menu)
+
+    if 'children' in menu:
+        compila_urls_inplace(menu['children'], app_name)
+
+
+def _nomes_urls_crud(crud):
+    nomes = _urls_por_crud.get(crud)
+    if nomes is None:
+        nomes = _urls_por_crud[crud] = {u.name for u in crud.get_urls()}
+    return nomes
+
+
+def tem_permissao(user, permissao):
+    """
+    has_perm a partir do conjunto de permissões do usuário, em cache
+    entre requisições (ver invalida_permissoes_menus).
+    """
+    if user.is_active and user.is_superuser:
+        return True
+
+    permissoes = getattr(user, '_permissoes_menus', None)
+    if permissoes is None:
+        if not user.is_active or user.is_anonymous():
+            permissoes = set()
+        else:
+            versao = cache.get(CHAVE_VERSAO_PERMISSOES)
+            if versao is None:
+                versao = uuid.uuid4().hex[:12]
+                cache.set(CHAVE_VERSAO_PERMISSOES, versao, None)
+            chave = CHAVE_PERMISSOES % (versao, user.pk)
+            permissoes = cache.get(chave)
+            if permissoes is None:
+                permissoes = user.get_all_permissions()
+                cache.set(chave, permissoes, TIMEOUT_PERMISSOES)
+        user._permissoes_menus = permissoes
+    return permissao in permissoes
+
+
+def invalida_permissoes_menus():
+    cache.delete(CHAVE_VERSAO_PERMISSOES)
+
+
 def resolve_urls_inplace(menu, pk, rm, context):
+    """
+    Completa, para a requisição, uma cópia do menu compilado: pk do
+    master, permissões e item ativo.
+    """
+    request = context['request']
+
     if isinstance(menu, list):
         list_active = ''
         for item in menu:
@@ -110,71 +255,20 @@ def resolve_urls_inplace(menu, pk, rm, context):
     else:
         if 'url' in menu:
 
-            url_name = menu['url']
+            url_name = menu['url_name']
 
-            if 'check_permission' in menu and not context[
-                    'request'].user.has_perm(menu['check_permission']):
+            if 'check_permission' in menu and not tem_permissao(
+                    request.user, menu['check_permission']):
                 menu['url'] = ''
                 menu['active'] = ''
             else:
-                if '/' in url_name:
-                    pass
-                elif ':' in url_name:
-                    try:
-                        menu['url'] = reverse('%s' % menu['url'])
-                    except:
-                        try:
-                            menu['url'] = reverse('%s' % menu['url'],
-                                                  kwargs={'pk': pk})
-                        except:
-                            # tem que ser root_pk pois quando está sendo
-                            # renderizado um detail, update, delete
-                            # e ainda sim é necessário colocar o menu,
-                            # nestes, casos o pk da url é do detail, e não
-                            # do master, porém, os menus do subnav, apontam para
-                            # outras áreas que as urls destas são construídas
-                            # com pk do master, e não do detail... por isso
-                            # no contexto deve ter, ou root_pk, ou object
-                            # sendo que qualquer um dos dois,deverá ser o
-                            # master.
-                            # Estes detalhes são relevantes quando usa-se
-                            # o menu isolado. Por outro lado, quando usado
-                            # conjuntamente com o crud, este configura o contexto
-                            # como se deve para o menus.py
-                            log = """
-                            Erro na construção do Menu:
-                            menu: {}
-                            url: {}
-                            1) Verifique se a url existe 
-                            2) Se existe no contexto um desses itens:
-                                - context['root_pk'] pk do master
-                                - context['object'] objeto do master
-                            """.format(menu['title'], menu['url'])
-                            logger.error(log)
-                            raise Exception(log)
-
-                else:
-                    try:
-                        menu['url'] = reverse('%s:%s' % (
-                            rm.app_name, menu['url']))
-                    except:
-                        try:
-                            menu['url'] = reverse('%s:%s' % (
-                                rm.app_name, menu['url']), kwargs={'pk': pk})
-                        except:
-                            log = """Erro na construção do Menu:
-                            menu: {}
-                            url: {}
-                            1) Verifique se a url existe 
-                            2) Se existe no contexto um desses itens:
-                                - context['root_pk'] pk do master
-                                - context['object'] objeto do master
-                            """.format(menu['title'], menu['url'])
-                            logger.error(log)
-                            raise Exception(log)
+                if menu['com_pk']:
+                    if pk is None:
+                        raise _erro_url(menu)
+                    menu['url'] = menu['url'].replace(MARCADOR_PK, str(pk))
 
                 menu['active'] = 'active'\
-                    if context['request'].path == menu['url'] else ''
+                    if request.path == menu['url'] else ''
                 if not menu['active']:
                     """
                     Se não encontrada diretamente,
@@ -187,15 +281,13 @@ def resolve_urls_inplace(menu, pk, rm, context):
                         view = context['view']
                         if hasattr(view, '__class__') and\
                                 hasattr(view.__class__, 'crud'):
-                            urls = view.__class__.crud.get_urls()
-                            for u in urls:
-                                if (u.name == url_name or
-                                        'urls_extras' in menu and
-                                        u.name in menu['urls_extras']):
-                                    menu['active'] = 'active'
-                                    break
-        elif 'check_permission' in menu and not context[
-                'request'].user.has_perm(menu['check_permission']):
+                            nomes = _nomes_urls_crud(view.__class__.crud)
+                            if url_name in nomes or 'urls_extras' in menu \
+                                    and any(nome in menu['urls_extras']
+                                            for nome in nomes):
+                                menu['active'] = 'active'
+        elif 'check_permission' in menu and not tem_permissao(
+                request.user, menu['check_permission']):
             menu['active'] = ''
             del menu['children']
 
@@ -0,0 +1,99 @@
+from io import StringIO
+from types import SimpleNamespace
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+from haystack import connection_router, connections
+from model_mommy import mommy
+
+from sapl.base.indexacao import (BackgroundSignalProcessor, get_pendentes,
+                                 marca_pendente)
+from sapl.base.models import TextoExtraido
+from sapl.base.search_indexes import (MateriaLegislativaIndex,
+                                      TextExtractField)
+from sapl.materia.models import MateriaLegislativa
+
+
+@pytest.mark.django_db(transaction=False)
+def test_texto_extraido_pelo_hash_do_arquivo(tmpdir, monkeypatch):
+    arquivo = tmpdir.join('texto.txt')
+    arquivo.write('conteúdo original')
+    arquivo = SimpleNamespace(path=str(arquivo))
+
+    extracoes = []
+
+    def extract_file(arquivo):
+        extracoes.append(arquivo.path)
+        with open(arquivo.path) as f:
+            return f.read()
+
+    field = TextExtractField(model_attr='texto_original')
+    monkeypatch.setattr(field, 'extract_file', extract_file)
+
+    assert field.file_extractor(arquivo) == 'conteúdo original'
+    assert field.file_extractor(arquivo) == 'conteúdo original'
+    assert len(extracoes) == 1
+    assert TextoExtraido.objects.count() == 1
+
+    with open(arquivo.path, 'w') as f:
+        f.write('conteúdo alterado')
+    assert field.file_extractor(arquivo) == 'conteúdo alterado'
+    assert len(extracoes) == 2
+
+
+@pytest.mark.django_db(transaction=False)
+def test_save_indexado_em_segundo_plano(monkeypatch):
+    indexados = []
+    monkeypatch.setattr(MateriaLegislativaIndex, 'update_object',
+                        lambda self, instance, using=None:
+                        indexados.append(instance.pk))
+
+    processor = BackgroundSignalProcessor(connections, connection_router)
+    try:
+        antes = timezone.now()
+        materia = mommy.make(MateriaLegislativa)
+    finally:
+        processor.teardown()
+
+    # o save apenas registra a pendência; o índice é atualizado depois
+    assert indexados == []
+    [pendente] = get_pendentes(MateriaLegislativa)
+    assert pendente.object_id == materia.pk
+
+    # alterado novamente depois da data indexada, continua pendente
+    processor.indexa(MateriaLegislativa, materia.pk, antes)
+    assert indexados == [materia.pk]
+    assert get_pendentes(MateriaLegislativa).exists()
+
+    processor.indexa(MateriaLegislativa, materia.pk, timezone.now())
+    assert not get_pendentes(MateriaLegislativa).exists()
+
+
+@pytest.mark.django_db(transaction=False)
+def test_reindexa_somente_alterados(monkeypatch):
+    reindexados = []
+
+    def update(self, index, iterable, commit=True):
+        if index.get_model() is MateriaLegislativa:
+            reindexados.extend(obj.pk for obj in iterable)
+
+    backend = connections['default'].get_backend()
+    monkeypatch.setattr(type(backend), 'update', update)
+
+    def reindexa():
+        del reindexados[:]
+        call_command('reindexa_alterados', stdout=StringIO())
+        return sorted(reindexados)
+
+    alterada, pendente, inalterada = mommy.make(MateriaLegislativa,
+                                                _quantity=3)
+
+    assert reindexa() == sorted([alterada.pk, pendente.pk, inalterada.pk])
+    assert reindexa() == []
+
+    alterada.save()
+    marca_pendente(MateriaLegislativa, pendente.pk)
+    assert reindexa() == sorted([alterada.pk, pendente.pk])
+    assert not get_pendentes(MateriaLegislativa).exists()
+    assert reindexa() == []
@@ -0,0 +1,71 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from model_mommy import mommy
+
+from sapl.base.models import AppConfig, SequenciaNumeracao
+from sapl.base.numeracao import (proximo_numero, sequencia_protocolo,
+                                 ultimo_numero)
+from sapl.protocoloadm.models import Protocolo
+
+
+def novo_protocolo():
+    try:
+        with transaction.atomic():
+            protocolo = Protocolo(ano=timezone.now().year,
+                                  data=timezone.localdate(),
+                                  hora=timezone.localtime().time(),
+                                  tipo_protocolo=0, tipo_processo='0',
+                                  anulado=False)
+            protocolo.numero = proximo_numero(
+                *sequencia_protocolo(protocolo.ano))
+            protocolo.save()
+            return protocolo.numero
+    finally:
+        connection.close()
+
+
+@pytest.mark.django_db(transaction=False)
+def test_proximo_numero_parte_do_maior_existente():
+    mommy.make(AppConfig, sequencia_numeracao='A')
+    ano = timezone.now().year
+    mommy.make(Protocolo, ano=ano, numero=41)
+    mommy.make(Protocolo, ano=ano - 1, numero=99)
+
+    assert ultimo_numero(*sequencia_protocolo()) == 41
+    assert proximo_numero(*sequencia_protocolo()) == 42
+
+    # com o contador criado, a tabela de protocolos não é mais consultada
+    with CaptureQueriesContext(connection) as consultas:
+        assert proximo_numero(*sequencia_protocolo()) == 43
+    assert not [c for c in consultas.captured_queries
+                if Protocolo._meta.db_table in c['sql']]
+
+    with pytest.raises(ValidationError):
+        proximo_numero(*sequencia_protocolo(), numero=43)
+    assert proximo_numero(*sequencia_protocolo(), numero=50) == 50
+
+    # números gravados fora do contador o fazem avançar
+    mommy.make(Protocolo, ano=ano, numero=60)
+    assert SequenciaNumeracao.objects.get().ultimo_numero == 60
+
+
+@pytest.mark.concorrencia
+@pytest.mark.django_db(transaction=True)
+def test_proximo_numero_concorrente_nao_repete():
+    # fora da execução padrão (ver pytest.ini): ao final o banco é
+    # esvaziado, inclusive os dados criados pelas migrações
+    mommy.make(AppConfig, sequencia_numeracao='U')
+    total = 40
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        numeros = list(executor.map(lambda i: novo_protocolo(),
+                                    range(total)))
+
+    assert sorted(numeros) == list(range(1, total + 1))
+    assert sorted(Protocolo.objects.values_list(
+        'numero', flat=True)) == list(range(1, total + 1))
@@ -1,6 +1,17 @@
+import copy
+
 import pytest
+from django.contrib.auth.models import AnonymousUser
 from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.utils.translation import ugettext_lazy as _
+from model_mommy import mommy
+
+from sapl.base.configuracoes import get_casa_legislativa, get_config_aplicacao
+from sapl.base.models import AppConfig, CasaLegislativa
+from sapl.base.templatetags.menus import (MARCADOR_PK, compila_urls_inplace,
+                                          resolve_urls_inplace)
 
 
 @pytest.mark.django_db(transaction=False)
@@ -33,3 +44,48 @@ def test_incluir_tipo_autor_errors(admin_client):
 
     assert (response.context_data['form'].errors['descricao'] ==
             [_('Este campo é obrigatório.')])
+
+
+@pytest.mark.django_db(transaction=False)
+def test_configuracoes_em_cache_invalidadas_ao_salvar():
+    config = get_config_aplicacao()
+
+    with CaptureQueriesContext(connection) as consultas:
+        assert get_config_aplicacao().pk == config.pk
+        assert AppConfig.attr('sequencia_numeracao') == \
+            config.sequencia_numeracao
+        assert get_casa_legislativa() is None
+        assert get_casa_legislativa() is None
+    # apenas a primeira leitura da CasaLegislativa vai ao banco
+    assert len(consultas) == 1
+
+    config.sequencia_numeracao = 'U'
+    config.save()
+    assert get_config_aplicacao().sequencia_numeracao == 'U'
+
+    casa = mommy.make(CasaLegislativa)
+    assert get_casa_legislativa().pk == casa.pk
+
+
+@pytest.mark.django_db(transaction=False)
+def test_menu_compilado_resolve_pk_e_permissoes(admin_user, rf):
+    menu = [{'title': 'Matéria',
+             'url': 'sapl.materia:materialegislativa_detail'},
+            {'title': 'Pesquisa', 'url': 'pesquisar_materia'},
+            {'title': 'Impressos',
+             'url': 'sapl.materia:impressos',
+             'check_permission': 'materia.can_access_impressos'}]
+    compila_urls_inplace(menu, 'sapl.materia')
+    assert menu[0]['com_pk'] and MARCADOR_PK in menu[0]['url']
+    assert menu[1]['url'] == reverse('sapl.materia:pesquisar_materia')
+
+    url = reverse('sapl.materia:materialegislativa_detail', kwargs={'pk': 5})
+    for user, permitido in ((admin_user, True), (AnonymousUser(), False)):
+        request = rf.get(url)
+        request.user = user
+        resolvido = copy.deepcopy(menu)
+        resolve_urls_inplace(resolvido, 5, None, {'request': request})
+
+        assert resolvido[0]['url'] == url
+        assert resolvido[0]['active'] == 'active'
+        assert bool(resolvido[2]['url']) == permitido
@@ -10,8 +10,8 @@ from django.contrib.auth.tokens import default_token_generator
 from django.core.exceptions import ObjectDoesNotExist, PermissionDenied
 from django.core.mail import send_mail
 from django.core.urlresolvers import reverse
-from django.db import connection
-from django.db.models import Count, Q
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import ExtractMonth
 from django.http import Http404, HttpResponseRedirect
 from django.template import TemplateDoesNotExist
 from django.template.loader import get_template
@@ -34,12 +34,13 @@ from sapl.comissoes.models import Reuniao, Comissao
 from sapl.crud.base import CrudAux, make_pagination
 from sapl.materia.models import (Autoria, MateriaLegislativa,
                                  TipoMateriaLegislativa, StatusTramitacao, UnidadeTramitacao)
-from sapl.norma.models import (NormaJuridica, NormaEstatisticas)
+from sapl.norma.models import NormaEstatisticasDia, NormaJuridica
 from sapl.sessao.models import (PresencaOrdemDia, SessaoPlenaria,
                                 SessaoPlenariaPresenca)
 from sapl.utils import (parlamentares_ativos,
                         show_results_filter_set, mail_service_configured)
 
+from .configuracoes import get_casa_legislativa, get_config_aplicacao
 from .forms import (AlterarSenhaForm, CasaLegislativaForm,
                     ConfiguracoesAppForm, RelatorioAtasFilterSet,
                     RelatorioAudienciaFilterSet,
@@ -70,7 +71,7 @@ def filtra_url_materias_em_tramitacao(qr, qs, campo_url, local_ou_status):
 
 
 def get_casalegislativa():
-    return CasaLegislativa.objects.first()
+    return get_casa_legislativa()
 
 
 class ConfirmarEmailView(TemplateView):
@@ -288,7 +289,7 @@ class RelatoriosListView(TemplateView):
 
     def get_context_data(self, **kwargs):
         context = super(TemplateView, self).get_context_data(**kwargs)
-        estatisticas_acesso_normas = AppConfig.objects.first().estatisticas_acesso_normas
+        estatisticas_acesso_normas = get_config_aplicacao().estatisticas_acesso_normas
         if estatisticas_acesso_normas == 'S':
             context['estatisticas_acesso_normas'] = True
         else:
@@ -883,33 +884,35 @@ class EstatisticasAcessoNormas(TemplateView):
             return self.render_to_response(context)
 
         context['ano'] = self.request.GET['ano']
-        
-        query = '''
-                select norma_id, ano, extract(month from horario_acesso) as mes, count(*)
-                from norma_normaestatisticas
-                where ano = {}
-                group by mes, ano, norma_id
-                order by mes desc;
-                '''.format(context['ano'])
-        cursor = connection.cursor()
-        cursor.execute(query)
-        rows = cursor.fetchall()
+
+        # totais diários consolidados (ver sapl.norma.estatisticas)
+        rows = NormaEstatisticasDia.objects.filter(
+            data__year=context['ano']
+        ).annotate(
+            mes=ExtractMonth('data')
+        ).values('mes', 'norma_id').annotate(
+            total=Sum('acessos')
+        ).order_by('-mes')
 
         normas_mes = collections.OrderedDict()
         meses = {1: 'Janeiro', 2: 'Fevereiro', 3:'Março', 4: 'Abril', 5: 'Maio', 6:'Junho',
                 7: 'Julho', 8: 'Agosto', 9:'Setembro', 10:'Outubro', 11:'Novembro', 12:'Dezembro'}
-        
+
         for row in rows:
-            if not meses[int(row[2])] in normas_mes:
-                normas_mes[meses[int(row[2])]] = []
-            norma_est = [NormaJuridica.objects.get(id=row[0]), row[3]]
-            normas_mes[meses[int(row[2])]].append(norma_est)
-        
+            normas_mes.setdefault(meses[row['mes']], []).append(
+                [row['norma_id'], row['total']])
+
         # Ordena por acesso e limita em 5
         for n in normas_mes:
             sorted_by_value = sorted(normas_mes[n], key=lambda kv: kv[1], reverse=True)
             normas_mes[n] = sorted_by_value[0:5]
-        
+
+        normas = NormaJuridica.objects.select_related('tipo').in_bulk(
+            {norma_id for n in normas_mes for norma_id, __ in normas_mes[n]})
+        for n in normas_mes:
+            normas_mes[n] = [[normas[norma_id], total]
+                             for norma_id, total in normas_mes[n]]
+
         context['normas_mes'] = normas_mes
 
         return self.render_to_response(context)
@@ -1085,11 +1088,7 @@ class AppConfigCrud(CrudAux):
     class CreateView(CrudAux.CreateView):
 
         def get(self, request, *args, **kwargs):
-            app_config = AppConfig.objects.first()
-
-            if not app_config:
-                app_config = AppConfig()
-                app_config.save()
+            app_config = get_config_aplicacao()
 
             return HttpResponseRedirect(
                 reverse('sapl.base:appconfig_update',
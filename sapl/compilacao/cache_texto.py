@@ -0,0 +1,49 @@
+"""
+Cache do texto compilado renderizado de Textos Articulados públicos.
+
+Cada Texto Articulado possui uma versão no cache, renovada sempre que um
+de seus Dispositivos, Vides, Notas ou Publicações é alterado. O fragmento
+renderizado é armazenado por (ta_id, versão, vigência, modo), portanto
+renovar a versão invalida todas as variantes de uma vez.
+"""
+import hashlib
+import uuid
+
+from django.core.cache import cache
+from django.utils import timezone
+
+CHAVE_VERSAO_TA = 'compilacao:ta:versao:%s'
+CHAVE_TEXTO_TA = 'compilacao:ta:texto:%s:%s:%s'
+
+
+def versao_ta(ta_id):
+    """
+    Retorna (versão, data de modificação) do texto compilado de `ta_id`.
+    """
+    versao = cache.get(CHAVE_VERSAO_TA % ta_id)
+    if versao is None:
+        cache.add(CHAVE_VERSAO_TA % ta_id,
+                  (uuid.uuid4().hex[:12], timezone.now()), None)
+        versao = cache.get(CHAVE_VERSAO_TA % ta_id)
+    return versao
+
+
+def invalida_ta(*ta_ids):
+    for ta_id in set(ta_ids):
+        if ta_id:
+            cache.set(CHAVE_VERSAO_TA % ta_id,
+                      (uuid.uuid4().hex[:12], timezone.now()), None)
+
+
+def chave_texto(ta_id, versao, vigencia, modo):
+    variante = hashlib.md5(
+        '{}:{}'.format(vigencia, modo).encode()).hexdigest()
+    return CHAVE_TEXTO_TA % (ta_id, versao, variante)
+
+
+def get_texto(chave):
+    return cache.get(chave)
+
+
+def set_texto(chave, texto):
+    cache.set(chave, texto, None)
@@ -1,9 +1,10 @@
+from collections import OrderedDict
 
 from bs4 import BeautifulSoup
 from django.contrib import messages
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
-from django.db import models
+from django.db import models, transaction
 from django.db.models import F, Q
 from django.db.models.aggregates import Max
 from django.db.models.deletion import PROTECT
@@ -15,9 +16,11 @@ from django.utils.encoding import force_text
 from django.utils.translation import ugettext_lazy as _
 import reversion
 
+from sapl.compilacao.cache_texto import invalida_ta
 from sapl.compilacao.utils import (get_integrations_view_names, int_to_letter,
                                    int_to_roman)
-from sapl.utils import YES_NO_CHOICES, get_settings_auth_user_model
+from sapl.utils import (YES_NO_CHOICES, get_settings_auth_user_model,
+                        reserva_ids, update_em_lote)
 
 
 @reversion.register()
@@ -429,13 +432,8 @@ class TextoArticulado(TimestampedMixin):
 
         view_integracao = view_integracao[0]
 
-        ta = TextoArticulado.update_or_create(view_integracao, obj)
-
-        dispositivos = Dispositivo.objects.filter(ta=self).order_by('ordem')
-
-        map_ids = {}
-        for d in dispositivos:
-            id_old = d.id
+        with transaction.atomic(), reversion.create_revision():
+            ta = TextoArticulado.update_or_create(view_integracao, obj)
 
             # TODO
             # validar isso: é o suficiente para pegar apenas o texto válido?
@@ -443,83 +441,95 @@ class TextoArticulado(TimestampedMixin):
             #  quando uma matéria for alterada por uma emenda
             #  ao usar esta função para gerar uma norma deve vir apenas
             #  o texto válido, compilado...
-            if d.dispositivo_subsequente:
-                continue
-
-            d.id = None
-            d.inicio_vigencia = ta.data
-            d.fim_vigencia = None
-            d.inicio_eficacia = ta.data
-            d.fim_eficacia = None
-            d.publicacao = None
-            d.ta = ta
-            d.ta_publicado = None
-            d.dispositivo_subsequente = None
-            d.dispositivo_substituido = None
-            d.dispositivo_vigencia = None
-            d.dispositivo_atualizador = None
-            d.save()
-            map_ids[id_old] = d.id
-
-        dispositivos = Dispositivo.objects.filter(ta=ta).order_by('ordem')
-
-        for d in dispositivos:
-            if not d.dispositivo_pai:
-                continue
-
-            d.dispositivo_pai_id = map_ids[d.dispositivo_pai_id]
-            d.save()
-
+            dispositivos = list(Dispositivo.objects.filter(
+                ta=self, dispositivo_subsequente__isnull=True).order_by(
+                    'ordem'))
+
+            # Os ids da cópia são reservados antes da inserção, para que
+            # pai e raiz sejam remapeados em memória e a árvore inteira seja
+            # gravada com um único bulk_create, sem o save() de cada
+            # dispositivo (que não é necessário: texto, raiz e contagem
+            # contínua já foram normalizados no original).
+            map_ids = dict(zip([d.id for d in dispositivos],
+                               reserva_ids(Dispositivo, len(dispositivos))))
+            for d in dispositivos:
+                d.id = map_ids[d.id]
+                d.dispositivo_pai_id = map_ids.get(d.dispositivo_pai_id)
+                d.dispositivo_raiz_id = map_ids.get(d.dispositivo_raiz_id)
+                d.inicio_vigencia = ta.data
+                d.fim_vigencia = None
+                d.inicio_eficacia = ta.data
+                d.fim_eficacia = None
+                d.publicacao = None
+                d.ta = ta
+                d.ta_publicado = None
+                d.dispositivo_subsequente = None
+                d.dispositivo_substituido = None
+                d.dispositivo_vigencia = None
+                d.dispositivo_atualizador = None
+
+            Dispositivo.objects.bulk_create(dispositivos, batch_size=1000)
+
+            # os dispositivos gravados em lote não passam pelo reversion:
+            # a operação toda fica registrada em uma única revisão do texto
+            reversion.add_to_revision(ta)
+            reversion.set_comment(_('Texto clonado de %s') % self)
+
+        invalida_ta(ta.pk)
         return ta
 
-    def reagrupar_ordem_de_dispositivos(self):
+    def atualizar_ordens(self, ordens):
+        """
+        Grava as novas ordens (pk -> ordem) dos dispositivos do texto
+        em uma única transação. As ordens atuais são antes deslocadas para
+        além da maior ordem nova, evitando conflito com o unique_together
+        (ta, ordem) durante a atualização.
+        """
+        if not ordens:
+            return
 
         dpts = Dispositivo.objects.filter(ta=self)
+        with transaction.atomic():
+            ordem_max = dpts.aggregate(Max('ordem'))['ordem__max'] or 0
+            dpts.update(
+                ordem=F('ordem') + ordem_max + max(ordens.values()))
+            update_em_lote(Dispositivo, 'ordem', ordens)
+        invalida_ta(self.pk)
 
-        if not dpts.exists():
-            return
-
-        ordem_max = dpts.last().ordem
-        dpts.update(ordem=F('ordem') + ordem_max)
+    def reagrupar_ordem_de_dispositivos(self):
 
         dpts = Dispositivo.objects.filter(
             ta=self).values_list('pk', flat=True).order_by('ordem')
 
-        count = 0
-        for d in dpts:
-            count += Dispositivo.INTERVALO_ORDEM
-            Dispositivo.objects.filter(pk=d).update(ordem=count)
+        self.atualizar_ordens({
+            pk: (i + 1) * Dispositivo.INTERVALO_ORDEM
+            for i, pk in enumerate(dpts)})
 
     def reordenar_dispositivos(self):
 
-        dpts = Dispositivo.objects.filter(ta=self)
-
-        if not dpts.exists():
-            return
-
-        ordem_max = dpts.last().ordem
-        dpts.update(ordem=F('ordem') + ordem_max)
-
-        raizes = Dispositivo.objects.filter(
-            ta=self,
-            dispositivo_pai__isnull=True).values_list(
-                'pk', flat=True).order_by('ordem')
+        dpts = Dispositivo.objects.filter(ta=self).values_list(
+            'pk', 'dispositivo_pai_id').order_by('ordem')
 
-        count = []
-        count.append(Dispositivo.INTERVALO_ORDEM)
+        filhos = OrderedDict()
+        for pk, pai_id in dpts:
+            filhos.setdefault(pai_id, []).append(pk)
 
-        def update(dpk):
-            Dispositivo.objects.filter(pk=dpk).update(ordem=count[0])
-            count[0] = count[0] + Dispositivo.INTERVALO_ORDEM
-            filhos = Dispositivo.objects.filter(
-                dispositivo_pai_id=dpk).values_list(
-                'pk', flat=True).order_by('ordem')
+        # busca em profundidade a partir das raízes, na ordem atual
+        ordens = OrderedDict()
+        pilha = list(reversed(filhos.get(None, [])))
+        while pilha:
+            pk = pilha.pop()
+            if pk in ordens:
+                continue
+            ordens[pk] = (len(ordens) + 1) * Dispositivo.INTERVALO_ORDEM
+            pilha.extend(reversed(filhos.get(pk, [])))
 
-            for dpk in filhos:
-                update(dpk)
+        # dispositivos cujo pai não pertence a este texto vão para o fim
+        for pk, pai_id in dpts:
+            if pk not in ordens:
+                ordens[pk] = (len(ordens) + 1) * Dispositivo.INTERVALO_ORDEM
 
-        for dpk in raizes:
-            update(dpk)
+        self.atualizar_ordens(ordens)
 
 
 @reversion.register()
@@ -869,6 +879,7 @@ class Publicacao(TimestampedMixin):
 class Dispositivo(BaseModel, TimestampedMixin):
     TEXTO_PADRAO_DISPOSITIVO_REVOGADO = force_text(_('(Revogado)'))
     INTERVALO_ORDEM = 1000
+    DESLOCAMENTO_NUMERACAO = 10 ** 6
     ordem = models.PositiveIntegerField(
         default=0,
         verbose_name=_('Ordem de Renderização'))
@@ -1397,7 +1408,18 @@ class Dispositivo(BaseModel, TimestampedMixin):
         return result
 
     def criar_espaco(self, espaco_a_criar, local=None):
+        return self.alocar_ordens(espaco_a_criar, local=local)[0]
 
+    def alocar_ordens(self, espaco_a_criar, local=None):
+        """
+        Retorna `espaco_a_criar` ordens livres e crescentes para inserção
+        de dispositivos na posição indicada por `local`.
+
+        As lacunas deixadas por INTERVALO_ORDEM entre dispositivos são
+        usadas primeiro. Só quando a lacuna se esgota é que os dispositivos
+        seguintes são redistribuídos, e apenas os de uma janela local, até
+        que haja espaço suficiente.
+        """
         if local == 'json_add_next':
             proximo_bloco = Dispositivo.objects.filter(
                 ordem__gt=self.ordem,
@@ -1418,17 +1440,7 @@ class Dispositivo(BaseModel, TimestampedMixin):
                 ordem__gte=self.ordem,
                 ta_id=self.ta_id).first()
 
-        if proximo_bloco:
-            ordem = proximo_bloco.ordem
-            proximo_bloco = Dispositivo.objects.order_by('-ordem').filter(
-                ordem__gte=ordem,
-                ta_id=self.ta_id)
-
-            proximo_bloco.update(ordem=F('ordem') + 1)
-            proximo_bloco.update(
-                ordem=F('ordem') + (
-                    Dispositivo.INTERVALO_ORDEM * espaco_a_criar - 1))
-        else:
+        if not proximo_bloco:
             # inserção no fim do ta
             ordem_max = Dispositivo.objects.order_by(
                 'ordem').filter(
@@ -1437,8 +1449,53 @@ class Dispositivo(BaseModel, TimestampedMixin):
             if ordem_max['ordem__max'] is None:
                 raise Exception(
                     _('Não existem registros base neste Texto Articulado'))
-            ordem = ordem_max['ordem__max'] + Dispositivo.INTERVALO_ORDEM
-        return ordem
+            return [ordem_max['ordem__max'] + Dispositivo.INTERVALO_ORDEM * i
+                    for i in range(1, espaco_a_criar + 1)]
+
+        anterior = Dispositivo.objects.filter(
+            ordem__lt=proximo_bloco.ordem,
+            ta_id=self.ta_id).aggregate(Max('ordem'))['ordem__max'] or 0
+
+        if proximo_bloco.ordem - anterior > espaco_a_criar:
+            passo = (proximo_bloco.ordem - anterior) // (espaco_a_criar + 1)
+            return [anterior + passo * i
+                    for i in range(1, espaco_a_criar + 1)]
+
+        # Lacuna esgotada: a janela de dispositivos seguintes cresce até
+        # que o espaço entre `anterior` e o primeiro dispositivo fora dela
+        # comporte, com folga, a janela mais os novos dispositivos.
+        folga = Dispositivo.INTERVALO_ORDEM // 2
+        janela = []
+        limite = None
+        seguintes = Dispositivo.objects.filter(
+            ordem__gte=proximo_bloco.ordem,
+            ta_id=self.ta_id).order_by('ordem').values_list('pk', 'ordem')
+        for pk, ordem in seguintes.iterator():
+            if janela and ordem - anterior >= folga * (
+                    len(janela) + espaco_a_criar + 1):
+                limite = ordem
+                break
+            janela.append(pk)
+
+        total = len(janela) + espaco_a_criar
+        if limite is None:
+            passo = Dispositivo.INTERVALO_ORDEM
+        else:
+            passo = (limite - anterior) // (total + 1)
+        ordens = [anterior + passo * i for i in range(1, total + 1)]
+
+        with transaction.atomic():
+            # desloca a janela para além da maior ordem do texto antes de
+            # redistribuí-la, evitando conflito com o unique (ta, ordem)
+            ordem_max = Dispositivo.objects.filter(
+                ta_id=self.ta_id).aggregate(Max('ordem'))['ordem__max']
+            Dispositivo.objects.filter(pk__in=janela).update(
+                ordem=F('ordem') + ordem_max)
+            update_em_lote(Dispositivo, 'ordem', dict(
+                zip(janela, ordens[espaco_a_criar:])))
+        invalida_ta(self.ta_id)
+
+        return ordens[:espaco_a_criar]
 
     def organizar_niveis(self):
         if self.dispositivo_pai is None:
@@ -1573,8 +1630,30 @@ class Dispositivo(BaseModel, TimestampedMixin):
                 self.dispositivo0 = 1
                 self.rotulo = self.rotulo_padrao()
 
-            irmao.clean()
-            irmao.save()
+        Dispositivo.atualizar_numeracao(irmaos_a_salvar)
+
+    @staticmethod
+    def atualizar_numeracao(dispositivos):
+        """
+        Grava a numeração (dispositivo0 a dispositivo5) e o rótulo de
+        vários dispositivos com um UPDATE por lote, sem passar por save().
+        A numeração é antes deslocada para valores temporários, evitando
+        conflitos transitórios com o unique_together da numeração.
+        """
+        if not dispositivos:
+            return
+
+        campos = ('dispositivo0', 'dispositivo1', 'dispositivo2',
+                  'dispositivo3', 'dispositivo4', 'dispositivo5', 'rotulo')
+        with transaction.atomic():
+            Dispositivo.objects.filter(
+                pk__in=[d.pk for d in dispositivos]).update(
+                    dispositivo0=F('dispositivo0') +
+                    Dispositivo.DESLOCAMENTO_NUMERACAO)
+            update_em_lote(Dispositivo, campos, {
+                d.pk: tuple(getattr(d, campo) for campo in campos)
+                for d in dispositivos})
+        invalida_ta(*[d.ta_id for d in dispositivos])
 
     def select_roots(self):
         return Dispositivo.objects.order_by(
@@ -1708,6 +1787,7 @@ class Dispositivo(BaseModel, TimestampedMixin):
             count += Dispositivo.INTERVALO_ORDEM
             Dispositivo.objects.filter(pk=d).update(
                 ordem_bloco_atualizador=count)
+        invalida_ta(self.ta_id)
 
 
 @reversion.register()
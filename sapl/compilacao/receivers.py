@@ -0,0 +1,44 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from sapl.compilacao.cache_texto import invalida_ta
+from sapl.compilacao.models import (Dispositivo, Nota, Publicacao,
+                                    TextoArticulado, Vide)
+
+
+def tas_dos_dispositivos(*dispositivos_id):
+    return Dispositivo.objects.filter(
+        pk__in=dispositivos_id).values_list('ta_id', 'ta_publicado_id')
+
+
+@receiver(post_save, sender=TextoArticulado)
+@receiver(post_delete, sender=TextoArticulado)
+def invalida_texto_articulado(sender, instance, **kwargs):
+    invalida_ta(instance.pk)
+
+
+@receiver(post_save, sender=Dispositivo)
+@receiver(post_delete, sender=Dispositivo)
+def invalida_dispositivo(sender, instance, **kwargs):
+    invalida_ta(instance.ta_id, instance.ta_publicado_id)
+
+
+@receiver(post_save, sender=Publicacao)
+@receiver(post_delete, sender=Publicacao)
+def invalida_publicacao(sender, instance, **kwargs):
+    invalida_ta(instance.ta_id)
+
+
+@receiver(post_save, sender=Nota)
+@receiver(post_delete, sender=Nota)
+def invalida_nota(sender, instance, **kwargs):
+    for tas in tas_dos_dispositivos(instance.dispositivo_id):
+        invalida_ta(*tas)
+
+
+@receiver(post_save, sender=Vide)
+@receiver(post_delete, sender=Vide)
+def invalida_vide(sender, instance, **kwargs):
+    for tas in tas_dos_dispositivos(instance.dispositivo_base_id,
+                                    instance.dispositivo_ref_id):
+        invalida_ta(*tas)
@@ -0,0 +1,159 @@
+import time
+
+import pytest
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from model_mommy import mommy
+
+from sapl.compilacao.cache_texto import versao_ta
+from sapl.compilacao.models import (Dispositivo, TextoArticulado,
+                                    TipoDispositivo, TipoTextoArticulado)
+from sapl.norma.models import NormaJuridica
+# registra a integração NormaTaView, exigida por TextoArticulado.clone_for
+import sapl.norma.views  # noqa
+
+
+def cria_ta_sintetico(n_raizes, n_filhos):
+    """
+    Cria um texto articulado com `n_raizes` dispositivos raiz, cada um
+    com `n_filhos` filhos. Os filhos recebem ordens posteriores a todas as
+    raízes, de forma que a reordenação precise intercalá-los.
+    """
+    ta = mommy.make(TextoArticulado)
+    tipo = mommy.make(TipoDispositivo)
+    hoje = timezone.now().date()
+
+    def novo(ordem, numero, pai=None):
+        return Dispositivo(ta=ta, tipo_dispositivo=tipo, ordem=ordem,
+                           dispositivo0=numero, dispositivo_pai=pai,
+                           nivel=1 if pai else 0,
+                           inicio_vigencia=hoje, inicio_eficacia=hoje)
+
+    raizes = Dispositivo.objects.bulk_create(
+        [novo(i + 1, i + 1) for i in range(n_raizes)])
+
+    ordem = n_raizes
+    filhos = []
+    for raiz in raizes:
+        for j in range(n_filhos):
+            ordem += 1
+            filhos.append(novo(ordem, j + 1, raiz))
+    Dispositivo.objects.bulk_create(filhos)
+    return ta
+
+
+@pytest.mark.django_db(transaction=False)
+def test_reordenar_dispositivos_percorre_arvore_em_profundidade():
+    ta = cria_ta_sintetico(2, 2)
+
+    ta.reordenar_dispositivos()
+
+    dpts = list(Dispositivo.objects.filter(ta=ta).order_by('ordem'))
+    assert [d.ordem for d in dpts] == [
+        (i + 1) * Dispositivo.INTERVALO_ORDEM for i in range(6)]
+    assert [d.dispositivo_pai_id for d in dpts] == [
+        None, dpts[0].pk, dpts[0].pk, None, dpts[3].pk, dpts[3].pk]
+
+
+@pytest.mark.django_db(transaction=False)
+def test_reagrupar_ordem_de_dispositivos_mantem_sequencia():
+    ta = cria_ta_sintetico(3, 1)
+    antes = list(Dispositivo.objects.filter(
+        ta=ta).order_by('ordem').values_list('pk', flat=True))
+
+    ta.reagrupar_ordem_de_dispositivos()
+
+    depois = list(Dispositivo.objects.filter(
+        ta=ta).order_by('ordem').values_list('pk', 'ordem'))
+    assert [pk for pk, ordem in depois] == antes
+    assert [ordem for pk, ordem in depois] == [
+        (i + 1) * Dispositivo.INTERVALO_ORDEM for i in range(len(antes))]
+
+
+@pytest.mark.django_db(transaction=False)
+def test_benchmark_reordenar_dispositivos_ta_grande():
+    ta = cria_ta_sintetico(100, 50)
+
+    inicio = time.time()
+    with CaptureQueriesContext(connection) as consultas:
+        ta.reordenar_dispositivos()
+    duracao = time.time() - inicio
+
+    print('\nreordenar_dispositivos: 5100 dispositivos, '
+          '%s consultas, %.3fs' % (len(consultas), duracao))
+
+    # leitura + agregação + deslocamento + um UPDATE por lote de 1000
+    assert len(consultas) <= 15
+
+
+@pytest.mark.django_db(transaction=False)
+def test_alocar_ordens_usa_lacuna_existente():
+    ta = cria_ta_sintetico(3, 0)
+    ta.reagrupar_ordem_de_dispositivos()
+    base = Dispositivo.objects.get(ta=ta, ordem=2000)
+
+    with CaptureQueriesContext(connection) as consultas:
+        ordens = base.alocar_ordens(1)
+
+    assert ordens == [1500]
+    assert not any(q['sql'].startswith('UPDATE')
+                   for q in consultas.captured_queries)
+    assert list(Dispositivo.objects.filter(ta=ta).order_by(
+        'ordem').values_list('ordem', flat=True)) == [1000, 2000, 3000]
+
+
+@pytest.mark.django_db(transaction=False)
+def test_alocar_ordens_redistribui_janela_quando_lacuna_esgotada():
+    ta = cria_ta_sintetico(5, 0)
+    base = Dispositivo.objects.get(ta=ta, ordem=3)
+
+    ordens = base.alocar_ordens(1)
+
+    assert ordens == [1002]
+    assert list(Dispositivo.objects.filter(ta=ta).order_by(
+        'ordem').values_list('ordem', flat=True)) == [1, 2, 2002, 3002, 4002]
+
+
+@pytest.mark.django_db(transaction=False)
+def test_reordenar_dispositivos_invalida_texto_em_cache():
+    ta = cria_ta_sintetico(2, 1)
+    versao = versao_ta(ta.pk)
+
+    ta.reordenar_dispositivos()
+
+    assert versao_ta(ta.pk) != versao
+
+
+@pytest.mark.django_db(transaction=False)
+def test_clone_for_copia_arvore_em_lote():
+    ta = cria_ta_sintetico(3, 2)
+    # o tipo integrado às normas pode já existir no banco de testes
+    ta.tipo_ta, __ = TipoTextoArticulado.objects.get_or_create(
+        content_type=ContentType.objects.get_for_model(NormaJuridica),
+        defaults={'sigla': 'NJ', 'descricao': 'Norma Jurídica'})
+    ta.save()
+    norma = mommy.make(NormaJuridica)
+
+    with CaptureQueriesContext(connection) as consultas:
+        clone = ta.clone_for(norma)
+    n_consultas = len(consultas)
+
+    originais = list(Dispositivo.objects.filter(ta=ta).order_by('ordem'))
+    copias = list(Dispositivo.objects.filter(ta=clone).order_by('ordem'))
+    assert clone.content_object == norma
+    assert [d.ordem for d in copias] == [d.ordem for d in originais]
+
+    posicao = {d.pk: i for i, d in enumerate(originais)}
+    posicao_copia = {d.pk: i for i, d in enumerate(copias)}
+    assert [posicao.get(d.dispositivo_pai_id) for d in originais] == \
+        [posicao_copia.get(d.dispositivo_pai_id) for d in copias]
+
+    # o número de consultas não depende do tamanho do texto
+    ta_grande = cria_ta_sintetico(30, 10)
+    ta_grande.tipo_ta = ta.tipo_ta
+    ta_grande.save()
+    with CaptureQueriesContext(connection) as consultas:
+        ta_grande.clone_for(mommy.make(NormaJuridica))
+    assert len(consultas) <= n_consultas + 2
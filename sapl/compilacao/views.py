@@ -19,8 +19,12 @@ from django.db.models.query import QuerySet
 from django.http.response import (HttpResponse, HttpResponseRedirect,
                                   JsonResponse, Http404)
 from django.shortcuts import get_object_or_404, redirect
+from django.template.loader import render_to_string
+from django.utils.cache import get_conditional_response, patch_vary_headers
 from django.utils.dateparse import parse_date
 from django.utils.encoding import force_text
+from django.utils.http import http_date
+from django.utils.safestring import mark_safe
 from django.utils.translation import string_concat
 from django.utils.translation import ugettext_lazy as _
 from django.views.generic.base import TemplateView
@@ -40,7 +44,11 @@ from sapl.compilacao.forms import (DispositivoDefinidorVigenciaForm,
                                    DispositivoSearchModalForm, NotaForm,
                                    PublicacaoForm, TaForm,
                                    TextNotificacoesForm, TipoTaForm, VideForm)
-from sapl.compilacao.models import (STATUS_TA_EDITION, STATUS_TA_PRIVATE,
+from sapl.compilacao.cache_texto import (chave_texto, get_texto,
+                                         invalida_ta, set_texto, versao_ta)
+from sapl.compilacao.models import (STATUS_TA_EDITION,
+                                    STATUS_TA_IMMUTABLE_PUBLIC,
+                                    STATUS_TA_PRIVATE,
                                     STATUS_TA_PUBLIC, Dispositivo, Nota,
                                     PerfilEstruturalTextoArticulado,
                                     Publicacao, TextoArticulado,
@@ -899,16 +907,51 @@ class TextView(CompMixin, ListView):
     fim_vigencia = None
     ta_vigencia = None
 
+    # O texto renderizado de textos públicos é mantido em cache para
+    # visitantes anônimos (ver sapl.compilacao.cache_texto)
+    cache_texto = True
+
+    chave_cache = None
+    texto_renderizado = None
+
     def has_permission(self):
         self.object = self.ta
         return self.object.has_view_permission(self.request)
 
+    def texto_cacheavel(self):
+        return (self.cache_texto and
+                not self.request.user.is_authenticated and
+                self.object.privacidade in (STATUS_TA_PUBLIC,
+                                            STATUS_TA_IMMUTABLE_PUBLIC))
+
     def get(self, request, *args, **kwargs):
+        modo = ''
         if 'print' in request.GET:
             self.template_name = 'compilacao/text_list__print_version.html'
+            modo = 'print'
         if 'embedded' in request.GET:
             self.template_name = 'compilacao/text_list__embedded.html'
-        return ListView.get(self, request, *args, **kwargs)
+            modo = 'embedded'
+
+        if not self.texto_cacheavel():
+            return ListView.get(self, request, *args, **kwargs)
+
+        versao, modificado = versao_ta(self.kwargs['ta_id'])
+        self.chave_cache = chave_texto(
+            self.kwargs['ta_id'], versao, self.kwargs.get('sign', ''), modo)
+        etag = '"%s-%s"' % (versao, self.chave_cache.rsplit(':', 1)[-1])
+        last_modified = int(modificado.timestamp())
+
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified)
+        if response is None:
+            self.texto_renderizado = get_texto(self.chave_cache)
+            response = ListView.get(self, request, *args, **kwargs)
+
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        patch_vary_headers(response, ('Cookie', ))
+        return response
 
     def get_context_data(self, **kwargs):
         context = super(TextView, self).get_context_data(**kwargs)
@@ -916,6 +959,14 @@ class TextView(CompMixin, ListView):
         context['object'] = TextoArticulado.objects.get(
             pk=self.kwargs['ta_id'])
 
+        if self.texto_renderizado is not None:
+            context['ta_pub_list'] = {
+                ta.pk: str(ta) for ta in TextoArticulado.objects.filter(
+                    dispositivos_alterados_pelo_ta_set__ta_id=self.kwargs[
+                        'ta_id']).distinct()}
+            context['texto_renderizado'] = mark_safe(self.texto_renderizado)
+            return context
+
         cita = Vide.objects.filter(
             Q(dispositivo_base__ta_id=self.kwargs['ta_id'])).\
             select_related(
@@ -963,6 +1014,13 @@ class TextView(CompMixin, ListView):
 
         # context['vigencias'] = self.get_vigencias()
 
+        if self.chave_cache:
+            self.texto_renderizado = render_to_string(
+                'compilacao/text_list_bloco.html',
+                dict(context, view=self), self.request)
+            set_texto(self.chave_cache, self.texto_renderizado)
+            context['texto_renderizado'] = mark_safe(self.texto_renderizado)
+
         return context
 
     def get_queryset(self):
@@ -973,6 +1031,12 @@ class TextView(CompMixin, ListView):
         self.inicio_vigencia = None
         self.fim_vigencia = None
         self.ta_vigencia = None
+
+        qs = Dispositivo.objects.filter(
+            ordem__gt=0,
+            ta_id=self.kwargs['ta_id'],
+        )
+
         if 'sign' in self.kwargs:
             signer = Signer()
             try:
@@ -981,24 +1045,15 @@ class TextView(CompMixin, ListView):
                 self.inicio_vigencia = parse_date(string[1])
                 self.fim_vigencia = parse_date(string[2])
             except:
-                return Dispositivo.objects.filter(
-                    ordem__gt=0,
-                    ta_id=self.kwargs['ta_id'],
-                ).select_related(*DISPOSITIVO_SELECT_RELATED)
-
-            return Dispositivo.objects.filter(
-                inicio_vigencia__lte=self.fim_vigencia,
-                ordem__gt=0,
-                ta_id=self.kwargs['ta_id'],
-            ).select_related(*DISPOSITIVO_SELECT_RELATED)
-        else:
+                pass
+            else:
+                qs = qs.filter(inicio_vigencia__lte=self.fim_vigencia)
 
-            r = Dispositivo.objects.filter(
-                ordem__gt=0,
-                ta_id=self.kwargs['ta_id'],
-            ).select_related(*DISPOSITIVO_SELECT_RELATED)
+        if self.texto_renderizado is not None:
+            # o texto já está renderizado: basta saber se há dispositivos
+            return qs.values_list('pk', flat=True)[:1]
 
-            return r
+        return qs.select_related(*DISPOSITIVO_SELECT_RELATED)
 
     def get_vigencias(self):
         itens = Dispositivo.objects.filter(
@@ -1066,6 +1121,7 @@ class TextView(CompMixin, ListView):
 class DispositivoView(TextView):
     # template_name = 'compilacao/index.html'
     template_name = 'compilacao/text_list_bloco.html'
+    cache_texto = False
 
     def get_queryset(self):
         self.flag_alteradora = -1
@@ -2150,12 +2206,17 @@ class ActionDispositivoCreateMixin(ActionsCommonsMixin):
                 inicio_vigencia=dvt.inicio_vigencia,
                 inicio_eficacia=dvt.inicio_eficacia)
 
-            Dispositivo.objects.filter(ta_publicado=dvt.ta
-                                       ).update(
+            publicados = Dispositivo.objects.filter(ta_publicado=dvt.ta)
+            tas_publicados = set(publicados.values_list('ta_id', flat=True))
+            publicados.update(
                 dispositivo_vigencia=dvt,
                 inicio_vigencia=dvt.inicio_eficacia,
                 inicio_eficacia=dvt.inicio_eficacia)
 
+            # update() não dispara signals: os textos em cache do TA e dos
+            # TAs que publicaram alterações nele são invalidados aqui
+            invalida_ta(dvt.ta_id, *tas_publicados)
+
             dps = Dispositivo.objects.filter(dispositivo_vigencia=dvt)
             for d in dps:
                 if d.dispositivo_substituido:
@@ -2323,13 +2384,13 @@ class ActionDispositivoCreateMixin(ActionsCommonsMixin):
             # Inserção automática
             if count_auto_insert:
 
-                ordem = dp.criar_espaco(
+                ordens = dp.alocar_ordens(
                     espaco_a_criar=count_auto_insert, local='json_add_in')
 
                 dp_pk = dp.pk
-                dp.ordem = ordem
                 dp.nivel += 1
-                for tipoauto in tipos_dp_auto_insert:
+                for tipoauto, ordem in zip(tipos_dp_auto_insert, ordens):
+                    dp.ordem = ordem
                     dp.dispositivo_pai_id = dp_pk
                     dp.pk = None
                     dp.tipo_dispositivo = tipoauto.filho_permitido
@@ -2344,8 +2405,6 @@ class ActionDispositivoCreateMixin(ActionsCommonsMixin):
                     dp.auto_inserido = True
                     dp.save()
                     dp_auto_insert = dp
-
-                    ordem += Dispositivo.INTERVALO_ORDEM
                 dp = Dispositivo.objects.get(pk=dp_pk)
 
             ''' Reenquadrar todos os dispositivos que possuem pai
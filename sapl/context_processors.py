@@ -3,6 +3,7 @@ import logging
 from django.conf import settings
 from django.utils.translation import ugettext_lazy as _
 
+from sapl.base.configuracoes import contadores
 from sapl.base.views import get_casalegislativa
 from sapl.utils import mail_service_configured as mail_service_configured_utils
 
@@ -15,6 +16,13 @@ def parliament_info(request):
         return {}
 
 
+def contadores_configuracoes(request):
+    # acertos/faltas do cache de AppConfig e CasaLegislativa, em depuração
+    if not settings.DEBUG:
+        return {}
+    return {'contadores_configuracoes': dict(contadores)}
+
+
 def mail_service_configured(request):
 
     if not mail_service_configured_utils(request):
@@ -7,8 +7,14 @@ from crispy_forms.layout import HTML, Div, Fieldset, Layout, Submit
 from django import template
 from django.core.urlresolvers import reverse, reverse_lazy
 from django.utils import formats
+from django.utils.translation import get_language
 from django.utils.translation import ugettext as _
 
+# layouts já compilados, por (arquivo yaml, chave, idioma). Os arquivos
+# yaml só mudam com um novo deploy, portanto o cache vale para todo o
+# processo; em desenvolvimento use invalida_cache_layouts()
+_cache_layouts = {}
+
 
 def heads_and_tails(list_of_lists):
     for alist in list_of_lists:
@@ -289,7 +295,6 @@ class CrispyLayoutFormMixin:
 
 
 def read_yaml_from_file(yaml_layout):
-    # TODO cache this at application level
     t = template.loader.get_template(yaml_layout)
     # aqui é importante converter para str pois, dependendo do ambiente,
     # o rtyaml pode usar yaml.CSafeLoader, que exige str ou stream
@@ -297,8 +302,7 @@ def read_yaml_from_file(yaml_layout):
     return rtyaml.load(rendered)
 
 
-def read_layout_from_yaml(yaml_layout, key):
-    # TODO cache this at application level
+def compila_layout(yaml_layout, key):
     yaml = read_yaml_from_file(yaml_layout)
     base = yaml[key]
 
@@ -316,3 +320,25 @@ def read_layout_from_yaml(yaml_layout, key):
 
     return [[legend] + [line_to_namespans(l) for l in lines]
             for legend, lines in base.items()]
+
+
+def read_layout_from_yaml(yaml_layout, key):
+    chave = (yaml_layout, key, get_language())
+    layout = _cache_layouts.get(chave)
+    if layout is None:
+        layout = compila_layout(yaml_layout, key)
+        _cache_layouts[chave] = layout
+
+    # cópia das listas para que a view possa alterar o layout recebido
+    # sem afetar o que está no cache
+    return [[fieldset[0]] + [list(row) for row in fieldset[1:]]
+            for fieldset in layout]
+
+
+def invalida_cache_layouts():
+    """
+    Descarta os layouts compilados, forçando a releitura dos arquivos
+    layouts.yaml. Útil em desenvolvimento, ao editar um layout sem
+    reiniciar o servidor.
+    """
+    _cache_layouts.clear()
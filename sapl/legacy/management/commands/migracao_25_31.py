@@ -15,6 +15,23 @@ class Command(BaseCommand):
             dest='apagar_do_legado',
             help='Apagar entradas migradas do legado',
         )
+        parser.add_argument(
+            '-r',
+            action='store_true',
+            default=False,
+            dest='retomar',
+            help='Retomar a migração interrompida a partir dos checkpoints',
+        )
+        parser.add_argument(
+            '-p',
+            type=int,
+            default=1,
+            dest='processos',
+            help='Número de processos para migrar models independentes '
+                 'em paralelo',
+        )
 
     def handle(self, *args, **options):
-        migrar(apagar_do_legado=options['apagar_do_legado'])
+        migrar(apagar_do_legado=options['apagar_do_legado'],
+               retomar=options['retomar'],
+               processos=options['processos'])
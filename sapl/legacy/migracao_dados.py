@@ -1,12 +1,15 @@
 import datetime
+import json
 import os
 import re
 import subprocess
+import time
 import traceback
 from collections import OrderedDict, defaultdict, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from datetime import date
 from functools import lru_cache, partial
-from itertools import groupby
+from itertools import groupby, islice
 from operator import xor
 
 import git
@@ -16,20 +19,22 @@ import pytz
 import reversion
 import yaml
 from bs4 import BeautifulSoup
+from MySQLdb.cursors import SSCursor
 from django.apps import apps
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
 from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import ObjectDoesNotExist
 from django.core.management.commands.flush import Command as FlushCommand
-from django.db import connections, transaction
+from django.db import connections, reset_queries, transaction
 from django.db.models import Max, Q
 from pyaml import UnsafePrettyYAMLDumper
 from unipath import Path
 
 from sapl.base.models import AppConfig as AppConf
 from sapl.base.models import Autor, TipoAutor, cria_models_tipo_autor
-from sapl.comissoes.models import Comissao, Composicao, Participacao, Reuniao
+from sapl.comissoes.models import (Comissao, Composicao, Participacao, Periodo,
+                                    Reuniao)
 from sapl.legacy.models import NormaJuridica as OldNormaJuridica
 from sapl.legacy.models import TipoNumeracaoProtocolo
 from sapl.legacy_migration_settings import (DIR_DADOS_MIGRACAO, DIR_REPO,
@@ -250,10 +255,48 @@ class ForeignKeyFaltando(ObjectDoesNotExist):
                             ('sql', sql)))
 
 
-@lru_cache()
+# ids dos models relacionados, carregados uma única vez por model migrado
+# (o cache é esvaziado no início de migrar_model)
+_ids_por_model = {}
+
+
 def _get_all_ids_from_model(model):
     # esta função para uso apenas em get_fk_related
-    return set(model.objects.values_list('id', flat=True))
+    ids = _ids_por_model.get(model)
+    if ids is None:
+        ids = _ids_por_model[model] = set(
+            model.objects.values_list('id', flat=True))
+    return ids
+
+
+def get_campos_fk_migrados(model):
+    renames = field_renames[model]
+    return [field for field in model._meta.fields
+            if field.get_internal_type() == 'ForeignKey'
+            and renames.get(field.name)]
+
+
+def detecta_orfaos(model, tabela_legado):
+    """Retorna, para cada FK migrada de `model`, o conjunto de valores do
+    legado que não existem na tabela relacionada (a diferença entre os
+    valores distintos da coluna no legado e os ids da nova base)"""
+
+    filtro = ''
+    if existe_coluna_no_legado(tabela_legado, 'ind_excluido'):
+        filtro = ' where ind_excluido <> 1'
+    orfaos = OrderedDict()
+    for field in get_campos_fk_migrados(model):
+        campo = campos_novos_para_antigos[field]
+        valores = set(primeira_coluna(exec_legado(
+            'select distinct {} from {}{}'.format(
+                campo, tabela_legado, filtro))))
+        valores -= _get_all_ids_from_model(field.related_model)
+        if field.null:
+            # nulos e zeros são considerados nulos (ver get_fk_related)
+            valores -= {None, 0}
+        if valores:
+            orfaos[field] = valores
+    return orfaos
 
 
 def get_fk_related(field, old):
@@ -759,23 +802,108 @@ class Record:
     pass
 
 
-def iter_sql_records(tabela):
+class CheckpointInvalido(Exception):
+    pass
+
+
+def sql_registros_legado(tabela, campos_pk, filtra_excluidos, apos_pk=None):
+    """SQL (e parâmetros) que percorre os registros de `tabela` em ordem
+    estável, a partir do registro seguinte à pk `apos_pk` (keyset), para que
+    a migração possa ser retomada sem reler os registros já migrados"""
+    params = []
     if tabela == 'despacho_inicial':
-        sql = ''' select cod_materia, cod_comissao from despacho_inicial
+        # agrupado por (cod_materia, cod_comissao); a retomada usa a mesma
+        # expressão da ordenação, com a menor num_ordem do registro da pk
+        sql = """ select cod_materia, cod_comissao from despacho_inicial
         where ind_excluido <> 1
         group by cod_materia, cod_comissao
-        order by cod_materia, min(num_ordem)
-        '''
-    else:
-        sql = 'select * from ' + tabela
-        if existe_coluna_no_legado(tabela, 'ind_excluido'):
-            sql += ' where ind_excluido <> 1'
-    cursor = exec_legado(sql)
-    fieldnames = [name[0] for name in cursor.description]
-    for row in cursor.fetchall():
-        record = Record()
-        record.__dict__.update(zip(fieldnames, row))
-        yield record
+        """
+        if apos_pk is not None:
+            cod_materia, cod_comissao, num_ordem = apos_pk
+            sql += """having (cod_materia, min(num_ordem), cod_comissao)
+            > (%s, %s, %s)
+            """
+            params = [cod_materia, num_ordem, cod_comissao]
+        sql += 'order by cod_materia, min(num_ordem), cod_comissao'
+        return sql, params
+
+    condicoes = []
+    if filtra_excluidos:
+        condicoes.append('ind_excluido <> 1')
+    if apos_pk is not None:
+        condicoes.append('({}) > ({})'.format(
+            ', '.join(campos_pk), ', '.join(['%s'] * len(campos_pk))))
+        params = list(apos_pk)
+    sql = 'select * from ' + tabela
+    if condicoes:
+        sql += ' where ' + ' and '.join(condicoes)
+    sql += ' order by ' + ', '.join(campos_pk)
+    return sql, params
+
+
+def iter_sql_records(tabela, apos_pk=None):
+    """Percorre os registros de `tabela` no legado com um cursor do lado do
+    servidor, sem carregar a tabela inteira na memória, a partir do
+    registro seguinte à pk `apos_pk`, se informada"""
+    campos_pk = get_pk_legado(tabela)
+    if apos_pk is not None and tabela == 'despacho_inicial':
+        with connections['legacy'].cursor() as cursor:
+            cursor.execute(
+                """select min(num_ordem) from despacho_inicial
+                where ind_excluido <> 1
+                and cod_materia = %s and cod_comissao = %s""", apos_pk)
+            num_ordem = cursor.fetchone()[0]
+        if num_ordem is None:
+            raise CheckpointInvalido(
+                'Registro {} do checkpoint de despacho_inicial não existe '
+                'mais no legado. Não é possível retomar a migração.'.format(
+                    apos_pk))
+        apos_pk = list(apos_pk) + [num_ordem]
+    sql, params = sql_registros_legado(
+        tabela, campos_pk, existe_coluna_no_legado(tabela, 'ind_excluido'),
+        apos_pk)
+
+    # conexão própria: enquanto o cursor do lado do servidor está aberto
+    # a conexão não pode ser usada para outras consultas
+    legado = connections['legacy']
+    conexao = legado.get_new_connection(legado.get_connection_params())
+    try:
+        cursor = conexao.cursor(SSCursor)
+        cursor.execute(sql, params)
+        fieldnames = [name[0] for name in cursor.description]
+        while True:
+            rows = cursor.fetchmany(TAMANHO_LOTE_MIGRACAO)
+            if not rows:
+                break
+            for row in rows:
+                record = Record()
+                record.__dict__.update(zip(fieldnames, row))
+                yield record
+    finally:
+        conexao.close()
+
+
+def iter_lotes(records, tamanho=None):
+    records = iter(records)
+    while True:
+        lote = list(islice(records, tamanho or TAMANHO_LOTE_MIGRACAO))
+        if not lote:
+            return
+        yield lote
+
+
+def iter_lotes_por_pk(old_records, nome_pk, ultima_pk=None, tamanho=None):
+    """Percorre `old_records` (ordenados por `nome_pk`) em lotes,
+    consultando cada lote a partir da última pk do lote anterior"""
+    while True:
+        restantes = old_records
+        if ultima_pk is not None:
+            restantes = old_records.filter(**{nome_pk + '__gt': ultima_pk})
+        lote = list(restantes[:tamanho or TAMANHO_LOTE_MIGRACAO])
+        if not lote:
+            return
+        yield lote
+        ultima_pk = getattr(lote[-1], nome_pk)
 
 
 def fill_vinculo_norma_juridica():
@@ -830,6 +958,70 @@ def fill_dados_basicos():
     appconf.save()
 
 
+# CHECKPOINTS ###############################################################
+
+# quantidade de registros do legado lidos, convertidos e gravados por vez
+TAMANHO_LOTE_MIGRACAO = 1000
+
+# tabela na nova base que guarda, por model, a última pk do legado migrada
+SQL_CRIA_TABELA_CHECKPOINT = '''
+create table if not exists legacy_migracao_checkpoint (
+    model varchar(100) primary key,
+    ultima_pk_legado text,
+    registros integer not null default 0,
+    concluido boolean not null default false,
+    atualizado timestamp with time zone not null default now()
+)'''
+
+Checkpoint = namedtuple('Checkpoint', 'ultima_pk_legado registros concluido')
+
+
+def garante_tabela_checkpoint():
+    exec_sql(SQL_CRIA_TABELA_CHECKPOINT)
+
+
+def apaga_checkpoints():
+    garante_tabela_checkpoint()
+    exec_sql('delete from legacy_migracao_checkpoint')
+
+
+def existem_checkpoints():
+    garante_tabela_checkpoint()
+    return exec_sql(
+        'select count(*) from legacy_migracao_checkpoint').fetchone()[0] > 0
+
+
+def get_checkpoint(model):
+    garante_tabela_checkpoint()
+    cursor = connections['default'].cursor()
+    cursor.execute(
+        '''select ultima_pk_legado, registros, concluido
+        from legacy_migracao_checkpoint where model = %s''',
+        [model._meta.label])
+    res = cursor.fetchone()
+    if res is None:
+        return None
+    ultima_pk, registros, concluido = res
+    return Checkpoint(json.loads(ultima_pk) if ultima_pk else None,
+                      registros, concluido)
+
+
+def grava_checkpoint(model, ultima_pk, registros, concluido=False):
+    cursor = connections['default'].cursor()
+    cursor.execute(
+        '''insert into legacy_migracao_checkpoint
+        (model, ultima_pk_legado, registros, concluido, atualizado)
+        values (%s, %s, %s, %s, now())
+        on conflict (model) do update set
+            ultima_pk_legado = excluded.ultima_pk_legado,
+            registros = excluded.registros,
+            concluido = excluded.concluido,
+            atualizado = excluded.atualizado''',
+        [model._meta.label,
+         json.dumps(ultima_pk, default=str) if ultima_pk else None,
+         registros, concluido])
+
+
 def reinicia_sequence(model, id):
     sequence_name = '%s_id_seq' % model._meta.db_table
     exec_sql('ALTER SEQUENCE %s RESTART WITH %s MINVALUE -1;' % (
@@ -883,49 +1075,65 @@ def get_arquivo_ajustes_pre_migracao():
         'ajustes_pre_migracao', '{}.sql'.format(SIGLA_CASA))
 
 
-def migrar_dados(apagar_do_legado=False):
-    try:
-        ocorrencias.clear()
-        ocorrencias.default_factory = list
+def restaura_e_prepara_bancos():
+    # restaura dump
+    arq_dump = Path(DIR_DADOS_MIGRACAO.child(
+        'dumps_mysql', '{}.sql'.format(NOME_BANCO_LEGADO)))
+    assert arq_dump.exists(), 'Dump do mysql faltando: {}'.format(arq_dump)
+    info('Restaurando dump mysql de [{}]'.format(arq_dump))
+    normaliza_dump_mysql(arq_dump)
+    roda_comando_shell('mysql -uroot < {}'.format(arq_dump))
 
-        # restaura dump
-        arq_dump = Path(DIR_DADOS_MIGRACAO.child(
-            'dumps_mysql', '{}.sql'.format(NOME_BANCO_LEGADO)))
-        assert arq_dump.exists(), 'Dump do mysql faltando: {}'.format(arq_dump)
-        info('Restaurando dump mysql de [{}]'.format(arq_dump))
-        normaliza_dump_mysql(arq_dump)
-        roda_comando_shell('mysql -uroot < {}'.format(arq_dump))
+    # desliga checagens do mysql
+    # e possibilita inserir valor zero em campos de autoincremento
+    exec_legado('SET SESSION sql_mode = "NO_AUTO_VALUE_ON_ZERO";')
 
-        # desliga checagens do mysql
-        # e possibilita inserir valor zero em campos de autoincremento
-        exec_legado('SET SESSION sql_mode = "NO_AUTO_VALUE_ON_ZERO";')
+    # executa ajustes pré-migração, se existirem
+    arq_ajustes_pre_migracao = get_arquivo_ajustes_pre_migracao()
+    if arq_ajustes_pre_migracao.exists():
+        exec_legado(arq_ajustes_pre_migracao.read_file())
 
-        # executa ajustes pré-migração, se existirem
-        arq_ajustes_pre_migracao = get_arquivo_ajustes_pre_migracao()
-        if arq_ajustes_pre_migracao.exists():
-            exec_legado(arq_ajustes_pre_migracao.read_file())
+    uniformiza_banco()
 
-        uniformiza_banco()
+    # excluindo database antigo.
+    info('Excluindo entradas antigas do banco destino.')
+    flush = FlushCommand()
+    flush.handle(database='default', interactive=False, verbosity=0)
+    apaga_checkpoints()
 
-        # excluindo database antigo.
-        info('Excluindo entradas antigas do banco destino.')
-        flush = FlushCommand()
-        flush.handle(database='default', interactive=False, verbosity=0)
+    # apaga tipos de autor padrão (criados no flush acima)
+    TipoAutor.objects.all().delete()
 
-        # apaga tipos de autor padrão (criados no flush acima)
-        TipoAutor.objects.all().delete()
+    fill_vinculo_norma_juridica()
+    fill_dados_basicos()
+
+
+def migrar_dados(apagar_do_legado=False, retomar=False, processos=1):
+    arq_ocorrencias = Path(REPO.working_dir, 'ocorrencias.yaml')
+    try:
+        ocorrencias.clear()
+        ocorrencias.default_factory = list
+
+        if retomar and existem_checkpoints():
+            # continua a partir dos checkpoints da migração interrompida,
+            # sem restaurar o dump nem apagar o banco destino
+            info('Retomando migração interrompida.')
+            exec_legado('SET SESSION sql_mode = "NO_AUTO_VALUE_ON_ZERO";')
+            if arq_ocorrencias.exists():
+                with open(arq_ocorrencias, 'r') as arq:
+                    ocorrencias.update(yaml.load(arq) or {})
+                ocorrencias.pop('traceback', None)
+        else:
+            restaura_e_prepara_bancos()
 
-        fill_vinculo_norma_juridica()
-        fill_dados_basicos()
         info('Começando migração: ...')
-        migrar_todos_os_models(apagar_do_legado)
+        migrar_todos_os_models(apagar_do_legado, processos)
     except Exception as e:
         ocorrencias['traceback'] = str(traceback.format_exc())
         raise e
     finally:
         # congela e grava ocorrências
         ocorrencias.default_factory = None
-        arq_ocorrencias = Path(REPO.working_dir, 'ocorrencias.yaml')
         with open(arq_ocorrencias, 'w') as arq:
             pyaml.dump(ocorrencias, arq, vspacing=1, width=200)
         REPO.git.add([arq_ocorrencias.name])
@@ -969,17 +1177,193 @@ def get_models_a_migrar():
     return models
 
 
-def migrar_todos_os_models(apagar_do_legado):
-    for model in get_models_a_migrar():
+# model -> (registros migrados, órfãos ignorados, segundos)
+estatisticas_migracao = OrderedDict()
+
+
+def relatorio_vazao():
+    linhas = ['{:<30} {:>9} {:>7} {:>9} {:>11}'.format(
+        'Model', 'Registros', 'Órfãos', 'Segundos', 'Registros/s')]
+    for model, (registros, orfaos, segundos) in \
+            estatisticas_migracao.items():
+        linhas.append('{:<30} {:>9} {:>7} {:>9.1f} {:>11.1f}'.format(
+            model.__name__, registros, orfaos, segundos,
+            registros / segundos if segundos else 0))
+    return '\n'.join(linhas)
+
+
+# dependências que não aparecem nas ForeignKeys migradas:
+# campos virtuais e registros consultados ou criados nos ajustes
+DEPENDENCIAS_EXTRAS = {
+    TipoProposicao: [TipoMateriaLegislativa, TipoDocumento],
+    Proposicao: [MateriaLegislativa, DocumentoAcessorio],
+    Autor: [Parlamentar, Comissao, Partido],
+    Participacao: [Comissao, Periodo],
+    DocumentoAdministrativo: [Protocolo],
+    RegistroVotacao: [OrdemDia, ExpedienteMateria],
+}
+
+
+def get_dependencias(models):
+    """Grafo (DAG) de dependências entre os `models` a migrar: cada model
+    depende dos models referenciados pelas suas ForeignKeys migradas e
+    ManyToMany, além de DEPENDENCIAS_EXTRAS"""
+
+    a_migrar = set(models)
+    dependencias = OrderedDict()
+    for model in models:
+        relacionados = {field.related_model
+                        for field in get_campos_fk_migrados(model)}
+        relacionados |= {field.related_model
+                         for field in model._meta.many_to_many}
+        relacionados |= set(DEPENDENCIAS_EXTRAS.get(model, []))
+        dependencias[model] = {m for m in relacionados
+                               if m in a_migrar and m != model}
+
+    # garante que não há ciclos
+    ordenados = set()
+    restantes = OrderedDict(dependencias)
+    while restantes:
+        prontos = [m for m, deps in restantes.items() if deps <= ordenados]
+        assert prontos, 'Dependências circulares entre {}'.format(
+            [m.__name__ for m in restantes])
+        for model in prontos:
+            ordenados.add(model)
+            del restantes[model]
+    return dependencias
+
+
+def caminho_critico(dependencias, duracoes):
+    """Retorna (caminho, duração) da cadeia de dependências mais longa,
+    que limita o tempo total da migração em paralelo"""
+
+    termino, anterior = {}, {}
+
+    def calcula(model):
+        if model not in termino:
+            deps = dependencias[model]
+            anterior[model] = max(deps, key=calcula) if deps else None
+            termino[model] = duracoes.get(model, 0) + (
+                termino[anterior[model]] if anterior[model] else 0)
+        return termino[model]
+
+    if not dependencias:
+        return [], 0
+    ultimo = max(dependencias, key=calcula)
+    caminho = []
+    model = ultimo
+    while model:
+        caminho.insert(0, model)
+        model = anterior[model]
+    return caminho, termino[ultimo]
+
+
+def relatorio_caminho_critico(dependencias, duracao_total):
+    duracoes = {model: segundos for model, (_, _, segundos)
+                in estatisticas_migracao.items()}
+    caminho, duracao_caminho = caminho_critico(dependencias, duracoes)
+    linhas = ['{:<30} {:>9.1f}'.format(model.__name__,
+                                       duracoes.get(model, 0))
+              for model in caminho]
+    linhas.append('Caminho crítico: {:.1f}s / tempo total: {:.1f}s / '
+                  'soma dos models: {:.1f}s'.format(
+                      duracao_caminho, duracao_total,
+                      sum(duracoes.values())))
+    return '\n'.join(linhas)
+
+
+def _migrar_model_em_processo(label, apagar_do_legado):
+    """Executada em um processo do pool: migra o model e devolve as
+    ocorrências e estatísticas, que de outra forma ficariam no processo"""
+
+    model = apps.get_model(label)
+    ocorrencias.clear()
+    estatisticas_migracao.clear()
+    erro = None
+    try:
         migrar_model(model, apagar_do_legado)
+    except Exception:
+        erro = traceback.format_exc()
+    finally:
+        connections.close_all()
+    return dict(ocorrencias), estatisticas_migracao.get(model), erro
+
+
+def migrar_em_paralelo(dependencias, apagar_do_legado, processos):
+    """Migra em um pool de processos os models cujas dependências já foram
+    migradas; cada processo usa suas próprias conexões com os bancos"""
+
+    # as conexões abertas não podem ser compartilhadas com os filhos
+    connections.close_all()
+
+    pendentes = OrderedDict(dependencias)
+    migrados = set()
+    em_execucao = {}
+    with ProcessPoolExecutor(max_workers=processos) as pool:
+        while pendentes or em_execucao:
+            for model in [m for m, deps in pendentes.items()
+                          if deps <= migrados]:
+                del pendentes[model]
+                em_execucao[pool.submit(
+                    _migrar_model_em_processo,
+                    model._meta.label, apagar_do_legado)] = model
+
+            concluidos, _ = wait(em_execucao, return_when=FIRST_COMPLETED)
+            for future in concluidos:
+                model = em_execucao.pop(future)
+                ocorrencias_model, estatisticas, erro = future.result()
+                for tipo, dados in ocorrencias_model.items():
+                    ocorrencias[tipo].extend(dados)
+                if estatisticas:
+                    estatisticas_migracao[model] = estatisticas
+                if erro:
+                    raise Exception('Falha migrando {}:\n{}'.format(
+                        model.__name__, erro))
+                migrados.add(model)
+
+
+def migrar_todos_os_models(apagar_do_legado, processos=1):
+    estatisticas_migracao.clear()
+    models = get_models_a_migrar()
+    inicio = time.time()
+    if processos > 1:
+        dependencias = get_dependencias(models)
+        migrar_em_paralelo(dependencias, apagar_do_legado, processos)
+    else:
+        # em sequência, cada model depende do anterior
+        dependencias = OrderedDict(
+            (model, {models[i - 1]} if i else set())
+            for i, model in enumerate(models))
+        for model in models:
+            migrar_model(model, apagar_do_legado)
+    duracao = time.time() - inicio
+    info('Vazão da migração por model:\n' + relatorio_vazao())
+    info('Caminho crítico da migração:\n' +
+         relatorio_caminho_critico(dependencias, duracao))
 
 
 def migrar_model(model, apagar_do_legado):
     print('Migrando %s...' % model.__name__)
+    inicio = time.time()
+
+    checkpoint = get_checkpoint(model)
+    if checkpoint and checkpoint.concluido:
+        info('{} já migrado ({} registros).'.format(
+            model.__name__, checkpoint.registros))
+        return
 
     model_legado, tabela_legado, campos_pk_legado = \
         get_estrutura_legado(model)
 
+    def get_pk_do_legado(old):
+        return [getattr(old, campo) for campo in campos_pk_legado]
+
+    ultima_pk = checkpoint.ultima_pk_legado if checkpoint else None
+    registros = checkpoint.registros if checkpoint else 0
+    if ultima_pk:
+        info('Retomando {} após a pk {} do legado ({} registros já '
+             'migrados).'.format(model.__name__, ultima_pk, registros))
+
     if len(campos_pk_legado) == 1:
         # a pk no legado tem um único campo
         nome_pk = model_legado._meta.pk.name
@@ -990,6 +1374,8 @@ def migrar_model(model, apagar_do_legado):
         else:
             old_records = model_legado.objects.all()
         old_records = old_records.order_by(nome_pk)
+        lotes = iter_lotes_por_pk(old_records, nome_pk,
+                                  ultima_pk[0] if ultima_pk else None)
 
         def get_id_do_legado(old):
             return getattr(old, nome_pk)
@@ -998,64 +1384,103 @@ def migrar_model(model, apagar_do_legado):
             Max('pk'))['pk__max'] or 0
     else:
         # a pk no legado tem mais de um campo
-        old_records = iter_sql_records(tabela_legado)
+        # a pk do checkpoint pode ter sido gravada como texto (datas,
+        # decimais): a comparação é feita pelo próprio banco legado
+        old_records = iter_sql_records(tabela_legado, ultima_pk)
+        lotes = iter_lotes(old_records)
         get_id_do_legado = None
         ultima_pk_legado = model_legado.objects.count()
 
     ajuste_antes_salvar = AJUSTE_ANTES_SALVAR.get(model)
     ajuste_depois_salvar = AJUSTE_DEPOIS_SALVAR.get(model)
 
-    # convert old records to new ones
-    with transaction.atomic():
-        novos = []
-        sql_delete_legado = ''
-        for old in old_records:
-            new = model()
-            if get_id_do_legado:
-                new.id = get_id_do_legado(old)
-            try:
-                populate_renamed_fields(new, old)
-                if ajuste_antes_salvar:
-                    ajuste_antes_salvar(new, old)
-            except ForeignKeyFaltando as e:
-                # tentamos preencher uma FK e o ojeto relacionado
-                # não existe
-                # então este é um objeo órfão: simplesmente ignoramos
-                warn('fk', e.msg, e.dados)
-                continue
-            else:
-                new.clean()  # valida model
-                novos.append(new)  # guarda para salvar
-
-                # acumula deleção do registro no legado
-                if apagar_do_legado:
-                    sql_delete_legado += 'delete from {} where {};\n'.format(
-                        tabela_legado,
-                        ' and '.join(
-                            '{} = "{}"'.format(campo,
-                                               getattr(old, campo))
-                            for campo in campos_pk_legado))
-
-        # salva novos registros
-        with reversion.create_revision():
-            model.objects.bulk_create(novos)
-            reversion.set_comment('Objetos criados pela migração')
-
-        if ajuste_depois_salvar:
-            ajuste_depois_salvar()
-
-        # reiniciamos a sequence logo após a última pk do legado
-        #
-        # É importante que seja do legado (e não da nova base),
-        # pois numa nova versão da migração podemos inserir registros
-        # não migrados antes sem conflito com pks criadas até lá
-        if get_id_do_legado:
-            reinicia_sequence(model, ultima_pk_legado + 1)
+    # carrega os ids de cada model relacionado uma única vez
+    # e detecta de uma só vez os valores de FK sem registro relacionado
+    _ids_por_model.clear()
+    orfaos = detecta_orfaos(model, tabela_legado)
+    num_orfaos = 0
+    num_migrados = 0
+
+    # converte os registros antigos em novos, lote a lote,
+    # cada lote em sua própria transação
+    for lote in lotes:
+        with transaction.atomic():
+            novos = []
+            sql_delete_legado = ''
+            for old in lote:
+                new = model()
+                if get_id_do_legado:
+                    new.id = get_id_do_legado(old)
+                try:
+                    for field, valores_orfaos in orfaos.items():
+                        valor = getattr(old, campos_novos_para_antigos[field])
+                        if valor in valores_orfaos:
+                            raise ForeignKeyFaltando(
+                                field=field, valor=valor, old=old)
+                    populate_renamed_fields(new, old)
+                    if ajuste_antes_salvar:
+                        ajuste_antes_salvar(new, old)
+                except ForeignKeyFaltando as e:
+                    # tentamos preencher uma FK e o ojeto relacionado
+                    # não existe
+                    # então este é um objeo órfão: simplesmente ignoramos
+                    warn('fk', e.msg, e.dados)
+                    num_orfaos += 1
+                    continue
+                else:
+                    new.clean()  # valida model
+                    novos.append(new)  # guarda para salvar
+
+                    # acumula deleção do registro no legado
+                    if apagar_do_legado:
+                        sql_delete_legado += \
+                            'delete from {} where {};\n'.format(
+                                tabela_legado,
+                                ' and '.join(
+                                    '{} = "{}"'.format(campo,
+                                                       getattr(old, campo))
+                                    for campo in campos_pk_legado))
+
+            # salva novos registros
+            with reversion.create_revision():
+                model.objects.bulk_create(novos,
+                                          batch_size=TAMANHO_LOTE_MIGRACAO)
+                reversion.set_comment('Objetos criados pela migração')
+
+            num_migrados += len(novos)
+            ultima_pk = get_pk_do_legado(lote[-1])
+            grava_checkpoint(model, ultima_pk, registros + num_migrados)
 
         # apaga registros migrados do legado
+        # (somente após a gravação do lote na nova base)
         if apagar_do_legado and sql_delete_legado:
             exec_legado(sql_delete_legado)
 
+        # com DEBUG ligado, o django guarda todas as consultas feitas
+        reset_queries()
+
+    # deve poder ser repetido, pois se a migração for interrompida aqui a
+    # retomada o executa novamente
+    if ajuste_depois_salvar:
+        ajuste_depois_salvar()
+
+    # reiniciamos a sequence logo após a última pk do legado
+    #
+    # É importante que seja do legado (e não da nova base),
+    # pois numa nova versão da migração podemos inserir registros
+    # não migrados antes sem conflito com pks criadas até lá
+    if get_id_do_legado:
+        reinicia_sequence(model, ultima_pk_legado + 1)
+
+    grava_checkpoint(model, ultima_pk, registros + num_migrados,
+                     concluido=True)
+
+    duracao = time.time() - inicio
+    estatisticas_migracao[model] = (num_migrados, num_orfaos, duracao)
+    info('{} registros de {} migrados em {:.1f}s ({:.1f} registros/s)'.format(
+        num_migrados, model.__name__, duracao,
+        num_migrados / duracao if duracao else 0))
+
 
 # MIGRATION_ADJUSTMENTS #####################################################
 
@@ -1291,10 +1716,16 @@ def adjust_normajuridica_depois_salvar():
         for norma, cod_assunto in OldNormaJuridica.objects.filter(
             pk__in=normas_migradas).values_list('pk', 'cod_assunto')]
 
+    # numa migração retomada (-r) o ajuste pode já ter sido feito, no todo
+    # ou em parte, antes da interrupção
+    existentes = set(ligacao.objects.values_list(
+        'normajuridica_id', 'assuntonorma_id'))
+
     ligacao.objects.bulk_create(
         ligacao(normajuridica_id=norma, assuntonorma_id=assunto)
         for norma, assuntos in norma_para_assuntos
-        for assunto in assuntos)
+        for assunto in assuntos
+        if (norma, assunto) not in existentes)
 
 
 def adjust_autor(new, old):
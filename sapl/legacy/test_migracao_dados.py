@@ -1,8 +1,13 @@
 from random import shuffle
 
-from .migracao_dados import (_formatar_lista_para_sql,
+from sapl.materia.models import MateriaLegislativa, Tramitacao
+
+from .migracao_dados import (_formatar_lista_para_sql, caminho_critico,
+                             estatisticas_migracao,
                              get_autorias_sem_repeticoes,
-                             get_reapontamento_de_autores_repetidos)
+                             get_reapontamento_de_autores_repetidos,
+                             iter_lotes, relatorio_vazao,
+                             sql_registros_legado)
 
 
 def test_unifica_autores_repetidos_no_legado():
@@ -60,3 +65,54 @@ def test_formatar_lista_para_sql():
     assert _formatar_lista_para_sql([1, 2, 3]) == '(1, 2, 3)'
     assert _formatar_lista_para_sql([1]) == '(1)'
     assert _formatar_lista_para_sql([]) is None
+
+
+def test_relatorio_vazao():
+    estatisticas_migracao.clear()
+    estatisticas_migracao[MateriaLegislativa] = (1000, 3, 2.0)
+    estatisticas_migracao[Tramitacao] = (0, 0, 0)
+    linhas = relatorio_vazao().splitlines()
+    estatisticas_migracao.clear()
+
+    assert len(linhas) == 3
+    assert linhas[1].split() == ['MateriaLegislativa', '1000', '3',
+                                 '2.0', '500.0']
+    assert linhas[2].split() == ['Tramitacao', '0', '0', '0.0', '0.0']
+
+
+def test_iter_lotes():
+    assert list(iter_lotes(range(5), 2)) == [[0, 1], [2, 3], [4]]
+    assert list(iter_lotes([], 2)) == []
+
+
+def test_sql_registros_legado_retoma_apos_checkpoint():
+    sql, params = sql_registros_legado(
+        'autoria', ['cod_autor', 'cod_materia'], True)
+    assert sql == ('select * from autoria where ind_excluido <> 1 '
+                   'order by cod_autor, cod_materia')
+    assert params == []
+
+    # a pk do checkpoint vem do json como texto; o banco faz a comparação
+    sql, params = sql_registros_legado(
+        'legislacao_citada', ['cod_materia', 'dat_publicacao'], False,
+        [1, '2018-05-02'])
+    assert sql == ('select * from legislacao_citada '
+                   'where (cod_materia, dat_publicacao) > (%s, %s) '
+                   'order by cod_materia, dat_publicacao')
+    assert params == [1, '2018-05-02']
+
+    sql, params = sql_registros_legado(
+        'despacho_inicial', ['cod_materia', 'cod_comissao'], True,
+        [10, 3, 2])
+    assert '(cod_materia, min(num_ordem), cod_comissao)' in sql
+    assert sql.endswith('order by cod_materia, min(num_ordem), cod_comissao')
+    assert params == [10, 2, 3]
+
+
+def test_caminho_critico():
+    # a -> b -> d e a -> c -> d
+    dependencias = {'a': set(), 'b': {'a'}, 'c': {'a'}, 'd': {'b', 'c'},
+                    'e': set()}
+    duracoes = {'a': 1, 'b': 5, 'c': 2, 'd': 1, 'e': 6}
+    assert caminho_critico(dependencias, duracoes) == (['a', 'b', 'd'], 7)
+    assert caminho_critico({}, {}) == ([], 0)
@@ -35,7 +35,7 @@ RENAMING_IGNORED_FIELDS = [
     (Participacao, {'composicao'}),
     (Proposicao, {
         'ano', 'content_type', 'object_id', 'conteudo_gerado_related',
-        'status', 'hash_code', 'texto_original'}),
+        'status', 'hash_code', 'hash_conteudo', 'texto_original'}),
     (TipoProposicao, {
         'object_id', 'content_type',  'tipo_conteudo_related', 'perfis',
         # não estou entendendo como esses campos são enumerados,
@@ -0,0 +1,399 @@
+"""
+Provedor OAI-PMH 2.0 das normas jurídicas para a rede LexML.
+
+As respostas são geradas aos pedaços por um gerador e enviadas com
+StreamingHttpResponse. ListIdentifiers e ListRecords são paginados por
+resumptionTokens sem estado no servidor: o token carrega o formato, o
+intervalo from/until e a posição (data_ultima_atualizacao, pk) do último
+registro enviado, de forma que cada página é uma consulta limitada a
+TAMANHO_PAGINA normas, ordenadas pelo mesmo par e servida pelo índice
+sobre essas colunas.
+"""
+import base64
+import json
+from datetime import datetime
+from xml.sax.saxutils import escape, quoteattr
+
+from django.core.urlresolvers import reverse
+from django.db.models import DateTimeField, Min, Q, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from sapl.base.configuracoes import get_casa_legislativa
+from sapl.lexml.models import LexmlProvedor, LexmlPublicador
+from sapl.norma.models import NormaJuridica
+from sapl.utils import normalize
+
+TAMANHO_PAGINA = 100
+
+GRANULARIDADE = 'YYYY-MM-DDThh:mm:ssZ'
+FORMATO_DATESTAMP = '%Y-%m-%dT%H:%M:%SZ'
+
+# normas anteriores à existência de data_ultima_atualizacao
+DATESTAMP_MINIMO = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+FORMATOS = {
+    'oai_lexml': ('http://projeto.lexml.gov.br/esquemas/oai_lexml.xsd',
+                  'http://www.lexml.gov.br/oai_lexml'),
+}
+
+ESFERAS = {'M': 'municipal', 'E': 'estadual', 'F': 'federal'}
+
+ARGUMENTOS = {
+    'Identify': ((), ()),
+    'ListMetadataFormats': ((), ('identifier', )),
+    'ListSets': ((), ('resumptionToken', )),
+    'ListIdentifiers': (('metadataPrefix', ),
+                        ('from', 'until', 'set', 'resumptionToken')),
+    'ListRecords': (('metadataPrefix', ),
+                    ('from', 'until', 'set', 'resumptionToken')),
+    'GetRecord': (('identifier', 'metadataPrefix'), ()),
+}
+
+
+class ErroOAI(Exception):
+
+    def __init__(self, codigo, mensagem):
+        super().__init__(mensagem)
+        self.codigo = codigo
+        self.mensagem = mensagem
+
+
+def formata_datestamp(data):
+    return data.astimezone(timezone.utc).strftime(FORMATO_DATESTAMP)
+
+
+def parse_datestamp(valor, fim=False):
+    """
+    Converte um argumento from/until (dia ou dia e hora em UTC). Um dia
+    informado em `until` inclui o dia inteiro.
+    """
+    try:
+        if len(valor) == 10:
+            data = datetime.strptime(valor, '%Y-%m-%d')
+            if fim:
+                data = data.replace(hour=23, minute=59, second=59)
+        else:
+            data = datetime.strptime(valor, FORMATO_DATESTAMP)
+    except ValueError:
+        raise ErroOAI('badArgument',
+                      'Data inválida: {}'.format(valor))
+    return data.replace(tzinfo=timezone.utc)
+
+
+def codifica_token(dados):
+    return base64.urlsafe_b64encode(
+        json.dumps(dados, separators=(',', ':')).encode()).decode()
+
+
+def decodifica_token(token):
+    try:
+        dados = json.loads(base64.urlsafe_b64decode(token.encode()).decode())
+        pagina = {
+            'prefixo': dados['p'],
+            'de': dados['f'] and parse_datetime(dados['f']),
+            'ate': dados['u'] and parse_datetime(dados['u']),
+            'datestamp': parse_datetime(dados['d']),
+            'pk': int(dados['k']),
+        }
+    except (ValueError, KeyError, TypeError):
+        pagina = None
+    if not pagina or not pagina['datestamp']:
+        raise ErroOAI('badResumptionToken', 'resumptionToken inválido')
+    return pagina
+
+
+def normas_com_datestamp():
+    return NormaJuridica.objects.annotate(
+        datestamp=Coalesce('data_ultima_atualizacao',
+                           Value(DATESTAMP_MINIMO,
+                                 output_field=DateTimeField()))
+    ).select_related('tipo')
+
+
+def pagina_de_normas(prefixo, de=None, ate=None, datestamp=None, pk=None,
+                     tamanho=None):
+    """
+    Retorna (normas, token): até `tamanho` normas após a posição
+    (`datestamp`, `pk`) e o resumptionToken da página seguinte, se houver.
+
+    As normas sem data_ultima_atualizacao (datestamp DATESTAMP_MINIMO) vêm
+    primeiro, ordenadas pela pk; as demais, por (data_ultima_atualizacao,
+    pk). Cada segmento é consultado diretamente sobre as colunas, de modo
+    que a página é lida do índice a partir da posição do token, sem
+    ordenar a tabela.
+    """
+    tamanho = tamanho or TAMANHO_PAGINA
+    sem_data = normas_com_datestamp().filter(
+        data_ultima_atualizacao__isnull=True)
+    com_data = normas_com_datestamp().filter(
+        data_ultima_atualizacao__isnull=False)
+    inclui_sem_data = ((not de or de <= DATESTAMP_MINIMO) and
+                       (not ate or ate >= DATESTAMP_MINIMO))
+    if de:
+        com_data = com_data.filter(data_ultima_atualizacao__gte=de)
+    if ate:
+        com_data = com_data.filter(data_ultima_atualizacao__lte=ate)
+    if datestamp and datestamp > DATESTAMP_MINIMO:
+        inclui_sem_data = False
+        # o __gte redundante limita a leitura do índice à posição do token
+        com_data = com_data.filter(
+            Q(data_ultima_atualizacao__gt=datestamp) |
+            Q(data_ultima_atualizacao=datestamp, pk__gt=pk),
+            data_ultima_atualizacao__gte=datestamp)
+    elif datestamp:
+        sem_data = sem_data.filter(pk__gt=pk)
+
+    normas = []
+    if inclui_sem_data:
+        normas = list(sem_data.order_by('pk')[:tamanho + 1])
+    if len(normas) <= tamanho:
+        normas += list(com_data.order_by(
+            'data_ultima_atualizacao', 'pk')[:tamanho + 1 - len(normas)])
+
+    token = None
+    if len(normas) > tamanho:
+        normas = normas[:tamanho]
+        ultima = normas[-1]
+        token = codifica_token({
+            'p': prefixo,
+            'f': de and de.isoformat(),
+            'u': ate and ate.isoformat(),
+            'd': ultima.datestamp.isoformat(),
+            'k': ultima.pk})
+    return normas, token
+
+
+class ProvedorOAI:
+    """
+    Responde a uma requisição OAI-PMH. `resposta()` é um gerador dos
+    pedaços do documento XML.
+    """
+
+    def __init__(self, request):
+        self.request = request
+        self.argumentos = (request.GET if request.method == 'GET'
+                           else request.POST)
+        self.url_base = request.build_absolute_uri(request.path)
+        self.casa = get_casa_legislativa()
+        self.publicador = LexmlPublicador.objects.first()
+        self.dominio = request.get_host().split(':')[0]
+
+    # identificação e URN das normas
+
+    def identificador(self, norma):
+        return 'oai:{}:norma/{}'.format(self.dominio, norma.pk)
+
+    def pk_do_identificador(self, identificador):
+        prefixo = 'oai:{}:norma/'.format(self.dominio)
+        if identificador.startswith(prefixo):
+            pk = identificador[len(prefixo):]
+            if pk.isdigit():
+                return int(pk)
+        raise ErroOAI('idDoesNotExist',
+                      'Identificador desconhecido: {}'.format(identificador))
+
+    def localidade(self):
+        if not self.casa:
+            return 'br'
+        municipio = normalize(self.casa.municipio).lower().replace(' ', '.')
+        return 'br;{};{}'.format(
+            normalize(self.casa.get_uf_display()).lower().replace(' ', '.'),
+            municipio)
+
+    def urn(self, norma):
+        tipo = norma.tipo.equivalente_lexml or normalize(
+            norma.tipo.descricao).lower().replace(' ', '.')
+        data = norma.data.isoformat() if norma.data else str(norma.ano)
+        esfera = ESFERAS.get(norma.esfera_federacao, 'municipal')
+        return 'urn:lex:{}:{}:{}:{};{}'.format(
+            self.localidade(), esfera, tipo, data, norma.numero)
+
+    # elementos XML
+
+    def cabecalho_xml(self):
+        yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+        yield ('<OAI-PMH xmlns="http://www.openarchives.org/OAI/2.0/" '
+               'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+               'xsi:schemaLocation="http://www.openarchives.org/OAI/2.0/ '
+               'http://www.openarchives.org/OAI/2.0/OAI-PMH.xsd">\n')
+        yield '<responseDate>{}</responseDate>\n'.format(
+            formata_datestamp(timezone.now()))
+
+    def request_xml(self, com_argumentos=True):
+        atributos = ''
+        if com_argumentos:
+            atributos = ''.join(' {}={}'.format(k, quoteattr(v))
+                                for k, v in sorted(self.argumentos.items()))
+        return '<request{}>{}</request>\n'.format(
+            atributos, escape(self.url_base))
+
+    def header_xml(self, norma):
+        return ('<header><identifier>{}</identifier>'
+                '<datestamp>{}</datestamp></header>').format(
+                    self.identificador(norma),
+                    formata_datestamp(norma.datestamp))
+
+    def metadata_xml(self, norma):
+        url = self.request.build_absolute_uri(reverse(
+            'sapl.norma:normajuridica_detail', kwargs={'pk': norma.pk}))
+        id_publicador = self.publicador.id_publicador \
+            if self.publicador else ''
+        return (
+            '<metadata><LexML xmlns="{ns}" '
+            'xsi:schemaLocation="{ns} {xsd}">'
+            '<Item formato="text/html" idPublicador="{pub}" '
+            'tipo="metadado">{url}</Item>'
+            '<DocumentoIndividual>{urn}</DocumentoIndividual>'
+            '<Epigrafe>{epigrafe}</Epigrafe>'
+            '<Ementa>{ementa}</Ementa>'
+            '</LexML></metadata>').format(
+                ns=FORMATOS['oai_lexml'][1], xsd=FORMATOS['oai_lexml'][0],
+                pub=id_publicador, url=escape(url),
+                urn=escape(self.urn(norma)),
+                epigrafe=escape(str(norma.epigrafe)),
+                ementa=escape(norma.ementa))
+
+    def record_xml(self, norma):
+        return '<record>{}{}</record>\n'.format(
+            self.header_xml(norma), self.metadata_xml(norma))
+
+    # verbos
+
+    def valida_argumentos(self, verbo):
+        obrigatorios, opcionais = ARGUMENTOS[verbo]
+        recebidos = set(self.argumentos) - {'verb'}
+        if 'resumptionToken' in recebidos:
+            if recebidos != {'resumptionToken'}:
+                raise ErroOAI('badArgument',
+                              'resumptionToken deve ser o único argumento')
+            return
+        faltando = set(obrigatorios) - recebidos
+        ilegais = recebidos - set(obrigatorios) - set(opcionais)
+        if faltando or ilegais:
+            raise ErroOAI('badArgument', 'Argumentos inválidos: {}'.format(
+                ', '.join(sorted(faltando | ilegais))))
+
+    def valida_formato(self, prefixo):
+        if prefixo not in FORMATOS:
+            raise ErroOAI('cannotDisseminateFormat',
+                          'Formato não suportado: {}'.format(prefixo))
+
+    def identify(self):
+        provedor = LexmlProvedor.objects.first()
+        email = (provedor and provedor.email_responsavel) or \
+            (self.casa and self.casa.email) or ''
+        inicio = normas_com_datestamp().aggregate(
+            inicio=Min('datestamp'))['inicio'] or DATESTAMP_MINIMO
+        yield (
+            '<Identify><repositoryName>{}</repositoryName>'
+            '<baseURL>{}</baseURL>'
+            '<protocolVersion>2.0</protocolVersion>'
+            '<adminEmail>{}</adminEmail>'
+            '<earliestDatestamp>{}</earliestDatestamp>'
+            '<deletedRecord>no</deletedRecord>'
+            '<granularity>{}</granularity>'
+            '</Identify>\n').format(
+                escape(self.casa.nome if self.casa else ''),
+                escape(self.url_base), escape(email),
+                formata_datestamp(inicio), GRANULARIDADE)
+
+    def list_metadata_formats(self):
+        if 'identifier' in self.argumentos:
+            pk = self.pk_do_identificador(self.argumentos['identifier'])
+            if not NormaJuridica.objects.filter(pk=pk).exists():
+                raise ErroOAI('idDoesNotExist', 'Norma inexistente')
+        yield '<ListMetadataFormats>'
+        for prefixo, (schema, namespace) in sorted(FORMATOS.items()):
+            yield ('<metadataFormat><metadataPrefix>{}</metadataPrefix>'
+                   '<schema>{}</schema>'
+                   '<metadataNamespace>{}</metadataNamespace>'
+                   '</metadataFormat>').format(prefixo, schema, namespace)
+        yield '</ListMetadataFormats>\n'
+
+    def list_sets(self):
+        raise ErroOAI('noSetHierarchy', 'Este repositório não possui sets')
+
+    def lista(self, verbo, elemento):
+        if 'resumptionToken' in self.argumentos:
+            pagina = decodifica_token(self.argumentos['resumptionToken'])
+        else:
+            if 'set' in self.argumentos:
+                raise ErroOAI('noSetHierarchy',
+                              'Este repositório não possui sets')
+            pagina = {
+                'prefixo': self.argumentos['metadataPrefix'],
+                'de': self.argumentos.get('from') and parse_datestamp(
+                    self.argumentos['from']),
+                'ate': self.argumentos.get('until') and parse_datestamp(
+                    self.argumentos['until'], fim=True),
+            }
+            if pagina['de'] and pagina['ate'] and \
+                    pagina['de'] > pagina['ate']:
+                raise ErroOAI('badArgument', 'from posterior a until')
+        self.valida_formato(pagina['prefixo'])
+
+        normas, token = pagina_de_normas(**pagina)
+        if not normas:
+            raise ErroOAI('noRecordsMatch', 'Nenhuma norma encontrada')
+
+        def corpo():
+            yield '<{}>\n'.format(verbo)
+            for norma in normas:
+                yield elemento(norma)
+            if token or 'resumptionToken' in self.argumentos:
+                yield '<resumptionToken>{}</resumptionToken>\n'.format(
+                    token or '')
+            yield '</{}>\n'.format(verbo)
+        return corpo()
+
+    def list_identifiers(self):
+        return self.lista('ListIdentifiers',
+                          lambda norma: self.header_xml(norma) + '\n')
+
+    def list_records(self):
+        return self.lista('ListRecords', self.record_xml)
+
+    def get_record(self):
+        self.valida_formato(self.argumentos['metadataPrefix'])
+        pk = self.pk_do_identificador(self.argumentos['identifier'])
+        norma = normas_com_datestamp().filter(pk=pk).first()
+        if not norma:
+            raise ErroOAI('idDoesNotExist', 'Norma inexistente')
+        yield '<GetRecord>{}</GetRecord>\n'.format(self.record_xml(norma))
+
+    VERBOS = {
+        'Identify': identify,
+        'ListMetadataFormats': list_metadata_formats,
+        'ListSets': list_sets,
+        'ListIdentifiers': list_identifiers,
+        'ListRecords': list_records,
+        'GetRecord': get_record,
+    }
+
+    def resposta(self):
+        """
+        Valida a requisição antes de começar a resposta, para que os erros
+        OAI sejam enviados no lugar do corpo.
+        """
+        verbo = self.argumentos.get('verb')
+        try:
+            if verbo not in self.VERBOS:
+                raise ErroOAI('badVerb', 'Verbo inválido ou ausente')
+            self.valida_argumentos(verbo)
+            corpo = self.VERBOS[verbo](self)
+            # executa as validações e a consulta da página
+            primeiro = next(corpo, '')
+        except ErroOAI as erro:
+            yield from self.cabecalho_xml()
+            yield self.request_xml(com_argumentos=erro.codigo not in (
+                'badVerb', 'badArgument'))
+            yield '<error code="{}">{}</error>\n'.format(
+                erro.codigo, escape(erro.mensagem))
+        else:
+            yield from self.cabecalho_xml()
+            yield self.request_xml()
+            yield primeiro
+            yield from corpo
+        yield '</OAI-PMH>\n'
@@ -0,0 +1,59 @@
+import re
+
+import pytest
+from django.core.urlresolvers import reverse
+from model_mommy import mommy
+
+from sapl.lexml import oai
+from sapl.norma.models import NormaJuridica
+
+
+def _harvest(client, **params):
+    response = client.get(reverse('sapl.lexml:oai_pmh'), params)
+    assert response.status_code == 200
+    return b''.join(response.streaming_content).decode()
+
+
+@pytest.mark.django_db(transaction=False)
+def test_list_identifiers_paginado_por_resumption_token(client, monkeypatch):
+    monkeypatch.setattr(oai, 'TAMANHO_PAGINA', 2)
+    normas = mommy.make(NormaJuridica, _quantity=5)
+    # normas sem data_ultima_atualizacao formam o primeiro segmento
+    NormaJuridica.objects.filter(
+        pk__in=[n.pk for n in normas[:3]]).update(
+            data_ultima_atualizacao=None)
+
+    paginas = 0
+    identificadores = []
+    xml = _harvest(client, verb='ListIdentifiers', metadataPrefix='oai_lexml')
+    while True:
+        identificadores += re.findall(r'norma/(\d+)</identifier>', xml)
+        paginas += 1
+        token = re.search(r'<resumptionToken>(.*?)</resumptionToken>', xml)
+        if not token or not token.group(1):
+            break
+        xml = _harvest(client, verb='ListIdentifiers',
+                       resumptionToken=token.group(1))
+
+    assert paginas == 3
+    assert sorted(int(pk) for pk in identificadores) == sorted(
+        n.pk for n in normas)
+
+
+@pytest.mark.django_db(transaction=False)
+def test_get_record_e_erros(client):
+    norma = mommy.make(NormaJuridica, ementa='Dispõe sobre <tudo>')
+
+    xml = _harvest(client, verb='GetRecord', metadataPrefix='oai_lexml',
+                   identifier='oai:testserver:norma/{}'.format(norma.pk))
+    assert '<DocumentoIndividual>urn:lex:' in xml
+    assert 'Dispõe sobre &lt;tudo&gt;' in xml
+
+    assert 'code="badVerb"' in _harvest(client, verb='Nada')
+    assert 'code="cannotDisseminateFormat"' in _harvest(
+        client, verb='ListRecords', metadataPrefix='oai_dc')
+    assert 'code="badResumptionToken"' in _harvest(
+        client, verb='ListRecords', resumptionToken='xyz')
+    assert 'code="noRecordsMatch"' in _harvest(
+        client, verb='ListRecords', metadataPrefix='oai_lexml',
+        **{'from': '2999-01-01'})
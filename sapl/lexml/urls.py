@@ -1,6 +1,7 @@
 from django.conf.urls import include, url
 
-from sapl.lexml.views import LexmlProvedorCrud, LexmlPublicadorCrud
+from sapl.lexml.views import (LexmlProvedorCrud, LexmlPublicadorCrud,
+                              oai_pmh)
 
 from .apps import AppConfig
 
@@ -11,4 +12,5 @@ urlpatterns = [
         include(LexmlProvedorCrud.get_urls())),
     url(r'^sistema/lexml/publicador/',
         include(LexmlPublicadorCrud.get_urls())),
+    url(r'^lexml/oai/?$', oai_pmh, name='oai_pmh'),
 ]
@@ -1,6 +1,18 @@
+from django.http import StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+
 from sapl.crud.base import CrudAux
 
 from .models import LexmlProvedor, LexmlPublicador
+from .oai import ProvedorOAI
 
 LexmlProvedorCrud = CrudAux.build(LexmlProvedor, 'lexml_provedor')
 LexmlPublicadorCrud = CrudAux.build(LexmlPublicador, 'lexml_publicador')
+
+
+@csrf_exempt
+@require_http_methods(['GET', 'POST'])
+def oai_pmh(request):
+    return StreamingHttpResponse(ProvedorOAI(request).resposta(),
+                                 content_type='text/xml; charset=utf-8')
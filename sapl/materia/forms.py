@@ -25,7 +25,10 @@ from django.utils.translation import ugettext_lazy as _
 import django_filters
 
 import sapl
-from sapl.base.models import AppConfig, Autor, TipoAutor
+from sapl.base.configuracoes import get_config_aplicacao
+from sapl.base.models import Autor, TipoAutor
+from sapl.base.numeracao import (proximo_numero, sequencia_materia,
+                                 sequencia_protocolo)
 from sapl.comissoes.models import Comissao
 from sapl.compilacao.models import (STATUS_TA_IMMUTABLE_PUBLIC,
                                     STATUS_TA_PRIVATE)
@@ -37,13 +40,12 @@ from sapl.materia.models import (AssuntoMateria, Autoria, MateriaAssunto,
                                  UnidadeTramitacao)
 from sapl.norma.models import (LegislacaoCitada, NormaJuridica,
                                TipoNormaJuridica)
-from sapl.parlamentares.models import Legislatura, Partido
+from sapl.parlamentares.models import Partido
 from sapl.protocoloadm.models import Protocolo, DocumentoAdministrativo
 from sapl.settings import MAX_DOC_UPLOAD_SIZE
-from sapl.utils import (YES_NO_CHOICES, SEPARADOR_HASH_PROPOSICAO,
-                        ChoiceWithoutValidationField,
+from sapl.utils import (YES_NO_CHOICES, ChoiceWithoutValidationField,
                         MateriaPesquisaOrderingFilter, RangeWidgetOverride,
-                        autor_label, autor_modal, gerar_hash_arquivo,
+                        autor_label, autor_modal,
                         models_with_gr_for_model, qs_override_django_filter,
                         choice_anos_com_materias, FilterOverridesMetaMixin)
 
@@ -941,35 +943,22 @@ class MateriaLegislativaFilterSet(django_filters.FilterSet):
         return qs
 
 
-def pega_ultima_tramitacao():
-    return Tramitacao.objects.values(
-        'materia_id').annotate(data_encaminhamento=Max(
-            'data_encaminhamento'),
-        id=Max('id')).values_list('id', flat=True)
-
-
 def filtra_tramitacao_status(status):
-    lista = pega_ultima_tramitacao()
-    return Tramitacao.objects.filter(
-        id__in=lista,
-        status=status).distinct().values_list('materia_id', flat=True)
+    return MateriaLegislativa.objects.filter(
+        ultima_tramitacao__status=status).values_list('id', flat=True)
 
 
 def filtra_tramitacao_destino(destino):
-    lista = pega_ultima_tramitacao()
-    return Tramitacao.objects.filter(
-        id__in=lista,
-        unidade_tramitacao_destino=destino).distinct().values_list(
-            'materia_id', flat=True)
+    return MateriaLegislativa.objects.filter(
+        ultima_tramitacao__unidade_tramitacao_destino=destino).values_list(
+            'id', flat=True)
 
 
 def filtra_tramitacao_destino_and_status(status, destino):
-    lista = pega_ultima_tramitacao()
-    return Tramitacao.objects.filter(
-        id__in=lista,
-        status=status,
-        unidade_tramitacao_destino=destino).distinct().values_list(
-            'materia_id', flat=True)
+    return MateriaLegislativa.objects.filter(
+        ultima_tramitacao__status=status,
+        ultima_tramitacao__unidade_tramitacao_destino=destino).values_list(
+            'id', flat=True)
 
 
 class DespachoInicialForm(ModelForm):
@@ -1449,12 +1438,11 @@ class ProposicaoForm(forms.ModelForm):
         if receber_recibo == True:
             inst.hash_code = ''
         else:
-            if inst.texto_original:
-                inst.hash_code = gerar_hash_arquivo(
-                    inst.texto_original.path, str(inst.pk))
-            elif inst.texto_articulado.exists():
-                ta = inst.texto_articulado.first()
-                inst.hash_code = 'P' + ta.hash() + SEPARADOR_HASH_PROPOSICAO + str(inst.pk)
+            # o hash do arquivo já foi calculado no upload; o do texto
+            # articulado é recalculado, pois ele ainda pode ter mudado
+            if not inst.texto_original:
+                inst.atualiza_hash_conteudo()
+            inst.hash_code = inst.codigo_recibo
 
     def clean(self):
         super(ProposicaoForm, self).clean()
@@ -1490,7 +1478,7 @@ class ProposicaoForm(forms.ModelForm):
     def save(self, commit=True):
         cd = self.cleaned_data
         inst = self.instance
-        receber_recibo = AppConfig.objects.last().receber_recibo_proposicao
+        receber_recibo = get_config_aplicacao().receber_recibo_proposicao
 
         if inst.pk:
             if 'tipo_texto' in cd:
@@ -1828,47 +1816,12 @@ class ConfirmarProposicaoForm(ProposicaoForm):
         if self.instance.tipo.content_type.model_class(
         ) == TipoMateriaLegislativa:
 
-            numeracao = None
-            try:
-                self.logger.debug(
-                    "Tentando obter modelo de sequência de numeração.")
-                numeracao = sapl.base.models.AppConfig.objects.last(
-                ).sequencia_numeracao
-            except AttributeError as e:
-                self.logger.error("Erro ao obter modelo. " + str(e))
-                pass
-
             tipo = self.instance.tipo.tipo_conteudo_related
-            if tipo.sequencia_numeracao:
-                numeracao = tipo.sequencia_numeracao
             ano = timezone.now().year
-            if numeracao == 'A':
-                numero = MateriaLegislativa.objects.filter(
-                    ano=ano, tipo=tipo).aggregate(Max('numero'))
-            elif numeracao == 'L':
-                legislatura = Legislatura.objects.filter(
-                    data_inicio__year__lte=ano,
-                    data_fim__year__gte=ano).first()
-                data_inicio = legislatura.data_inicio
-                data_fim = legislatura.data_fim
-                numero = MateriaLegislativa.objects.filter(
-                    data_apresentacao__gte=data_inicio,
-                    data_apresentacao__lte=data_fim,
-                    tipo=tipo).aggregate(
-                    Max('numero'))
-            elif numeracao == 'U':
-                numero = MateriaLegislativa.objects.filter(
-                    tipo=tipo).aggregate(Max('numero'))
-
-            if numeracao is None:
-                numero['numero__max'] = 0
-
-            max_numero = numero['numero__max'] + \
-                1 if numero['numero__max'] else 1
 
             # dados básicos
             materia = MateriaLegislativa()
-            materia.numero = max_numero
+            materia.numero = proximo_numero(*sequencia_materia(tipo, ano))
             materia.tipo = tipo
             materia.ementa = proposicao.descricao
             materia.ano = ano
@@ -1980,26 +1933,8 @@ class ConfirmarProposicaoForm(ProposicaoForm):
         GenericForeignKey
         """
 
-        numeracao = sapl.base.models.AppConfig.attr('sequencia_numeracao')
-        if numeracao == 'A':
-            nm = Protocolo.objects.filter(
-                ano=timezone.now().year).aggregate(Max('numero'))
-        elif numeracao == 'L':
-            legislatura = Legislatura.objects.filter(
-                data_inicio__year__lte=timezone.now().year,
-                data_fim__year__gte=timezone.now().year).first()
-            data_inicio = legislatura.data_inicio
-            data_fim = legislatura.data_fim
-            nm = MateriaLegislativa.objects.filter(
-                data_apresentacao__gte=data_inicio,
-                data_apresentacao__lte=data_fim,
-                tipo=tipo).aggregate(Max('numero'))
-
-        else:
-            # numeracao == 'U' ou não informada
-            nm = Protocolo.objects.all().aggregate(Max('numero'))
         protocolo = Protocolo()
-        protocolo.numero = (nm['numero__max'] + 1) if nm['numero__max'] else 1
+        protocolo.numero = proximo_numero(*sequencia_protocolo())
         protocolo.ano = timezone.now().year
 
         protocolo.tipo_protocolo = '1'
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db.models import OuterRef, Subquery
+
+from sapl.materia.models import MateriaLegislativa, Tramitacao
+
+
+class Command(BaseCommand):
+
+    help = ('Recalcula a última tramitação desnormalizada '
+            'de todas as matérias legislativas')
+
+    def handle(self, *args, **options):
+        ultima = Tramitacao.objects.filter(
+            materia_id=OuterRef('pk')).order_by('-id').values('id')[:1]
+        total = MateriaLegislativa.objects.update(
+            ultima_tramitacao=Subquery(ultima))
+        self.stdout.write('%s matérias atualizadas.' % total)
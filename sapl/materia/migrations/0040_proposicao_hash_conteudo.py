@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('materia', '0039_materialegislativa_ultima_tramitacao'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='proposicao',
+            name='hash_conteudo',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=32),
+        ),
+    ]
@@ -16,9 +16,10 @@ from sapl.compilacao.models import (PerfilEstruturalTextoArticulado,
                                     TextoArticulado)
 from sapl.parlamentares.models import Parlamentar
 #from sapl.protocoloadm.models import Protocolo
-from sapl.utils import (RANGE_ANOS, YES_NO_CHOICES, SaplGenericForeignKey,
-                        SaplGenericRelation, restringe_tipos_de_arquivo_txt,
-                        texto_upload_path)
+from sapl.utils import (RANGE_ANOS, SEPARADOR_HASH_PROPOSICAO,
+                        YES_NO_CHOICES, SaplGenericForeignKey,
+                        SaplGenericRelation, md5_arquivo,
+                        restringe_tipos_de_arquivo_txt, texto_upload_path)
 
 
 EM_TRAMITACAO = [(1, 'Sim'),
@@ -235,6 +236,17 @@ class MateriaLegislativa(models.Model):
         auto_now=True,
         verbose_name=_('Data'))
 
+    # Desnormalização da última tramitação da matéria, mantida pelos
+    # receivers de Tramitacao (ver sapl.base.receivers)
+    ultima_tramitacao = models.ForeignKey(
+        'Tramitacao',
+        blank=True,
+        null=True,
+        editable=False,
+        related_name='+',
+        on_delete=models.SET_NULL,
+        verbose_name=_('Última Tramitação'))
+
     class Meta:
         verbose_name = _('Matéria Legislativa')
         verbose_name_plural = _('Matérias Legislativas')
@@ -681,6 +693,13 @@ class Proposicao(models.Model):
                                  max_length=200,
                                  blank=True)
 
+    # MD5 do texto original ou do texto articulado, calculado no upload do
+    # arquivo ou no congelamento do texto articulado, no envio
+    hash_conteudo = models.CharField(max_length=32,
+                                     blank=True,
+                                     editable=False,
+                                     db_index=True)
+
     """
     FIXME Campo não é necessário na modelagem e implementação atual para o
     módulo de proposições.
@@ -790,6 +809,40 @@ class Proposicao(models.Model):
                 "d \d\e F \d\e Y"
             )}
 
+    def calcula_hash_conteudo(self):
+        if self.texto_original:
+            return md5_arquivo(self.texto_original)
+        ta = self.texto_articulado.first()
+        return ta.hash() if ta else ''
+
+    def atualiza_hash_conteudo(self):
+        self.hash_conteudo = self.calcula_hash_conteudo()
+        return self.hash_conteudo
+
+    def get_hash_conteudo(self):
+        """
+        Hash gravado do conteúdo. Proposições anteriores ao campo têm o
+        hash calculado e gravado no primeiro uso.
+        """
+        if not self.hash_conteudo and self.pk:
+            Proposicao.objects.filter(pk=self.pk).update(
+                hash_conteudo=self.atualiza_hash_conteudo())
+        return self.hash_conteudo
+
+    def verifica_hash_conteudo(self):
+        """
+        Relê o conteúdo e confere com o hash gravado.
+        """
+        return bool(self.hash_conteudo) and \
+            self.calcula_hash_conteudo() == self.hash_conteudo
+
+    @property
+    def codigo_recibo(self):
+        hash_conteudo = self.get_hash_conteudo()
+        if not hash_conteudo:
+            return ''
+        return 'P%s%s%s' % (hash_conteudo, SEPARADOR_HASH_PROPOSICAO, self.pk)
+
     def delete(self, using=None, keep_parents=False):
         if self.texto_original:
             self.texto_original.delete()
@@ -800,6 +853,11 @@ class Proposicao(models.Model):
     def save(self, force_insert=False, force_update=False, using=None,
              update_fields=None):
 
+        # arquivo recém enviado: o hash é calculado sobre o próprio upload,
+        # em blocos, sem reler o arquivo depois de gravado
+        if self.texto_original and not self.texto_original._committed:
+            self.hash_conteudo = md5_arquivo(self.texto_original)
+
         if not self.pk and self.texto_original:
             texto_original = self.texto_original
             self.texto_original = None
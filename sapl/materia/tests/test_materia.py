@@ -1,23 +1,28 @@
+import hashlib
+
 from django.contrib.auth import get_user_model
 from django.contrib.contenttypes.models import ContentType
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.urlresolvers import reverse
 from django.db.models import Max
+from django.utils import timezone
 from model_mommy import mommy
 import pytest
 
 from sapl.base.models import Autor, TipoAutor
 from sapl.comissoes.models import Comissao, TipoComissao
+from sapl.materia.forms import filtra_tramitacao_status
 from sapl.materia.models import (Anexada, Autoria, DespachoInicial,
                                  DocumentoAcessorio, MateriaLegislativa,
                                  Numeracao, Proposicao, RegimeTramitacao,
                                  StatusTramitacao, TipoDocumento,
                                  TipoMateriaLegislativa, TipoProposicao,
                                  Tramitacao, UnidadeTramitacao)
+from sapl.materia.views import get_proposicao_pendente
 from sapl.norma.models import (LegislacaoCitada, NormaJuridica,
                                TipoNormaJuridica)
 from sapl.parlamentares.models import Legislatura
-from sapl.utils import models_with_gr_for_model
+from sapl.utils import SEPARADOR_HASH_PROPOSICAO, models_with_gr_for_model
 
 
 @pytest.mark.django_db(transaction=False)
@@ -301,6 +306,26 @@ def test_tramitacao_submit(admin_client):
     assert tramitacao.urgente is True
 
 
+@pytest.mark.django_db(transaction=False)
+def test_ultima_tramitacao_mantida_em_save_e_delete():
+    materia = make_materia_principal()
+    status_a, status_b = mommy.make(StatusTramitacao, _quantity=2)
+
+    primeira = mommy.make(Tramitacao, materia=materia, status=status_a)
+    segunda = mommy.make(Tramitacao, materia=materia, status=status_b)
+
+    materia.refresh_from_db()
+    assert materia.ultima_tramitacao == segunda
+    assert list(filtra_tramitacao_status(status_b.pk)) == [materia.pk]
+    assert not filtra_tramitacao_status(status_a.pk).exists()
+
+    segunda.delete()
+
+    materia.refresh_from_db()
+    assert materia.ultima_tramitacao == primeira
+    assert list(filtra_tramitacao_status(status_a.pk)) == [materia.pk]
+
+
 @pytest.mark.django_db(transaction=False)
 def test_form_errors_anexada(admin_client):
     materia_principal = make_materia_principal()
@@ -581,3 +606,30 @@ def test_numeracao_materia_legislativa_por_ano(admin_client):
     response_content = eval(response.content.decode('ascii'))
     esperado_outro_ano = eval('{"ano": "2010", "numero": 1}')
     assert response_content['numero'] == esperado_outro_ano['numero']
+
+
+@pytest.mark.django_db(transaction=False)
+def test_proposicao_hash_conteudo_gravado_no_upload():
+    conteudo = 'texto da proposição'.encode('UTF-8')
+    proposicao = mommy.make(Proposicao,
+                            texto_original=SimpleUploadedFile(
+                                'file.txt', conteudo),
+                            data_envio=timezone.now(),
+                            data_recebimento=None)
+
+    hash_conteudo = hashlib.md5(conteudo).hexdigest()
+    assert Proposicao.objects.get(
+        pk=proposicao.pk).hash_conteudo == hash_conteudo
+    assert proposicao.codigo_recibo == 'P%s%s%s' % (
+        hash_conteudo, SEPARADOR_HASH_PROPOSICAO, proposicao.pk)
+    assert proposicao.verifica_hash_conteudo()
+
+    assert get_proposicao_pendente(hash_conteudo, proposicao.pk) == proposicao
+    with pytest.raises(Proposicao.DoesNotExist):
+        get_proposicao_pendente('0' * 32, proposicao.pk)
+
+    # proposições anteriores ao campo têm o hash gravado no primeiro uso
+    Proposicao.objects.filter(pk=proposicao.pk).update(hash_conteudo='')
+    assert get_proposicao_pendente(hash_conteudo, proposicao.pk) == proposicao
+    assert Proposicao.objects.get(
+        pk=proposicao.pk).hash_conteudo == hash_conteudo
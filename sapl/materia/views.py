@@ -11,7 +11,6 @@ from django.contrib.auth.decorators import permission_required
 from django.contrib.auth.mixins import PermissionRequiredMixin
 from django.core.exceptions import ObjectDoesNotExist, MultipleObjectsReturned
 from django.core.urlresolvers import reverse
-from django.db.models import Max
 from django.http import HttpResponse, JsonResponse
 from django.http.response import Http404, HttpResponseRedirect
 from django.shortcuts import get_object_or_404, redirect
@@ -25,8 +24,11 @@ from django_filters.views import FilterView
 import weasyprint
 
 import sapl
+from sapl.base.configuracoes import (get_casa_legislativa,
+                                      get_config_aplicacao)
 from sapl.base.email_utils import do_envia_email_confirmacao
-from sapl.base.models import Autor, CasaLegislativa, AppConfig as BaseAppConfig
+from sapl.base.models import Autor, AppConfig as BaseAppConfig
+from sapl.base.numeracao import sequencia_materia, ultimo_numero
 from sapl.base.signals import tramitacao_signal
 from sapl.comissoes.models import Comissao, Participacao
 from sapl.compilacao.models import (STATUS_TA_IMMUTABLE_RESTRICT,
@@ -43,10 +45,9 @@ from sapl.materia.forms import (AnexadaForm, AutoriaForm,
                                 OrgaoForm, ProposicaoForm, TipoProposicaoForm,
                                 TramitacaoForm, TramitacaoUpdateForm)
 from sapl.norma.models import LegislacaoCitada
-from sapl.parlamentares.models import Legislatura
 from sapl.protocoloadm.models import Protocolo
 from sapl.utils import (YES_NO_CHOICES, autor_label, autor_modal, SEPARADOR_HASH_PROPOSICAO,
-                        gerar_hash_arquivo, get_base_url,
+                        get_base_url,
                         get_mime_type_from_file_extension, montar_row_autor,
                         show_results_filter_set, mail_service_configured)
 
@@ -311,47 +312,11 @@ class ProposicaoTaView(IntegracaoTaView):
 
 @permission_required('materia.detail_materialegislativa')
 def recuperar_materia(request):
-    logger = logging.getLogger(__name__)
-    username = request.user.username
     tipo = TipoMateriaLegislativa.objects.get(pk=request.GET['tipo'])
     ano = request.GET.get('ano', '')
 
-    numeracao = None
-    try:
-        logger.debug("user=" + username +
-                     ". Tentando obter numeração da matéria.")
-        numeracao = sapl.base.models.AppConfig.objects.last(
-        ).sequencia_numeracao
-    except AttributeError as e:
-        logger.error("user=" + username + ". " + str(e) +
-                     " Numeracao da matéria definida como None.")
-        pass
-
-    if tipo.sequencia_numeracao:
-        numeracao = tipo.sequencia_numeracao
-
-    if numeracao == 'A':
-        numero = MateriaLegislativa.objects.filter(
-            ano=ano, tipo=tipo).aggregate(Max('numero'))
-    elif numeracao == 'L':
-        legislatura = Legislatura.objects.filter(
-            data_inicio__year__lte=ano,
-            data_fim__year__gte=ano).first()
-        data_inicio = legislatura.data_inicio
-        data_fim = legislatura.data_fim
-        numero = MateriaLegislativa.objects.filter(
-            data_apresentacao__gte=data_inicio,
-            data_apresentacao__lte=data_fim,
-            tipo=tipo).aggregate(
-            Max('numero'))
-    elif numeracao == 'U':
-        numero = MateriaLegislativa.objects.filter(
-            tipo=tipo).aggregate(Max('numero'))
-
-    if numeracao is None:
-        numero['numero__max'] = 0
-
-    max_numero = numero['numero__max'] + 1 if numero['numero__max'] else 1
+    max_numero = ultimo_numero(
+        *sequencia_materia(tipo, int(ano) if ano else None)) + 1
 
     response = JsonResponse({'numero': max_numero, 'ano': ano})
 
@@ -422,6 +387,37 @@ def criar_doc_proposicao(proposicao):
     )
 
 
+def get_proposicao_pendente(hash_conteudo, pk):
+    """
+    Proposição enviada e ainda não recebida cujo conteúdo tem o hash
+    informado, buscada pelo hash gravado, sem reler o conteúdo. Com
+    settings.VERIFICAR_HASH_PROPOSICAO o conteúdo é relido e conferido.
+
+    :raise Proposicao.DoesNotExist: se não houver proposição pendente com
+        esse hash
+    """
+    pendentes = Proposicao.objects.filter(pk=pk,
+                                          data_envio__isnull=False,
+                                          data_recebimento__isnull=True)
+    proposicao = pendentes.filter(hash_conteudo=hash_conteudo).first()
+
+    if proposicao is None:
+        # enviada antes da gravação do hash
+        proposicao = pendentes.filter(hash_conteudo='').first()
+        if proposicao is None or \
+                proposicao.get_hash_conteudo() != hash_conteudo:
+            raise Proposicao.DoesNotExist
+
+    if settings.VERIFICAR_HASH_PROPOSICAO and \
+            not proposicao.verifica_hash_conteudo():
+        logger = logging.getLogger(__name__)
+        logger.error('Conteúdo da Proposicao (pk={}) diverge do hash gravado '
+                     'no envio.'.format(pk))
+        raise Proposicao.DoesNotExist
+
+    return proposicao
+
+
 class ProposicaoDevolvida(PermissionRequiredMixin, ListView):
     template_name = 'materia/prop_devolvidas_list.html'
     model = Proposicao
@@ -467,7 +463,7 @@ class ProposicaoPendente(PermissionRequiredMixin, ListView):
             data_devolucao__isnull=True)
         paginator = context['paginator']
         page_obj = context['page_obj']
-        context['AppConfig'] = sapl.base.models.AppConfig.objects.all().last()
+        context['AppConfig'] = get_config_aplicacao()
         context['page_range'] = make_pagination(
             page_obj.number, paginator.num_pages)
         context['NO_ENTRIES_MSG'] = 'Nenhuma proposição pendente.'
@@ -516,29 +512,18 @@ class ReceberProposicao(PermissionRequiredForAppCrudMixin, FormView):
                 # A ultima parte do código deve ser a pk da Proposicao
                 cod_hash = form.cleaned_data["cod_hash"]. \
                     replace('/', SEPARADOR_HASH_PROPOSICAO)
-                id = cod_hash.split(SEPARADOR_HASH_PROPOSICAO)[1]
-                proposicao = Proposicao.objects.get(id=id,
-                                                    data_envio__isnull=False,
-                                                    data_recebimento__isnull=True)
-
-                if proposicao.texto_articulado.exists():
-                    ta = proposicao.texto_articulado.first()
-                    # FIXME hash para textos articulados
-                    hasher = 'P' + ta.hash() + SEPARADOR_HASH_PROPOSICAO + str(proposicao.id)
-                else:
-                    hasher = gerar_hash_arquivo(
-                        proposicao.texto_original.path,
-                        str(proposicao.id)) \
-                        if proposicao.texto_original else None
-                if hasher == cod_hash:
-                    return HttpResponseRedirect(
-                        reverse('sapl.materia:proposicao-confirmar',
-                                kwargs={
-                                    'hash': hasher.split(SEPARADOR_HASH_PROPOSICAO)[0][1:],
-                                    'pk': proposicao.pk}))
+                hash_conteudo, id = cod_hash.split(
+                    SEPARADOR_HASH_PROPOSICAO)[:2]
+                proposicao = get_proposicao_pendente(hash_conteudo[1:], id)
+
+                return HttpResponseRedirect(
+                    reverse('sapl.materia:proposicao-confirmar',
+                            kwargs={
+                                'hash': proposicao.hash_conteudo,
+                                'pk': proposicao.pk}))
             except ObjectDoesNotExist:
                 messages.error(request, _('Proposição não encontrada!'))
-            except IndexError:
+            except (IndexError, ValueError):
                 messages.error(request, _('Código de recibo mal formado!'))
             except IOError:
                 messages.error(request, _(
@@ -613,21 +598,8 @@ class ConfirmarProposicao(PermissionRequiredForAppCrudMixin, UpdateView):
             """
             self.logger.debug("user=" + username +
                               ". Tentando obter objeto Proposicao.")
-            proposicao = Proposicao.objects.get(pk=self.kwargs['pk'],
-                                                data_envio__isnull=False,
-                                                data_recebimento__isnull=True)
-            self.object = None
-
-            if proposicao.texto_articulado.exists():
-                ta = proposicao.texto_articulado.first()
-                hasher = 'P' + ta.hash() + SEPARADOR_HASH_PROPOSICAO + str(proposicao.id)
-            else:
-                hasher = gerar_hash_arquivo(
-                    proposicao.texto_original.path,
-                    str(proposicao.pk)) if proposicao.texto_original else None
-
-            if hasher == 'P%s%s%s' % (self.kwargs['hash'], SEPARADOR_HASH_PROPOSICAO, proposicao.pk):
-                self.object = proposicao
+            self.object = get_proposicao_pendente(self.kwargs['hash'],
+                                                  self.kwargs['pk'])
         except Exception as e:
             self.logger.error("user=" + username + ". Objeto Proposicao com atributos (pk={}, data_envio=Not Null, "
                               "data_recebimento=Null) não encontrado. ".format(self.kwargs['pk']) + str(e))
@@ -755,7 +727,7 @@ class ProposicaoCrud(Crud):
         def get_context_data(self, **kwargs):
             context = super().get_context_data(**kwargs)
             context['subnav_template_name'] = ''
-            context['AppConfig'] = sapl.base.models.AppConfig.objects.all().last()
+            context['AppConfig'] = get_config_aplicacao()
 
             context['title'] = '%s <small>(%s)</small>' % (
                 self.object, self.object.autor)
@@ -792,9 +764,10 @@ class ProposicaoCrud(Crud):
                             receber_recibo = BaseAppConfig.attr(
                                 'receber_recibo_proposicao')
 
+                            # hash do texto articulado congelado
+                            p.atualiza_hash_conteudo()
                             if not receber_recibo:
-                                ta = p.texto_articulado.first()
-                                p.hash_code = 'P' + ta.hash() + SEPARADOR_HASH_PROPOSICAO + str(p.pk)
+                                p.hash_code = p.codigo_recibo
 
                         p.data_devolucao = None
                         p.data_envio = timezone.now()
@@ -1047,14 +1020,7 @@ class ReciboProposicaoView(TemplateView):
             **kwargs)
         proposicao = Proposicao.objects.get(pk=self.kwargs['pk'])
 
-        if proposicao.texto_original:
-            _hash = gerar_hash_arquivo(
-                proposicao.texto_original.path,
-                self.kwargs['pk'])
-        elif proposicao.texto_articulado.exists():
-            ta = proposicao.texto_articulado.first()
-            # FIXME hash para textos articulados
-            _hash = 'P' + ta.hash() + '/' + str(proposicao.id)
+        _hash = proposicao.codigo_recibo
 
         from sapl.utils import create_barcode
         base64_data = create_barcode(_hash, 100, 500)
@@ -1895,7 +1861,7 @@ class AcompanhamentoMateriaView(CreateView):
                     materia=materia,
                     email=email,
                     confirmado=False)
-                casa = CasaLegislativa.objects.first()
+                casa = get_casa_legislativa()
 
                 do_envia_email_confirmacao(base_url,
                                            casa,
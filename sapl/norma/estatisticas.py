@@ -0,0 +1,108 @@
+"""
+Registro em lote dos acessos às normas.
+
+Cada acesso apenas incrementa um contador em memória, por (norma, dia).
+Os contadores são descarregados em segundo plano, em uma única instrução
+por lote, somando-se aos totais diários de NormaEstatisticasDia. O
+descarregamento ocorre a cada INTERVALO segundos ou quando o buffer atinge
+LIMITE entradas, e também ao final do processo.
+"""
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from sapl.norma.models import NormaEstatisticasDia
+
+INTERVALO = getattr(settings, 'NORMA_ESTATISTICAS_INTERVALO', 60)
+LIMITE = getattr(settings, 'NORMA_ESTATISTICAS_LIMITE', 1000)
+TAMANHO_LOTE = 500
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_buffer = Counter()
+_ultimo_descarregamento = time.time()
+_pool = None
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=1)
+    return _pool
+
+
+def registra_acesso(norma_id):
+    global _ultimo_descarregamento
+    with _lock:
+        _buffer[(int(norma_id), timezone.localdate())] += 1
+        descarregar = (len(_buffer) >= LIMITE or
+                       time.time() - _ultimo_descarregamento >= INTERVALO)
+        if descarregar:
+            _ultimo_descarregamento = time.time()
+    if descarregar:
+        get_pool().submit(_descarrega_em_segundo_plano)
+
+
+def _retira_buffer():
+    with _lock:
+        acessos = dict(_buffer)
+        _buffer.clear()
+    return acessos
+
+
+def _descarrega_em_segundo_plano():
+    try:
+        descarrega_acessos()
+    except Exception as e:
+        logger.error('Erro gravando estatísticas de acesso: {}'.format(e))
+    finally:
+        connection.close()
+
+
+def descarrega_acessos():
+    """
+    Soma os acessos do buffer aos totais diários. Acessos a normas
+    excluídas nesse meio tempo são descartados.
+
+    :return: número de acessos gravados, sem os descartados
+    """
+    acessos = list(_retira_buffer().items())
+    tabela = NormaEstatisticasDia._meta.db_table
+    tabela_norma = NormaEstatisticasDia._meta.get_field(
+        'norma').related_model._meta.db_table
+
+    gravados = 0
+    for i in range(0, len(acessos), TAMANHO_LOTE):
+        lote = acessos[i:i + TAMANHO_LOTE]
+        valores = ', '.join(['(%s, %s::date, %s)'] * len(lote))
+        parametros = []
+        for (norma_id, data), total in lote:
+            parametros += [norma_id, data, total]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                '''
+                insert into {tabela} (norma_id, data, acessos)
+                select v.norma_id, v.data, v.acessos
+                from (values {valores}) as v (norma_id, data, acessos)
+                join {tabela_norma} n on n.id = v.norma_id
+                on conflict (norma_id, data) do update
+                set acessos = {tabela}.acessos + excluded.acessos
+                returning norma_id, data
+                '''.format(tabela=tabela, tabela_norma=tabela_norma,
+                           valores=valores),
+                parametros)
+            totais = dict(lote)
+            gravados += sum(totais[(norma_id, data)]
+                            for norma_id, data in cursor.fetchall())
+    return gravados
+
+
+atexit.register(lambda: _buffer and _descarrega_em_segundo_plano())
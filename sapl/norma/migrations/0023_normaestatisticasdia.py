@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('norma', '0022_auto_20190108_1606'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NormaEstatisticasDia',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.DateField(verbose_name='Data')),
+                ('acessos', models.PositiveIntegerField(default=0, verbose_name='Acessos')),
+                ('norma', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='norma.NormaJuridica')),
+            ],
+            options={
+                'verbose_name': 'Acessos Diários a Norma',
+                'verbose_name_plural': 'Acessos Diários a Normas',
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='normaestatisticasdia',
+            unique_together=set([('norma', 'data')]),
+        ),
+        # consolida os acessos já registrados individualmente
+        migrations.RunSQL(
+            '''
+            insert into norma_normaestatisticasdia (norma_id, data, acessos)
+            select norma_id,
+                   coalesce(horario_acesso::date, make_date(ano, 1, 1)),
+                   count(*)
+            from norma_normaestatisticas
+            group by 1, 2;
+            ''',
+            migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('norma', '0023_normaestatisticasdia'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='normajuridica',
+            index=models.Index(fields=['data_ultima_atualizacao', 'id'],
+                               name='norma_ultima_atualizacao_idx'),
+        ),
+    ]
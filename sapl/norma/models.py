@@ -142,6 +142,11 @@ class NormaJuridica(models.Model):
         verbose_name = _('Norma Jurídica')
         verbose_name_plural = _('Normas Jurídicas')
         ordering = ['-data', '-numero']
+        # paginação do provedor OAI-PMH (sapl.lexml.oai)
+        indexes = [
+            models.Index(fields=['data_ultima_atualizacao', 'id'],
+                         name='norma_ultima_atualizacao_idx'),
+        ]
 
     def get_normas_relacionadas(self):
         principais = NormaRelacionada.objects.filter(
@@ -211,6 +216,27 @@ class NormaEstatisticas(models.Model):
             'usuario': self.usuario, 'norma': self.norma}
 
 
+class NormaEstatisticasDia(models.Model):
+    """
+    Total diário de acessos a cada norma, acumulado em lotes a partir dos
+    acessos registrados em memória (ver estatisticas.py).
+    """
+    norma = models.ForeignKey(NormaJuridica,
+                              on_delete=models.CASCADE)
+    data = models.DateField(verbose_name=_('Data'))
+    acessos = models.PositiveIntegerField(default=0,
+                                          verbose_name=_('Acessos'))
+
+    class Meta:
+        verbose_name = _('Acessos Diários a Norma')
+        verbose_name_plural = _('Acessos Diários a Normas')
+        unique_together = (('norma', 'data'), )
+
+    def __str__(self):
+        return _('Norma: %(norma)s, Data: %(data)s, Acessos: %(acessos)s') % {
+            'norma': self.norma, 'data': self.data, 'acessos': self.acessos}
+
+
 @reversion.register()
 class AutoriaNorma(models.Model):
     autor = models.ForeignKey(Autor,
@@ -1,3 +1,5 @@
+import time
+
 from django.core.urlresolvers import reverse
 from django.utils.translation import ugettext_lazy as _
 from model_mommy import mommy
@@ -7,7 +9,10 @@ from sapl.base.models import AppConfig
 from sapl.materia.models import MateriaLegislativa, TipoMateriaLegislativa
 from sapl.norma.forms import (NormaJuridicaForm, NormaPesquisaSimplesForm,
                               NormaRelacionadaForm)
-from sapl.norma.models import NormaJuridica, TipoNormaJuridica
+from sapl.norma import estatisticas
+from sapl.norma.estatisticas import descarrega_acessos, registra_acesso
+from sapl.norma.models import (NormaEstatisticasDia, NormaJuridica,
+                               TipoNormaJuridica)
 
 
 @pytest.mark.django_db(transaction=False)
@@ -156,3 +161,31 @@ def test_norma_pesquisa_form_datas_invalidas():
     assert not form.is_valid()
     assert form.errors['__all__'] == [_('A Data Final não pode ser menor que '
                                         'a Data Inicial')]
+
+
+@pytest.mark.django_db(transaction=False)
+def test_acessos_a_normas_consolidados_por_dia(monkeypatch):
+    # sem descarregamentos em segundo plano, que usariam outra conexão e
+    # não enxergariam as normas criadas na transação do teste
+    monkeypatch.setattr(estatisticas, 'INTERVALO', float('inf'))
+    monkeypatch.setattr(estatisticas, 'LIMITE', float('inf'))
+    monkeypatch.setattr(estatisticas, '_ultimo_descarregamento', time.time())
+    # acessos registrados por testes anteriores
+    estatisticas._retira_buffer()
+
+    norma = mommy.make(NormaJuridica)
+    excluida = mommy.make(NormaJuridica)
+
+    for _i in range(3):
+        registra_acesso(norma.pk)
+    registra_acesso(excluida.pk)
+    excluida.delete()
+    # o acesso à norma excluída é descartado
+    assert descarrega_acessos() == 3
+
+    registra_acesso(norma.pk)
+    descarrega_acessos()
+
+    dia = NormaEstatisticasDia.objects.get()
+    assert (dia.norma, dia.acessos) == (norma, 4)
+    assert descarrega_acessos() == 0
@@ -15,17 +15,18 @@ from django_filters.views import FilterView
 import weasyprint
 
 from sapl import settings
-import sapl
+from sapl.base.configuracoes import get_config_aplicacao
 from sapl.base.models import AppConfig
 from sapl.compilacao.views import IntegracaoTaView
 from sapl.crud.base import (RP_DETAIL, RP_LIST, Crud, CrudAux,
                             MasterDetailCrud, make_pagination)
 from sapl.utils import show_results_filter_set
 
+from .estatisticas import registra_acesso
 from .forms import (AnexoNormaJuridicaForm, NormaFilterSet, NormaJuridicaForm,
                     NormaPesquisaSimplesForm, NormaRelacionadaForm, AutoriaNormaForm)
 from .models import (AnexoNormaJuridica, AssuntoNorma, NormaJuridica, NormaRelacionada,
-                     TipoNormaJuridica, TipoVinculoNormaJuridica, AutoriaNorma, NormaEstatisticas)
+                     TipoNormaJuridica, TipoVinculoNormaJuridica, AutoriaNorma)
 
 
 # LegislacaoCitadaCrud = Crud.build(LegislacaoCitada, '')
@@ -194,12 +195,9 @@ class NormaCrud(Crud):
 
     class DetailView(Crud.DetailView):
         def get(self, request, *args, **kwargs):
-            estatisticas_acesso_normas = AppConfig.objects.first().estatisticas_acesso_normas
+            estatisticas_acesso_normas = get_config_aplicacao().estatisticas_acesso_normas
             if estatisticas_acesso_normas == 'S':
-                NormaEstatisticas.objects.create(usuario=str(self.request.user),
-                                                 norma_id=kwargs['pk'],
-                                                 ano=timezone.now().year,
-                                                 horario_acesso=timezone.now())
+                registra_acesso(kwargs['pk'])
             return super().get(request, *args, **kwargs)
 
     class DeleteView(Crud.DeleteView):
@@ -222,8 +220,7 @@ class NormaCrud(Crud):
             try:
                 self.logger.debug(
                     'user=' + username + '. Tentando obter objeto de modelo da esfera da federação.')
-                esfera = sapl.base.models.AppConfig.objects.last(
-                ).esfera_federacao
+                esfera = get_config_aplicacao().esfera_federacao
                 self.initial['esfera_federacao'] = esfera
             except:
                 self.logger.error(
@@ -0,0 +1,72 @@
+"""
+Estado do painel eletrônico mantido em cache.
+
+O estado de uma sessão plenária exibido pelos painéis (matéria aberta,
+presentes, votos, oradores, ...) só é remontado quando algo que o afeta é
+salvo. Cada alteração gera uma nova versão, que é compartilhada entre os
+workers pelo backend de cache configurado. Os painéis consultam o estado
+periodicamente enviando o ETag da última resposta, derivado desta versão, e
+recebem 304 sem que o banco de dados seja consultado enquanto nada mudar.
+"""
+import uuid
+
+from django.core.cache import cache
+
+CHAVE_VERSAO_GLOBAL = 'painel:versao'
+CHAVE_VERSAO_SESSAO = 'painel:versao:%s'
+CHAVE_ESTADO_SESSAO = 'painel:estado:%s'
+
+
+def _nova_versao():
+    return uuid.uuid4().hex[:12]
+
+
+def _get_versao(chave):
+    versao = cache.get(chave)
+    if versao is None:
+        cache.add(chave, _nova_versao(), None)
+        versao = cache.get(chave)
+    return versao
+
+
+def versao_painel(pk):
+    """
+    Versão corrente do estado do painel da sessão plenária `pk`.
+    Muda sempre que um dado da sessão ou um dado global (casa legislativa,
+    configurações, parlamentares) é alterado.
+    """
+    return '%s-%s' % (_get_versao(CHAVE_VERSAO_GLOBAL),
+                      _get_versao(CHAVE_VERSAO_SESSAO % pk))
+
+
+def invalida_estado_painel(pk=None):
+    """
+    Invalida o estado do painel da sessão `pk` ou, se `pk` for None,
+    de todas as sessões.
+    """
+    if pk is None:
+        cache.set(CHAVE_VERSAO_GLOBAL, _nova_versao(), None)
+    else:
+        cache.set(CHAVE_VERSAO_SESSAO % pk, _nova_versao(), None)
+        cache.delete(CHAVE_ESTADO_SESSAO % pk)
+
+
+def get_estado_painel(pk, monta_estado):
+    """
+    Retorna o estado do painel da sessão `pk`. Se não houver estado em
+    cache para a versão corrente, ele é montado por `monta_estado(pk)`.
+    """
+    versao = versao_painel(pk)
+    estado = cache.get(CHAVE_ESTADO_SESSAO % pk)
+    if estado is None or estado['versao'] != versao:
+        estado = monta_estado(pk)
+        # a própria montagem pode alterar a versão (ex.: ao criar o
+        # AppConfig ausente); o estado é então montado sob a nova versão
+        atual = versao_painel(pk)
+        if atual != versao:
+            versao = atual
+            estado = monta_estado(pk)
+        estado['versao'] = versao
+        cache.set(CHAVE_ESTADO_SESSAO % pk, estado, None)
+    return estado
+
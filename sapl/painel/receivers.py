@@ -0,0 +1,59 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from sapl.base.models import AppConfig, CasaLegislativa
+from sapl.painel.estado import invalida_estado_painel
+from sapl.painel.models import Cronometro
+from sapl.parlamentares.models import Filiacao, Mandato, Parlamentar, Partido
+from sapl.sessao.models import (ExpedienteMateria, OradorExpediente, OrdemDia,
+                                PresencaOrdemDia, RegistroVotacao,
+                                SessaoPlenaria, SessaoPlenariaPresenca,
+                                VotoParlamentar)
+from sapl.sessao.receivers import sessao_da_votacao
+
+@receiver(post_save, sender=SessaoPlenaria)
+@receiver(post_delete, sender=SessaoPlenaria)
+def invalida_painel_sessao(sender, instance, **kwargs):
+    invalida_estado_painel(instance.pk)
+
+
+@receiver(post_save, sender=OrdemDia)
+@receiver(post_delete, sender=OrdemDia)
+@receiver(post_save, sender=ExpedienteMateria)
+@receiver(post_delete, sender=ExpedienteMateria)
+@receiver(post_save, sender=PresencaOrdemDia)
+@receiver(post_delete, sender=PresencaOrdemDia)
+@receiver(post_save, sender=SessaoPlenariaPresenca)
+@receiver(post_delete, sender=SessaoPlenariaPresenca)
+@receiver(post_save, sender=OradorExpediente)
+@receiver(post_delete, sender=OradorExpediente)
+def invalida_painel_dados_sessao(sender, instance, **kwargs):
+    invalida_estado_painel(instance.sessao_plenaria_id)
+
+
+@receiver(post_save, sender=RegistroVotacao)
+@receiver(post_delete, sender=RegistroVotacao)
+@receiver(post_save, sender=VotoParlamentar)
+@receiver(post_delete, sender=VotoParlamentar)
+def invalida_painel_votacao(sender, instance, **kwargs):
+    pk = sessao_da_votacao(instance)
+    if pk is not None:
+        invalida_estado_painel(pk)
+
+
+@receiver(post_save, sender=CasaLegislativa)
+@receiver(post_delete, sender=CasaLegislativa)
+@receiver(post_save, sender=AppConfig)
+@receiver(post_delete, sender=AppConfig)
+@receiver(post_save, sender=Cronometro)
+@receiver(post_delete, sender=Cronometro)
+@receiver(post_save, sender=Parlamentar)
+@receiver(post_delete, sender=Parlamentar)
+@receiver(post_save, sender=Mandato)
+@receiver(post_delete, sender=Mandato)
+@receiver(post_save, sender=Filiacao)
+@receiver(post_delete, sender=Filiacao)
+@receiver(post_save, sender=Partido)
+@receiver(post_delete, sender=Partido)
+def invalida_painel_global(sender, instance, **kwargs):
+    invalida_estado_painel()
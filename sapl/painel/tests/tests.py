@@ -1,3 +1,99 @@
-# from django.test import TestCase
+from datetime import date
 
-# Create your tests here.
+import pytest
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from model_mommy import mommy
+
+from sapl.base.models import AppConfig
+from sapl.painel.estado import get_estado_painel, versao_painel
+from sapl.painel.views import get_presentes, get_votos
+from sapl.parlamentares.models import Filiacao, Mandato, Parlamentar
+from sapl.sessao.models import (OrdemDia, PresencaOrdemDia, SessaoPlenaria,
+                                SessaoPlenariaPresenca, VotoParlamentar)
+
+
+@pytest.mark.django_db(transaction=False)
+def test_estado_painel_reconstruido_somente_apos_alteracao():
+    sessao = mommy.make(SessaoPlenaria)
+    montagens = []
+
+    def monta_estado(pk):
+        montagens.append(pk)
+        return {'sessao_plenaria': pk}
+
+    get_estado_painel(sessao.pk, monta_estado)
+    get_estado_painel(sessao.pk, monta_estado)
+    assert len(montagens) == 1
+
+    versao = versao_painel(sessao.pk)
+    mommy.make(SessaoPlenariaPresenca,
+               sessao_plenaria=sessao,
+               parlamentar=mommy.make(Parlamentar))
+    assert versao_painel(sessao.pk) != versao
+
+    get_estado_painel(sessao.pk, monta_estado)
+    assert len(montagens) == 2
+
+
+@pytest.mark.django_db(transaction=False)
+def test_dados_painel_nao_modificados_respondem_304(admin_client):
+    mommy.make(AppConfig)
+    sessao, outra = mommy.make(SessaoPlenaria, _quantity=2)
+    parlamentar = mommy.make(Parlamentar)
+    url = reverse('sapl.painel:dados_painel', kwargs={'pk': sessao.pk})
+
+    response = admin_client.get(url)
+    assert response.status_code == 200
+    etag = response['ETag']
+
+    # sem alterações, o estado não é lido nem remontado
+    with CaptureQueriesContext(connection) as consultas:
+        response = admin_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+    assert not [c for c in consultas.captured_queries
+                if SessaoPlenaria._meta.db_table in c['sql']]
+
+    # alterações de outra sessão não mudam o ETag
+    mommy.make(SessaoPlenariaPresenca,
+               sessao_plenaria=outra, parlamentar=parlamentar)
+    assert admin_client.get(
+        url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+    mommy.make(SessaoPlenariaPresenca,
+               sessao_plenaria=sessao, parlamentar=parlamentar)
+    response = admin_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response['ETag'] != etag
+
+
+def _consultas_painel(sessao, ordem, quantidade):
+    for _ in range(quantidade):
+        parlamentar = mommy.make(Parlamentar, ativo=True)
+        mommy.make(Mandato, parlamentar=parlamentar,
+                   legislatura=sessao.legislatura)
+        mommy.make(Filiacao, parlamentar=parlamentar,
+                   data=sessao.data_inicio, data_desfiliacao=None)
+        mommy.make(PresencaOrdemDia, sessao_plenaria=sessao,
+                   parlamentar=parlamentar)
+        mommy.make(VotoParlamentar, ordem=ordem, parlamentar=parlamentar,
+                   voto='Sim')
+
+    with CaptureQueriesContext(connection) as consultas:
+        response = get_votos(get_presentes(sessao.pk, {}, ordem), ordem)
+
+    assert len(response['presentes']) == PresencaOrdemDia.objects.filter(
+        sessao_plenaria=sessao).count()
+    return len(consultas)
+
+
+@pytest.mark.django_db(transaction=False)
+def test_painel_numero_de_consultas_independe_de_presentes():
+    sessao = mommy.make(SessaoPlenaria, data_inicio=date(2018, 5, 2))
+    ordem = mommy.make(OrdemDia, sessao_plenaria=sessao, tipo_votacao=2)
+
+    consultas_poucos = _consultas_painel(sessao, ordem, 2)
+    consultas_muitos = _consultas_painel(sessao, ordem, 10)
+
+    assert consultas_poucos == consultas_muitos
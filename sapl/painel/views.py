@@ -1,3 +1,4 @@
+import hashlib
 import html
 import json
 import logging
@@ -7,22 +8,25 @@ from django.contrib.auth.decorators import user_passes_test
 from django.core.exceptions import ObjectDoesNotExist
 from django.core.urlresolvers import reverse
 from django.db.models import Q
-from django.http import HttpResponse, JsonResponse
+from django.http import (HttpResponse, HttpResponseNotModified,
+                         JsonResponse)
 from django.http.response import Http404, HttpResponseRedirect
 from django.shortcuts import render
 from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
 
-from sapl.base.models import AppConfig as ConfiguracoesAplicacao
-from sapl.base.models import CasaLegislativa
+from sapl.base.configuracoes import (get_casa_legislativa,
+                                      get_config_aplicacao)
 from sapl.crud.base import Crud
 from sapl.painel.apps import AppConfig
-from sapl.parlamentares.models import Legislatura, Parlamentar, Votante
+from sapl.painel.estado import get_estado_painel, versao_painel
+from sapl.parlamentares.models import (Legislatura, Mandato, Parlamentar,
+                                      Votante)
 from sapl.sessao.models import (ExpedienteMateria, OradorExpediente, OrdemDia,
                                 PresencaOrdemDia, RegistroVotacao,
                                 SessaoPlenaria, SessaoPlenariaPresenca,
                                 VotoParlamentar)
-from sapl.utils import filiacao_data, get_client_ip, sort_lista_chave
+from sapl.utils import filiacoes_data, get_client_ip, sort_lista_chave
 
 from .models import Cronometro
 
@@ -333,6 +337,8 @@ def painel_votacao_view(request):
 
 @user_passes_test(check_permission)
 def cronometro_painel(request):
+    # Cronômetros não fazem parte do estado em cache: entram apenas no ETag
+    # de get_dados_painel, sem invalidar o estado de nenhuma sessão.
     request.session[request.GET['tipo']] = request.GET['action']
     return HttpResponse({})
 
@@ -361,12 +367,14 @@ def get_presentes(pk, response, materia):
     else:
         presentes = SessaoPlenariaPresenca.objects.filter(
             sessao_plenaria_id=pk)
+    presentes = list(presentes.select_related('parlamentar'))
 
     sessao = SessaoPlenaria.objects.get(id=pk)
     num_presentes = len(presentes)
     data_sessao = sessao.data_inicio
     oradores = OradorExpediente.objects.filter(
-        sessao_plenaria_id=pk).order_by('numero_ordem')
+        sessao_plenaria_id=pk).select_related(
+            'parlamentar').order_by('numero_ordem')
 
     oradores_list = []
     for o in oradores:
@@ -377,14 +385,21 @@ def get_presentes(pk, response, materia):
                 'numero': o.numero_ordem
             })
 
+    # Mandatos na legislatura da sessão e filiações na data da sessão
+    # são recuperados de uma só vez para todos os presentes.
+    parlamentares_id = [p.parlamentar_id for p in presentes]
+    com_mandato = set(Mandato.objects.filter(
+        legislatura_id=sessao.legislatura_id,
+        parlamentar_id__in=parlamentares_id).values_list(
+            'parlamentar_id', flat=True))
+    filiacoes = filiacoes_data(parlamentares_id, data_sessao, data_sessao)
+
     presentes_list = []
     for p in presentes:
-        legislatura = sessao.legislatura
-        # Recupera os mandatos daquele parlamentar
-        mandatos = p.parlamentar.mandato_set.filter(legislatura=legislatura)
+        mandatos = p.parlamentar_id in com_mandato
 
         if p.parlamentar.ativo and mandatos:
-            filiacao = filiacao_data(p.parlamentar, data_sessao, data_sessao)
+            filiacao = filiacoes.get(p.parlamentar_id)
             if not filiacao:
                 partido = 'Sem Registro'
             else:
@@ -436,7 +451,7 @@ def get_materia_expediente_aberta(pk):
 def response_nenhuma_materia(response):
     response.update({
         'msg_painel': str(_('Nenhuma matéria disponivel para votação.'))})
-    return JsonResponse(response)
+    return response
 
 
 def get_votos(response, materia):
@@ -470,15 +485,16 @@ def get_votos(response, materia):
                     expediente_id=materia.id).order_by(
                         'parlamentar__nome_parlamentar')
 
+            votos = dict(votos_parlamentares.values_list(
+                'parlamentar_id', 'voto'))
+
             for i, p in enumerate(response['presentes']):
-                try:
-                    logger.info("Tentando obter votos do parlamentar (id={}).".format(p['parlamentar_id']))
-                    if votos_parlamentares.get(parlamentar_id=p['parlamentar_id']).voto:
-                        response['presentes'][i]['voto'] = 'Voto Informado'
-                except ObjectDoesNotExist:
-                    logger.error("Votos do parlamentar (id={}) não encontrados. Retornado vazio."
+                if p['parlamentar_id'] not in votos:
+                    logger.debug("Votos do parlamentar (id={}) não encontrados. Retornado vazio."
                                  .format(p['parlamentar_id']))
                     response['presentes'][i]['voto'] = ''
+                elif votos[p['parlamentar_id']]:
+                    response['presentes'][i]['voto'] = 'Voto Informado'
 
     else:
         total = (registro.numero_votos_sim +
@@ -490,14 +506,14 @@ def get_votos(response, materia):
                 votacao_id=registro.id).order_by(
                     'parlamentar__nome_parlamentar')
 
+            votos = dict(votos_parlamentares.values_list(
+                'parlamentar_id', 'voto'))
+
             for i, p in enumerate(response['presentes']):
-                try:
-                    logger.debug("Tentando obter votos do parlamentar (id={}).".format(p['parlamentar_id']))
-                    response['presentes'][i]['voto'] = votos_parlamentares.get(
-                        parlamentar_id=p['parlamentar_id']).voto
-                except ObjectDoesNotExist:
+                if p['parlamentar_id'] not in votos:
                     logger.error("Votos do parlamentar (id={}) não encontrados. Retornado None.".format(p['parlamentar_id']))
-                    response['presentes'][i]['voto'] = None
+                response['presentes'][i]['voto'] = votos.get(
+                    p['parlamentar_id'])
 
         response.update({
             'numero_votos_sim': registro.numero_votos_sim,
@@ -511,13 +527,16 @@ def get_votos(response, materia):
     return response
 
 
-@user_passes_test(check_permission)
-def get_dados_painel(request, pk):
+def monta_estado_painel(pk):
+    """
+    Monta o estado do painel da sessão plenária `pk` a partir do banco de
+    dados. Não inclui os cronômetros, que são mantidos na sessão do usuário.
+    """
     sessao = SessaoPlenaria.objects.get(id=pk)
 
-    casa = CasaLegislativa.objects.first()
+    casa = get_casa_legislativa()
 
-    app_config = ConfiguracoesAplicacao.objects.first()
+    app_config = get_config_aplicacao()
 
     brasao = None
     if casa and app_config and (bool(casa.logotipo)):
@@ -528,10 +547,6 @@ def get_dados_painel(request, pk):
         'sessao_plenaria': str(sessao),
         'sessao_plenaria_data': sessao.data_inicio.strftime('%d/%m/%Y'),
         'sessao_plenaria_hora_inicio': sessao.hora_inicio,
-        'cronometro_aparte': get_cronometro_status(request, 'aparte'),
-        'cronometro_discurso': get_cronometro_status(request, 'discurso'),
-        'cronometro_ordem': get_cronometro_status(request, 'ordem'),
-        'cronometro_consideracoes': get_cronometro_status(request, 'consideracoes'),
         'status_painel': sessao.painel_aberto,
         'brasao': brasao
     }
@@ -542,13 +557,13 @@ def get_dados_painel(request, pk):
     # Caso tenha alguma matéria com votação aberta, ela é mostrada no painel
     # com prioridade para Ordem do Dia.
     if ordem_dia:
-        return JsonResponse(get_votos(
+        return get_votos(
             get_presentes(pk, response, ordem_dia),
-            ordem_dia))
+            ordem_dia)
     elif expediente:
-        return JsonResponse(get_votos(
+        return get_votos(
             get_presentes(pk, response, expediente),
-            expediente))
+            expediente)
 
     # Caso não tenha nenhuma aberta,
     # a matéria a ser mostrada no Painel deve ser a última votada
@@ -577,9 +592,39 @@ def get_dados_painel(request, pk):
         elif last_expediente_voto:
             materia = ultimo_expediente_votado
 
-        return JsonResponse(get_votos(
-                            get_presentes(pk, response, materia),
-                            materia))
+        return get_votos(get_presentes(pk, response, materia), materia)
 
     # Retorna que não há nenhuma matéria já votada ou aberta
     return response_nenhuma_materia(get_presentes(pk, response, None))
+
+
+@user_passes_test(check_permission)
+def get_dados_painel(request, pk):
+    cronometros = {
+        'cronometro_aparte': get_cronometro_status(request, 'aparte'),
+        'cronometro_discurso': get_cronometro_status(request, 'discurso'),
+        'cronometro_ordem': get_cronometro_status(request, 'ordem'),
+        'cronometro_consideracoes': get_cronometro_status(
+            request, 'consideracoes'),
+    }
+
+    def get_etag(versao):
+        return '"%s"' % hashlib.md5('{versao}{cronometro_aparte}'
+                                    '{cronometro_discurso}{cronometro_ordem}'
+                                    '{cronometro_consideracoes}'.format(
+                                        versao=versao,
+                                        **cronometros).encode()).hexdigest()
+
+    # O ETag depende apenas da versão em cache e dos cronômetros: o painel
+    # que já tem a resposta corrente recebe 304 sem que o estado seja lido.
+    etag = get_etag(versao_painel(pk))
+    if request.META.get('HTTP_IF_NONE_MATCH') == etag:
+        resposta = HttpResponseNotModified()
+    else:
+        response = dict(get_estado_painel(pk, monta_estado_painel))
+        response.update(cronometros)
+        etag = get_etag(response['versao'])
+        resposta = JsonResponse(response)
+    resposta['ETag'] = etag
+    resposta['Cache-Control'] = 'no-cache'
+    return resposta
@@ -0,0 +1,172 @@
+"""
+Consulta em memória das filiações partidárias dos parlamentares.
+
+IndiceFiliacoes carrega, em uma única consulta, as filiações de um conjunto
+de parlamentares (ou de todos) e responde "partido na data D" e "partidos
+no período R" sem novas consultas. As filiações de cada parlamentar ficam
+ordenadas pela data de filiação, com o maior fim de intervalo acumulado,
+de modo que a busca parte de um bisect e para no primeiro intervalo que
+não pode mais conter a data.
+
+O índice de todas as filiações, usado pelos filtros de template, é mantido
+em memória em cada processo e reconstruído quando a versão gravada no cache
+muda; os receivers de sapl.base.receivers a invalidam quando filiações ou
+partidos são alterados.
+"""
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime
+import threading
+import uuid
+
+from django.core.cache import cache
+
+from sapl.parlamentares.models import Filiacao
+
+CHAVE_VERSAO_FILIACOES = 'parlamentares:filiacoes:versao'
+
+SEPARADOR_SIGLAS = ' | '
+
+# filiação sem desfiliação vale até o fim dos tempos
+_SEM_FIM = date.max
+
+_lock = threading.Lock()
+_indice = None
+
+
+def _data(valor):
+    # filtros de período entregam datetimes, comparados aqui como datas
+    return valor.date() if isinstance(valor, datetime) else valor
+
+
+class FiliacoesParlamentar:
+    """
+    Filiações de um parlamentar em ordem crescente de data de filiação.
+    """
+
+    def __init__(self, filiacoes):
+        # em empates de data, sem desfiliação por último, como a ordenação
+        # decrescente do Postgres (nulls first) lida ao contrário
+        self.filiacoes = sorted(
+            filiacoes, key=lambda f: (f[0], f[1] or _SEM_FIM))
+        self.datas = [f[0] for f in self.filiacoes]
+        self.max_fim = []
+        maior = None
+        for __, fim, __ in self.filiacoes:
+            fim = fim or _SEM_FIM
+            maior = fim if maior is None or fim > maior else maior
+            self.max_fim.append(maior)
+
+    def na_data(self, data):
+        """
+        Índices das filiações vigentes na data.
+        """
+        indices = set()
+        i = bisect_right(self.datas, data) - 1
+        while i >= 0 and self.max_fim[i] >= data:
+            if (self.filiacoes[i][1] or _SEM_FIM) >= data:
+                indices.add(i)
+            i -= 1
+        return indices
+
+    def no_intervalo(self, data_inicio, data_fim):
+        """
+        Índices das filiações vigentes em data_inicio ou iniciadas entre
+        data_inicio e data_fim.
+        """
+        indices = self.na_data(data_inicio)
+        indices.update(range(bisect_left(self.datas, data_inicio),
+                             bisect_right(self.datas, data_fim)))
+        return indices
+
+    def partidos(self, indices):
+        # da filiação mais recente para a mais antiga
+        return [self.filiacoes[i][2] for i in sorted(indices, reverse=True)]
+
+    def ultima(self):
+        return self.filiacoes[-1] if self.filiacoes else None
+
+
+class IndiceFiliacoes:
+    """
+    Filiações de um conjunto de parlamentares, carregadas em uma consulta.
+
+    :param parlamentares: parlamentares ou ids; se None, todos
+    """
+
+    def __init__(self, parlamentares=None):
+        filiacoes = Filiacao.objects.all()
+        if parlamentares is not None:
+            filiacoes = filiacoes.filter(parlamentar__in=parlamentares)
+
+        self.partidos = {}
+        por_parlamentar = {}
+        for filiacao in filiacoes.select_related('partido').order_by():
+            partido = self.partidos.setdefault(
+                filiacao.partido_id, filiacao.partido)
+            por_parlamentar.setdefault(filiacao.parlamentar_id, []).append(
+                (filiacao.data, filiacao.data_desfiliacao, partido))
+
+        self.parlamentares = {
+            k: FiliacoesParlamentar(v) for k, v in por_parlamentar.items()}
+
+    def _get(self, parlamentar):
+        return self.parlamentares.get(getattr(parlamentar, 'pk', parlamentar))
+
+    def partidos_data(self, parlamentar, data_inicio, data_fim=None):
+        """
+        Partidos do parlamentar vigentes em data_inicio ou, se data_fim for
+        informada, também os das filiações iniciadas no período.
+        """
+        filiacoes = self._get(parlamentar)
+        if filiacoes is None:
+            return []
+        if data_fim:
+            indices = filiacoes.no_intervalo(
+                _data(data_inicio), _data(data_fim))
+        else:
+            indices = filiacoes.na_data(_data(data_inicio))
+        return filiacoes.partidos(indices)
+
+    def siglas_data(self, parlamentar, data_inicio, data_fim=None):
+        return SEPARADOR_SIGLAS.join(
+            p.sigla for p in self.partidos_data(
+                parlamentar, data_inicio, data_fim))
+
+    def ultima_filiacao(self, parlamentar):
+        """
+        :return: partido da filiação mais recente ou None
+        """
+        filiacoes = self._get(parlamentar)
+        ultima = filiacoes.ultima() if filiacoes else None
+        return ultima[2] if ultima else None
+
+    def partido_atual(self, parlamentar):
+        """
+        :return: partido da filiação mais recente, se ainda vigente, ou None
+        """
+        filiacoes = self._get(parlamentar)
+        ultima = filiacoes.ultima() if filiacoes else None
+        return ultima[2] if ultima and not ultima[1] else None
+
+
+def get_indice_filiacoes():
+    """
+    Índice de todas as filiações, reconstruído apenas quando invalidado.
+    """
+    global _indice
+    versao = cache.get(CHAVE_VERSAO_FILIACOES)
+    if versao is None:
+        versao = uuid.uuid4().hex[:12]
+        cache.set(CHAVE_VERSAO_FILIACOES, versao, None)
+
+    indice = _indice
+    if indice is None or indice[0] != versao:
+        with _lock:
+            if _indice is None or _indice[0] != versao:
+                _indice = (versao, IndiceFiliacoes())
+            indice = _indice
+    return indice[1]
+
+
+def invalida_filiacoes():
+    cache.delete(CHAVE_VERSAO_FILIACOES)
@@ -1,12 +1,20 @@
+from datetime import date, datetime
+
 import pytest
 from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.utils.translation import ugettext_lazy as _
 from model_mommy import mommy
 
+from sapl.base.templatetags.common_tags import (filiacao_data_filter,
+                                                filiacao_intervalo_filter,
+                                                ultima_filiacao)
 from sapl.parlamentares.forms import FrenteForm, LegislaturaForm, MandatoForm
 from sapl.parlamentares.models import (Dependente, Filiacao, Legislatura,
                                        Mandato, Parlamentar, Partido,
                                        TipoDependente)
+from sapl.utils import filiacoes_atuais, filiacoes_data
 
 
 @pytest.mark.django_db(transaction=False)
@@ -287,3 +295,38 @@ def test_frente_form_valido():
                             })
 
     assert form.is_valid()
+
+
+@pytest.mark.django_db(transaction=False)
+def test_filtros_filiacao_sem_consultas():
+    parlamentar, outro = mommy.make(Parlamentar, _quantity=2)
+    pa = mommy.make(Partido, sigla='PA')
+    pb = mommy.make(Partido, sigla='PB')
+    mommy.make(Filiacao, parlamentar=parlamentar, partido=pa,
+               data=date(2010, 1, 1), data_desfiliacao=date(2015, 6, 30))
+    mommy.make(Filiacao, parlamentar=parlamentar, partido=pb,
+               data=date(2015, 7, 1), data_desfiliacao=None)
+
+    # a primeira consulta carrega o índice de todas as filiações
+    assert filiacao_data_filter(parlamentar, date(2012, 1, 1)) == 'PA'
+
+    with CaptureQueriesContext(connection) as consultas:
+        assert filiacao_data_filter(parlamentar, date(2015, 6, 30)) == 'PA'
+        assert filiacao_data_filter(parlamentar, date(2009, 1, 1)) == ''
+        assert filiacao_data_filter(outro, date(2012, 1, 1)) == ''
+        assert filiacao_intervalo_filter(
+            parlamentar, (datetime(2015, 1, 1), datetime(2016, 1, 1))
+        ) == 'PB | PA'
+        assert ultima_filiacao(parlamentar) == pb
+        assert ultima_filiacao(outro) is None
+    assert not [c for c in consultas.captured_queries
+                if Filiacao._meta.db_table in c['sql']]
+
+    # novas filiações invalidam o índice
+    mommy.make(Filiacao, parlamentar=outro, partido=pb,
+               data=date(2011, 1, 1), data_desfiliacao=None)
+    assert filiacao_data_filter(outro, date(2012, 1, 1)) == 'PB'
+
+    assert filiacoes_data([parlamentar, outro], date(2016, 1, 1)) == {
+        parlamentar.pk: 'PB', outro.pk: 'PB'}
+    assert filiacoes_atuais([parlamentar]) == {parlamentar.pk: 'PB'}
@@ -9,9 +9,10 @@ from django.contrib import messages
 from django.contrib.auth.decorators import permission_required
 from django.contrib.auth.mixins import PermissionRequiredMixin
 from django.contrib.contenttypes.models import ContentType
-from django.core.exceptions import ObjectDoesNotExist
+from django.core.exceptions import ObjectDoesNotExist, ValidationError
 from django.core.urlresolvers import reverse
-from django.db.models import Max, Q
+from django.db import transaction
+from django.db.models import Q
 from django.http import Http404, HttpResponse, JsonResponse
 from django.http.response import HttpResponseRedirect
 from django.shortcuts import redirect
@@ -22,15 +23,18 @@ from django.views.generic.base import RedirectView, TemplateView
 from django.views.generic.edit import FormView
 from django_filters.views import FilterView
 
-import sapl
 from sapl.base.email_utils import do_envia_email_confirmacao
-from sapl.base.models import Autor, CasaLegislativa
+from sapl.base.configuracoes import (get_casa_legislativa,
+                                      get_config_aplicacao)
+from sapl.base.models import Autor
+from sapl.base.numeracao import (proximo_numero, sequencia_documento,
+                                 sequencia_protocolo, ultimo_numero)
 from sapl.base.signals import tramitacao_signal
 from sapl.comissoes.models import Comissao
 from sapl.crud.base import Crud, CrudAux, MasterDetailCrud, make_pagination
 from sapl.materia.models import MateriaLegislativa, TipoMateriaLegislativa
 from sapl.materia.views import gerar_pdf_impressos
-from sapl.parlamentares.models import Legislatura, Parlamentar
+from sapl.parlamentares.models import Parlamentar
 from sapl.protocoloadm.models import Protocolo
 from sapl.utils import (create_barcode, get_base_url, get_client_ip,
                         get_mime_type_from_file_extension,
@@ -87,7 +91,7 @@ def doc_texto_integral(request, pk):
     can_see = True
 
     if not request.user.is_authenticated():
-        app_config = sapl.base.models.AppConfig.objects.last()
+        app_config = get_config_aplicacao()
         if app_config and app_config.documentos_administrativos == 'R':
             can_see = False
 
@@ -236,7 +240,7 @@ class AcompanhamentoDocumentoView(CreateView):
                     documento=documento,
                     email=email,
                     confirmado=False)
-                casa = CasaLegislativa.objects.first()
+                casa = get_casa_legislativa()
 
                 do_envia_email_confirmacao(base_url,
                                            casa,
@@ -278,7 +282,7 @@ class AcompanhamentoDocumentoView(CreateView):
 class DocumentoAdministrativoMixin:
 
     def has_permission(self):
-        app_config = sapl.base.models.AppConfig.objects.last()
+        app_config = get_config_aplicacao()
         if app_config and app_config.documentos_administrativos == 'O':
             return True
 
@@ -504,47 +508,8 @@ class ProtocoloDocumentoView(PermissionRequiredMixin,
     def form_valid(self, form):
         protocolo = form.save(commit=False)
         username = self.request.user.username
-        try:
-            self.logger.debug("user=" + username +
-                              ". Tentando obter sequência de numeração.")
-            numeracao = sapl.base.models.AppConfig.objects.last(
-            ).sequencia_numeracao
-        except AttributeError as e:
-            self.logger.error("user=" + username + ". É preciso definir a sequencia de "
-                              "numeração na tabelas auxiliares! " + str(e))
-            msg = _('É preciso definir a sequencia de ' +
-                    'numeração na tabelas auxiliares!')
-            messages.add_message(self.request, messages.ERROR, msg)
-            return self.render_to_response(self.get_context_data())
-
-        if numeracao == 'A':
-            numero = Protocolo.objects.filter(
-                ano=timezone.now().year).aggregate(Max('numero'))
-        elif numeracao == 'L':
-            legislatura = Legislatura.objects.filter(
-                data_inicio__year__lte=timezone.now().year,
-                data_fim__year__gte=timezone.now().year).first()
-            data_inicio = legislatura.data_inicio
-            data_fim = legislatura.data_fim
-            numero = Protocolo.objects.filter(
-                data__gte=data_inicio,
-                data__lte=data_fim).aggregate(
-                Max('numero'))
-        elif numeracao == 'U':
-            numero = Protocolo.objects.all().aggregate(Max('numero'))
-
         protocolo.tipo_processo = '0'  # TODO validar o significado
         protocolo.anulado = False
-        if not protocolo.numero:
-            protocolo.numero = (
-                numero['numero__max'] + 1) if numero['numero__max'] else 1
-        elif protocolo.numero < (numero['numero__max'] + 1) if numero['numero__max'] else 0:
-            msg = _('Número de protocolo deve ser maior que {}'.format(
-                numero['numero__max']))
-            self.logger.error(
-                "user=" + username + ". Número de protocolo deve ser maior que {}.".format(numero['numero__max']))
-            messages.add_message(self.request, messages.ERROR, msg)
-            return self.render_to_response(self.get_context_data())
         protocolo.ano = timezone.now().year
         protocolo.assunto_ementa = self.request.POST['assunto']
 
@@ -558,7 +523,19 @@ class ProtocoloDocumentoView(PermissionRequiredMixin,
             protocolo.user_data_hora_manual = ''
             protocolo.ip_data_hora_manual = ''
 
-        protocolo.save()
+        try:
+            with transaction.atomic():
+                protocolo.numero = proximo_numero(
+                    *sequencia_protocolo(protocolo.ano),
+                    numero=protocolo.numero)
+                protocolo.save()
+        except ValidationError as e:
+            self.logger.error("user=" + username +
+                              ". Número de protocolo inválido: " +
+                              ' '.join(e.messages))
+            messages.add_message(self.request, messages.ERROR,
+                                 ' '.join(e.messages))
+            return self.render_to_response(self.get_context_data())
         self.object = protocolo
         return redirect(self.get_success_url())
 
@@ -579,9 +556,8 @@ class CriarDocumentoProtocolo(PermissionRequiredMixin, CreateView):
     def criar_documento(self, protocolo):
         curr_year = timezone.now().year
 
-        numero_max = DocumentoAdministrativo.objects.filter(
-            tipo=protocolo.tipo_documento, ano=curr_year
-        ).aggregate(Max('numero'))['numero__max']
+        numero_max = ultimo_numero(
+            *sequencia_documento(protocolo.tipo_documento, curr_year))
 
         doc = {}
         doc['tipo'] = protocolo.tipo_documento
@@ -592,7 +568,7 @@ class CriarDocumentoProtocolo(PermissionRequiredMixin, CreateView):
         doc['protocolo'] = protocolo.id
         doc['assunto'] = protocolo.assunto_ementa
         doc['interessado'] = protocolo.interessado
-        doc['numero'] = numero_max + 1 if numero_max else 1
+        doc['numero'] = numero_max + 1
         return doc
 
 
@@ -691,49 +667,6 @@ class ProtocoloMateriaView(PermissionRequiredMixin, CreateView):
     def form_valid(self, form):
         protocolo = form.save(commit=False)
         username = self.request.user.username
-        try:
-            self.logger.debug("user=" + username +
-                              ". Tentando obter sequência de numeração.")
-            numeracao = sapl.base.models.AppConfig.objects.last(
-            ).sequencia_numeracao
-        except AttributeError:
-            self.logger.error("user=" + username + ". É preciso definir a sequencia de "
-                              "numeração na tabelas auxiliares!")
-            msg = _('É preciso definir a sequencia de ' +
-                    'numeração na tabelas auxiliares!')
-            messages.add_message(self.request, messages.ERROR, msg)
-            return self.render_to_response(self.get_context_data())
-
-        if numeracao == 'A':
-            numero = Protocolo.objects.filter(
-                ano=timezone.now().year).aggregate(Max('numero'))
-        elif numeracao == 'L':
-            legislatura = Legislatura.objects.filter(
-                data_inicio__year__lte=timezone.now().year,
-                data_fim__year__gte=timezone.now().year).first()
-            data_inicio = legislatura.data_inicio
-            data_fim = legislatura.data_fim
-            numero = Protocolo.objects.filter(
-                data__gte=data_inicio,
-                data__lte=data_fim).aggregate(
-                Max('numero'))
-        elif numeracao == 'U':
-            numero = Protocolo.objects.all().aggregate(Max('numero'))
-
-        if numeracao is None:
-            numero['numero__max'] = 0
-
-        if not protocolo.numero:
-            protocolo.numero = (
-                numero['numero__max'] + 1) if numero['numero__max'] else 1
-        if numero['numero__max']:
-            if protocolo.numero < (numero['numero__max'] + 1):
-                self.logger.error("user=" + username + ". Número de protocolo ({}) é menor que {}"
-                                  .format(protocolo.numero, numero['numero__max']))
-                msg = _('Número de protocolo deve ser maior que {}').format(
-                    numero['numero__max'])
-                messages.add_message(self.request, messages.ERROR, msg)
-                return self.render_to_response(self.get_context_data())
         protocolo.ano = timezone.now().year
 
         protocolo.tipo_protocolo = 0
@@ -758,7 +691,19 @@ class ProtocoloMateriaView(PermissionRequiredMixin, CreateView):
             protocolo.user_data_hora_manual = ''
             protocolo.ip_data_hora_manual = ''
 
-        protocolo.save()
+        try:
+            with transaction.atomic():
+                protocolo.numero = proximo_numero(
+                    *sequencia_protocolo(protocolo.ano),
+                    numero=protocolo.numero)
+                protocolo.save()
+        except ValidationError as e:
+            self.logger.error("user=" + username +
+                              ". Número de protocolo inválido: " +
+                              ' '.join(e.messages))
+            messages.add_message(self.request, messages.ERROR,
+                                 ' '.join(e.messages))
+            return self.render_to_response(self.get_context_data())
         data = form.cleaned_data
         if data['vincular_materia'] == 'True':
             materia = MateriaLegislativa.objects.get(ano=data['ano_materia'],
@@ -6,3 +6,6 @@ class AppConfig(apps.AppConfig):
     name = 'sapl.relatorios'
     label = 'relatorios'
     verbose_name = _('Relatórios')
+
+    def ready(self):
+        from sapl.relatorios import receivers
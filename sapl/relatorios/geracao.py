@@ -0,0 +1,295 @@
+"""
+Cache em disco dos relatórios em PDF.
+
+O PDF gerado é gravado em RELATORIOS_DIR sob uma chave formada pelo nome do
+relatório, seus parâmetros e a versão de cada model (ou grupo de dados)
+lido por ele. A versão é o instante da última alteração de um registro do
+model (ver receivers.py); quando algo muda, a chave muda e o relatório é
+gerado novamente na próxima solicitação. O diretório guarda no máximo
+LIMITE_ARQUIVOS PDFs, descartando os mais antigos.
+
+A geração não ocupa os workers web: a requisição que não encontra o PDF
+grava uma solicitação na fila (um arquivo em RELATORIOS_DIR/fila, um por
+chave) e responde com uma página que recarrega o mesmo endereço após
+alguns segundos. O comando gera_relatorios consome a fila, refazendo a
+requisição com a view do relatório, que então gera e grava o PDF. Com
+RELATORIOS_EM_SEGUNDO_PLANO desligado, o PDF é gerado na própria requisição.
+"""
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.urlresolvers import resolve
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.utils import timezone
+from django.utils.translation import ugettext as _
+
+CHAVE_VERSAO_GRUPO = 'relatorios:versao:%s'
+CHAVE_ERRO = 'relatorios:erro:%s'
+
+# intervalo de recarga da página de espera (segundos)
+INTERVALO_RECARGA = 3
+# tempo máximo de uma geração; depois disso a solicitação volta à fila
+TEMPO_MAXIMO_GERACAO = 600
+EM_ANDAMENTO = '.processando'
+TEMPO_CACHE_PDF = getattr(settings, 'RELATORIOS_TEMPO_CACHE', 60 * 60 * 24)
+LIMITE_ARQUIVOS = getattr(settings, 'RELATORIOS_LIMITE_ARQUIVOS', 500)
+
+logger = logging.getLogger(__name__)
+
+
+class RelatorioError(Exception):
+    pass
+
+
+def nome_grupo(grupo):
+    """
+    Grupo de dados de um relatório: um model ou um nome (ex.: 'sessao:1').
+    """
+    return grupo if isinstance(grupo, str) else grupo._meta.label_lower
+
+
+def versao_grupo(grupo):
+    chave = CHAVE_VERSAO_GRUPO % nome_grupo(grupo)
+    versao = cache.get(chave)
+    if versao is None:
+        cache.add(chave, timezone.now().isoformat(), None)
+        versao = cache.get(chave)
+    return versao
+
+
+def invalida_grupos(*grupos):
+    agora = timezone.now().isoformat()
+    cache.set_many({CHAVE_VERSAO_GRUPO % g: agora
+                    for g in set(map(nome_grupo, grupos))}, None)
+
+
+def chave_relatorio(nome, parametros, grupos):
+    """
+    Hash dos dados de entrada de um relatório: nome, parâmetros e a
+    versão (última alteração) de cada model ou grupo de dados lido.
+    """
+    partes = [nome]
+    partes += ['%s=%s' % (k, v) for k, v in sorted(parametros.items())]
+    partes += ['%s@%s' % (g, versao_grupo(g))
+               for g in sorted(set(map(nome_grupo, grupos)))]
+    return hashlib.md5('|'.join(partes).encode()).hexdigest()
+
+
+def _caminho(chave):
+    return os.path.join(settings.RELATORIOS_DIR, '%s.pdf' % chave)
+
+
+def get_pdf(chave):
+    caminho = _caminho(chave)
+    try:
+        if time.time() - os.path.getmtime(caminho) > TEMPO_CACHE_PDF:
+            return None
+        with open(caminho, 'rb') as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _descarta_antigos():
+    diretorio = settings.RELATORIOS_DIR
+    arquivos = []
+    for nome in os.listdir(diretorio):
+        if not nome.endswith('.pdf'):
+            continue
+        caminho = os.path.join(diretorio, nome)
+        try:
+            arquivos.append((os.path.getmtime(caminho), caminho))
+        except OSError:
+            pass
+    if len(arquivos) <= LIMITE_ARQUIVOS:
+        return
+    for __, caminho in sorted(arquivos)[:len(arquivos) - LIMITE_ARQUIVOS]:
+        try:
+            os.remove(caminho)
+        except OSError:
+            pass
+
+
+def set_pdf(chave, pdf):
+    os.makedirs(settings.RELATORIOS_DIR, exist_ok=True)
+    # gravado em um arquivo temporário e renomeado, para que uma leitura
+    # simultânea nunca encontre o PDF pela metade
+    temporario = '%s.%s.tmp' % (_caminho(chave), uuid.uuid4().hex[:8])
+    with open(temporario, 'wb') as f:
+        f.write(pdf)
+    os.replace(temporario, _caminho(chave))
+    _descarta_antigos()
+
+
+def gera_relatorio(chave, gera):
+    """
+    Retorna o PDF identificado por `chave`, gerando-o por `gera()` se
+    ainda não estiver gravado.
+    """
+    pdf = get_pdf(chave)
+    if pdf is not None:
+        return pdf
+
+    try:
+        pdf = gera()
+    except Exception as e:
+        logger.error('Erro gerando relatório {}: {}'.format(chave, e))
+        # vale apenas até a próxima recarga da página de espera, que
+        # solicita a geração novamente
+        cache.set(CHAVE_ERRO % chave, str(e), INTERVALO_RECARGA)
+        raise RelatorioError(str(e))
+    set_pdf(chave, pdf)
+    return pdf
+
+
+def _diretorio_fila():
+    return os.path.join(settings.RELATORIOS_DIR, 'fila')
+
+
+def enfileira(chave, request):
+    """
+    Solicita a geração do relatório `chave` ao comando gera_relatorios.
+    Solicitações repetidas da mesma chave são descartadas.
+    """
+    diretorio = _diretorio_fila()
+    os.makedirs(diretorio, exist_ok=True)
+    caminho = os.path.join(diretorio, '%s.json' % chave)
+    if os.path.exists(caminho) or os.path.exists(caminho + EM_ANDAMENTO):
+        return
+
+    user = getattr(request, 'user', None)
+    solicitacao = {
+        'path': request.path,
+        'parametros': dict(request.GET.lists()),
+        'host': request.get_host(),
+        'usuario': user.username if user and user.is_authenticated else '',
+    }
+    temporario = '%s.%s.tmp' % (caminho, uuid.uuid4().hex[:8])
+    with open(temporario, 'w') as f:
+        json.dump(solicitacao, f)
+    os.replace(temporario, caminho)
+
+
+def _processa(caminho):
+    with open(caminho) as f:
+        solicitacao = json.load(f)
+
+    request = RequestFactory().get(solicitacao['path'],
+                                   solicitacao['parametros'],
+                                   HTTP_HOST=solicitacao['host'])
+    usuario = solicitacao['usuario']
+    request.user = (usuario and get_user_model().objects.filter(
+        username=usuario).first()) or AnonymousUser()
+    # a view gera o PDF em vez de enfileirá-lo (ver resposta_relatorio)
+    request.gerar_relatorio = True
+
+    match = resolve(request.path)
+    response = match.func(request, *match.args, **match.kwargs)
+    if response.status_code != 200:
+        logger.error('Relatório {} não gerado: status {}.'.format(
+            request.get_full_path(), response.status_code))
+
+
+def processa_fila():
+    """
+    Gera os relatórios solicitados, dos mais antigos aos mais recentes.
+    Vários processos podem consumir a fila ao mesmo tempo: cada solicitação
+    é tomada por um deles renomeando o arquivo.
+
+    :return: número de solicitações processadas
+    """
+    diretorio = _diretorio_fila()
+    try:
+        nomes = os.listdir(diretorio)
+    except FileNotFoundError:
+        return 0
+
+    solicitacoes = []
+    for nome in nomes:
+        caminho = os.path.join(diretorio, nome)
+        try:
+            mtime = os.path.getmtime(caminho)
+            if (nome.endswith(EM_ANDAMENTO) and
+                    time.time() - mtime > TEMPO_MAXIMO_GERACAO):
+                # geração interrompida: a solicitação volta à fila
+                nome = nome[:-len(EM_ANDAMENTO)]
+                os.rename(caminho, os.path.join(diretorio, nome))
+                caminho = os.path.join(diretorio, nome)
+        except OSError:
+            continue
+        if nome.endswith('.json'):
+            solicitacoes.append((mtime, caminho))
+
+    processadas = 0
+    for __, caminho in sorted(solicitacoes):
+        em_andamento = caminho + EM_ANDAMENTO
+        try:
+            os.rename(caminho, em_andamento)
+            os.utime(em_andamento)
+        except OSError:
+            # tomada por outro processo
+            continue
+        try:
+            _processa(em_andamento)
+        except Exception as e:
+            logger.error('Erro processando a solicitação {}: {}'.format(
+                caminho, e))
+        finally:
+            try:
+                os.remove(em_andamento)
+            except OSError:
+                pass
+        processadas += 1
+    return processadas
+
+
+def resposta_relatorio(request, nome_arquivo, grupos, gera):
+    """
+    Responde com o PDF já gravado ou, se ele ainda não existir, enfileira
+    sua geração e responde com uma página que recarrega a mesma URL até
+    que o PDF esteja disponível.
+
+    :param grupos: models (ou nomes de grupos de dados) lidos pelo
+        relatório, cujas alterações o invalidam
+    """
+    parametros = dict(request.GET.items())
+    parametros['path'] = request.path
+    chave = chave_relatorio(nome_arquivo, parametros, grupos)
+
+    if (getattr(request, 'gerar_relatorio', False) or
+            not settings.RELATORIOS_EM_SEGUNDO_PLANO):
+        try:
+            pdf = gera_relatorio(chave, gera)
+        except RelatorioError:
+            pdf = None
+    else:
+        pdf = get_pdf(chave)
+        if pdf is None and cache.get(CHAVE_ERRO % chave) is None:
+            enfileira(chave, request)
+            response = HttpResponse(
+                '<html><head><meta http-equiv="refresh" content="%d">'
+                '</head><body><p>%s</p></body></html>' % (
+                    INTERVALO_RECARGA,
+                    _('O relatório está sendo gerado. Esta página será '
+                      'atualizada automaticamente.')),
+                status=202)
+            response['Retry-After'] = str(INTERVALO_RECARGA)
+            response['Cache-Control'] = 'no-cache'
+            return response
+
+    if pdf is None:
+        return HttpResponse(
+            _('Não foi possível gerar o relatório.'), status=500)
+
+    response = HttpResponse(pdf, content_type='application/pdf')
+    response['Content-Disposition'] = 'inline; filename="%s"' % nome_arquivo
+    return response
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from sapl.relatorios.geracao import processa_fila
+
+
+class Command(BaseCommand):
+
+    help = ('Gera os relatórios em PDF solicitados pelas requisições web, '
+            'que apenas os enfileiram (ver sapl.relatorios.geracao)')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-c', '--continuo',
+            action='store_true',
+            dest='continuo',
+            help='Continua aguardando novas solicitações',
+        )
+        parser.add_argument(
+            '-i', '--intervalo',
+            type=float,
+            default=1,
+            dest='intervalo',
+            help='Espera, em segundos, quando a fila está vazia',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            # descarta conexões que caíram ou expiraram enquanto aguardava
+            close_old_connections()
+            processadas = processa_fila()
+            if processadas:
+                self.stdout.write(
+                    '{} relatórios processados.'.format(processadas))
+            if not options['continuo']:
+                break
+            if not processadas:
+                time.sleep(options['intervalo'])
@@ -0,0 +1,95 @@
+from itertools import chain
+
+from django.apps import apps
+from django.db.models.signals import post_delete, post_save
+
+from sapl.base.models import Autor, CasaLegislativa
+from sapl.comissoes.models import Comissao
+from sapl.materia.models import (Autoria, MateriaLegislativa, Numeracao,
+                                 Orgao, StatusTramitacao,
+                                 TipoMateriaLegislativa, Tramitacao,
+                                 UnidadeTramitacao)
+from sapl.parlamentares.models import (CargoMesa, Filiacao, Legislatura,
+                                       Parlamentar, Partido,
+                                       SessaoLegislativa)
+from sapl.protocoloadm.models import (DocumentoAdministrativo, Protocolo,
+                                      StatusTramitacaoAdministrativo,
+                                      TipoDocumentoAdministrativo,
+                                      TramitacaoAdministrativo)
+from sapl.relatorios.geracao import invalida_grupos
+from sapl.sessao.receivers import sessao_da_instancia, sessoes_da_materia
+
+# models lidos por cada relatório; só a alteração de um deles invalida os
+# PDFs do relatório
+MODELOS_RELATORIO_MATERIA = (
+    CasaLegislativa, MateriaLegislativa, TipoMateriaLegislativa, Autoria,
+    Autor, Parlamentar, Comissao, Orgao, Tramitacao, StatusTramitacao)
+
+MODELOS_RELATORIO_ESPELHO = MODELOS_RELATORIO_MATERIA + (UnidadeTramitacao, )
+
+MODELOS_RELATORIO_PROCESSO = (
+    CasaLegislativa, Protocolo, Autor, Parlamentar, Comissao, Orgao,
+    TipoMateriaLegislativa, TipoDocumentoAdministrativo, MateriaLegislativa,
+    DocumentoAdministrativo, Numeracao)
+
+MODELOS_RELATORIO_DOCUMENTO = (
+    CasaLegislativa, DocumentoAdministrativo, TipoDocumentoAdministrativo,
+    TramitacaoAdministrativo, StatusTramitacaoAdministrativo,
+    UnidadeTramitacao, Orgao, Comissao)
+
+MODELOS_RELATORIO_PROTOCOLO = (
+    CasaLegislativa, Protocolo, Autor, Parlamentar, Comissao, Orgao,
+    TipoMateriaLegislativa, TipoDocumentoAdministrativo)
+
+# os dados da própria sessão e das matérias em sua pauta formam o grupo
+# GRUPO_SESSAO; os demais models lidos são versionados individualmente
+MODELOS_RELATORIO_SESSAO = (
+    CasaLegislativa, Legislatura, SessaoLegislativa, Parlamentar, Filiacao,
+    Partido, CargoMesa, TipoMateriaLegislativa, Autor, Comissao, Orgao)
+
+# dados das matérias exibidos nos relatórios das sessões em que estiveram
+# em pauta
+MODELOS_DA_MATERIA = (Autoria, Numeracao, Tramitacao)
+
+GRUPO_SESSAO = 'sessao:%s'
+GRUPO_TIPOS_SESSAO = 'sessao:tipos'
+
+
+def grupos_da_sessao(pk):
+    """
+    Grupos de dados dos relatórios da sessão plenária `pk`.
+    """
+    return MODELOS_RELATORIO_SESSAO + (GRUPO_TIPOS_SESSAO, GRUPO_SESSAO % pk)
+
+
+def invalida_relatorios_modelo(sender, instance, **kwargs):
+    invalida_grupos(sender)
+    if sender is MateriaLegislativa:
+        sessoes = sessoes_da_materia(instance.pk)
+    elif sender in MODELOS_DA_MATERIA:
+        sessoes = sessoes_da_materia(instance.materia_id)
+    else:
+        return
+    invalida_grupos(*[GRUPO_SESSAO % pk for pk in sessoes])
+
+
+def invalida_relatorios_sessao(sender, instance, **kwargs):
+    pk = sessao_da_instancia(sender, instance)
+    if pk:
+        invalida_grupos(GRUPO_SESSAO % pk)
+    else:
+        invalida_grupos(GRUPO_TIPOS_SESSAO)
+
+
+for model in set(chain(MODELOS_RELATORIO_ESPELHO,
+                       MODELOS_RELATORIO_PROCESSO,
+                       MODELOS_RELATORIO_DOCUMENTO,
+                       MODELOS_RELATORIO_PROTOCOLO,
+                       MODELOS_RELATORIO_SESSAO,
+                       MODELOS_DA_MATERIA)):
+    post_save.connect(invalida_relatorios_modelo, sender=model)
+    post_delete.connect(invalida_relatorios_modelo, sender=model)
+
+for model in apps.get_app_config('sessao').get_models():
+    post_save.connect(invalida_relatorios_sessao, sender=model)
+    post_delete.connect(invalida_relatorios_sessao, sender=model)
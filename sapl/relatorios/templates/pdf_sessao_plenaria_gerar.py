@@ -316,7 +316,7 @@ def ocorrencias(lst_ocorrencias):
     tmp += '\t\t</para>\n'
     for ocorrencia in lst_ocorrencias:
         tmp += '\t\t<para style="P3">' + \
-               str(ocorrencia.conteudo) + '</para>\n'
+               str(ocorrencia['conteudo']) + '</para>\n'
         tmp += '\t\t<para style="P2">\n'
         tmp += '\t\t\t<font color="white"> </font>\n'
         tmp += '\t\t</para>\n'
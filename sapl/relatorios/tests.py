@@ -1,3 +1,139 @@
-# from django.test import TestCase
+from unittest import mock
+import os
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from model_mommy import mommy
+import pytest
+
+from sapl.base.models import Autor, CasaLegislativa
+from sapl.materia.models import (Autoria, MateriaLegislativa, Tramitacao,
+                                 UnidadeTramitacao)
+from sapl.parlamentares.models import Parlamentar, Partido
+from sapl.relatorios.geracao import (CHAVE_ERRO, INTERVALO_RECARGA,
+                                     RelatorioError, chave_relatorio,
+                                     gera_relatorio, processa_fila)
+from sapl.relatorios.receivers import MODELOS_RELATORIO_MATERIA
+from sapl.relatorios.views import get_espelho, get_materias
+
+
+@pytest.mark.django_db(transaction=False)
+def test_chave_do_relatorio_muda_apos_alteracao_dos_dados():
+    chave = chave_relatorio('relatorio_materia.pdf', {'ano': '2018'},
+                            MODELOS_RELATORIO_MATERIA)
+    assert chave == chave_relatorio('relatorio_materia.pdf', {'ano': '2018'},
+                                    MODELOS_RELATORIO_MATERIA[::-1])
+    assert chave != chave_relatorio('relatorio_materia.pdf', {'ano': '2017'},
+                                    MODELOS_RELATORIO_MATERIA)
+
+    # models não lidos pelo relatório não o invalidam
+    mommy.make(Partido)
+    assert chave == chave_relatorio('relatorio_materia.pdf', {'ano': '2018'},
+                                    MODELOS_RELATORIO_MATERIA)
+
+    mommy.make(MateriaLegislativa)
+
+    assert chave != chave_relatorio('relatorio_materia.pdf', {'ano': '2018'},
+                                    MODELOS_RELATORIO_MATERIA)
+
+
+def test_relatorio_gerado_uma_vez_e_servido_do_disco(settings, tmpdir):
+    settings.RELATORIOS_DIR = str(tmpdir)
+    geracoes = []
+
+    def gera():
+        geracoes.append(1)
+        return b'%PDF'
+
+    chave = 'teste-relatorio-cache'
+    assert gera_relatorio(chave, gera) == b'%PDF'
+    assert gera_relatorio(chave, gera) == b'%PDF'
+    assert len(geracoes) == 1
+    assert tmpdir.join('%s.pdf' % chave).read_binary() == b'%PDF'
+
+    # o erro fica em cache somente até a próxima recarga
+    def falha():
+        raise ValueError('falha')
+
+    with mock.patch.object(cache, 'set') as cache_set:
+        with pytest.raises(RelatorioError):
+            gera_relatorio('teste-relatorio-erro', falha)
+    cache_set.assert_called_once_with(
+        CHAVE_ERRO % 'teste-relatorio-erro', 'falha', INTERVALO_RECARGA)
+
+
+@mock.patch('sapl.relatorios.geracao.LIMITE_ARQUIVOS', 2)
+def test_relatorios_mais_antigos_descartados(settings, tmpdir):
+    settings.RELATORIOS_DIR = str(tmpdir)
+
+    for i in range(3):
+        chave = 'teste-relatorio-%s' % i
+        gera_relatorio(chave, lambda: b'%PDF')
+        # mtime crescente mesmo em sistemas de arquivos com baixa resolução
+        os.utime(str(tmpdir.join('%s.pdf' % chave)), (i, i))
+
+    assert sorted(f.basename for f in tmpdir.listdir()) == [
+        'teste-relatorio-1.pdf', 'teste-relatorio-2.pdf']
+
+
+@pytest.mark.django_db(transaction=False)
+@mock.patch('sapl.relatorios.views.pdf_materia_gerar.principal',
+            return_value=b'%PDF')
+def test_relatorio_gerado_fora_da_requisicao(principal, admin_client,
+                                             settings, tmpdir):
+    settings.RELATORIOS_DIR = str(tmpdir)
+    settings.RELATORIOS_EM_SEGUNDO_PLANO = True
+    mommy.make(CasaLegislativa, uf='DF', cep='70000000', logotipo='')
+    url = reverse('sapl.relatorios:relatorio_materia')
+
+    # a requisição apenas enfileira a geração, uma vez por relatório
+    for _i in range(2):
+        response = admin_client.get(url, {'ano': '2018'})
+        assert response.status_code == 202
+    assert not principal.called
+    assert len(tmpdir.join('fila').listdir()) == 1
+
+    assert processa_fila() == 1
+    assert principal.call_count == 1
+    assert tmpdir.join('fila').listdir() == []
+
+    response = admin_client.get(url, {'ano': '2018'})
+    assert response.status_code == 200
+    assert response.content == b'%PDF'
+    assert principal.call_count == 1
+
+
+def _cria_materias(quantidade):
+    unidade = mommy.make(UnidadeTramitacao,
+                         parlamentar=mommy.make(Parlamentar))
+    for _ in range(quantidade):
+        materia = mommy.make(MateriaLegislativa)
+        mommy.make(Autoria, materia=materia, primeiro_autor=True,
+                   autor=mommy.make(Autor, nome='Autor'))
+        mommy.make(Tramitacao, materia=materia, texto='Primeira',
+                   unidade_tramitacao_local=unidade,
+                   unidade_tramitacao_destino=unidade)
+        mommy.make(Tramitacao, materia=materia, texto='Última',
+                   unidade_tramitacao_local=unidade,
+                   unidade_tramitacao_destino=unidade)
+
+
+def _consultas(get_dados):
+    with CaptureQueriesContext(connection) as consultas:
+        dados = get_dados(MateriaLegislativa.objects.all())
+    assert len(dados) == MateriaLegislativa.objects.count()
+    assert all(d['ultima_acao'] == 'Última' for d in dados)
+    return len(consultas)
+
+
+@pytest.mark.django_db(transaction=False)
+def test_relatorios_de_materias_com_numero_fixo_de_consultas():
+    _cria_materias(2)
+    poucas = [_consultas(get_materias), _consultas(get_espelho)]
+
+    _cria_materias(10)
+    muitas = [_consultas(get_materias), _consultas(get_espelho)]
+
+    assert poucas == muitas
@@ -4,24 +4,29 @@ import logging
 import re
 
 from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import Prefetch
 from django.http import Http404, HttpResponse
 from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
 
-from sapl.base.models import Autor, CasaLegislativa
+from sapl.base.configuracoes import get_casa_legislativa
+from sapl.base.models import Autor
 from sapl.comissoes.models import Comissao
 from sapl.materia.models import (Autoria, MateriaLegislativa, Numeracao,
                                  Tramitacao, UnidadeTramitacao)
-from sapl.parlamentares.models import CargoMesa, Filiacao, Parlamentar
 from sapl.protocoloadm.models import (DocumentoAdministrativo, Protocolo,
                                       TramitacaoAdministrativo)
-from sapl.sessao.models import (ExpedienteMateria, ExpedienteSessao,
-                                IntegranteMesa, JustificativaAusencia,
-                                Orador, OradorExpediente,
-                                OrdemDia, PresencaOrdemDia, SessaoPlenaria,
-                                SessaoPlenariaPresenca, OcorrenciaSessao)
+from sapl.relatorios.geracao import resposta_relatorio
+from sapl.relatorios.receivers import (MODELOS_RELATORIO_DOCUMENTO,
+                                      MODELOS_RELATORIO_ESPELHO,
+                                      MODELOS_RELATORIO_MATERIA,
+                                      MODELOS_RELATORIO_PROCESSO,
+                                      MODELOS_RELATORIO_PROTOCOLO,
+                                      grupos_da_sessao)
+from sapl.sessao.models import ExpedienteMateria, OrdemDia, SessaoPlenaria
+from sapl.sessao.resumo import get_resumo_sessao
 from sapl.settings import STATIC_ROOT
-from sapl.utils import LISTA_DE_UFS, TrocaTag, filiacao_data
+from sapl.utils import LISTA_DE_UFS, TrocaTag
 
 from .templates import (pdf_capa_processo_gerar,
                         pdf_documento_administrativo_gerar, pdf_espelho_gerar,
@@ -94,10 +99,45 @@ def get_rodape(casa):
     return [linha1, linha2, data_emissao]
 
 
+def prefetch_materias(mats):
+    """
+    Carrega junto com as matérias tudo o que os relatórios exibem delas
+    (tipo, autores e última tramitação), em um número fixo de consultas.
+    """
+    prefixo = 'ultima_tramitacao__unidade_tramitacao_%s__%s'
+    return mats.select_related(
+        'tipo',
+        'ultima_tramitacao__status',
+        *[prefixo % (unidade, campo)
+          for unidade in ('local', 'destino')
+          for campo in ('orgao', 'comissao', 'parlamentar')]
+    ).prefetch_related(
+        'autores__autor_related',
+        Prefetch('autoria_set',
+                 queryset=Autoria.objects.filter(
+                     primeiro_autor=True).select_related(
+                         'autor').prefetch_related('autor__autor_related'),
+                 to_attr='primeiras_autorias'))
+
+
+def get_localizacao_atual(tramitacao):
+    if tramitacao.unidade_tramitacao_destino:
+        unidade_tramitacao = tramitacao.unidade_tramitacao_destino
+    else:
+        unidade_tramitacao = tramitacao.unidade_tramitacao_local
+
+    if unidade_tramitacao.orgao:
+        return unidade_tramitacao.orgao
+    elif unidade_tramitacao.parlamentar:
+        return unidade_tramitacao.parlamentar
+    else:
+        return unidade_tramitacao.comissao
+
+
 def get_materias(mats):
 
     materias = []
-    for materia in mats:
+    for materia in prefetch_materias(mats):
         dic = {}
         dic['titulo'] = materia.tipo.sigla + " " + materia.tipo.descricao \
             + " " + str(materia.numero) + "/" + str(materia.ano)
@@ -111,12 +151,10 @@ def get_materias(mats):
 
         dic['localizacao_atual'] = " "
 
-        tramitacoes = Tramitacao.objects.filter(
-            unidade_tramitacao_destino__isnull=True).order_by(
-            'data_tramitacao')
-
-        for tramitacao in tramitacoes:
-            des_status = tramitacao.status.descricao
+        tramitacao = materia.ultima_tramitacao
+        if tramitacao:
+            if tramitacao.status:
+                des_status = tramitacao.status.descricao
             txt_tramitacao = tramitacao.texto
 
         # for tramitacao in context.zsql
@@ -157,16 +195,6 @@ def relatorio_materia(request):
         pdf_materia_gerar.py
     '''
 
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = (
-        'inline; filename="relatorio_materia.pdf"')
-
-    casa = CasaLegislativa.objects.first()
-
-    cabecalho = get_cabecalho(casa)
-    rodape = get_rodape(casa)
-    imagem = get_imagem(casa)
-
     kwargs = get_kwargs_params(request, ['numero',
                                          'ano',
                                          'autor',
@@ -175,18 +203,24 @@ def relatorio_materia(request):
                                          'interessado__icontains'
                                          ])
 
-    mats = MateriaLegislativa.objects.filter(**kwargs)
+    def gera():
+        casa = get_casa_legislativa()
 
-    materias = get_materias(mats)
+        cabecalho = get_cabecalho(casa)
+        rodape = get_rodape(casa)
+        imagem = get_imagem(casa)
 
-    pdf = pdf_materia_gerar.principal(imagem,
-                                      materias,
-                                      cabecalho,
-                                      rodape)
+        mats = MateriaLegislativa.objects.filter(**kwargs)
 
-    response.write(pdf)
+        materias = get_materias(mats)
 
-    return response
+        return pdf_materia_gerar.principal(imagem,
+                                           materias,
+                                           cabecalho,
+                                           rodape)
+
+    return resposta_relatorio(request, 'relatorio_materia.pdf',
+                              MODELOS_RELATORIO_MATERIA, gera)
 
 
 def get_capa_processo(prot):
@@ -249,16 +283,6 @@ def relatorio_capa_processo(request):
         pdf_capa_processo_gerar.py
     '''
 
-    response = HttpResponse(content_type='application/pdf')
-    response[
-        'Content-Disposition'] = ('inline; filename="relatorio_processo.pdf"')
-
-    casa = CasaLegislativa.objects.first()
-
-    cabecalho = get_cabecalho(casa)
-    rodape = get_rodape(casa)
-    imagem = get_imagem(casa)
-
     kwargs = get_kwargs_params(request, ['numero',
                                          'ano',
                                          'tipo_protocolo',
@@ -266,16 +290,23 @@ def relatorio_capa_processo(request):
                                          'assunto__icontains',
                                          # 'interessado__icontains'
                                          ])
-    protocolos = Protocolo.objects.filter(**kwargs)
-    protocolos_pdf = get_capa_processo(protocolos)
-    pdf = pdf_capa_processo_gerar.principal(imagem,
-                                            protocolos_pdf,
-                                            cabecalho,
-                                            rodape)
 
-    response.write(pdf)
+    def gera():
+        casa = get_casa_legislativa()
 
-    return response
+        cabecalho = get_cabecalho(casa)
+        rodape = get_rodape(casa)
+        imagem = get_imagem(casa)
+
+        protocolos = Protocolo.objects.filter(**kwargs)
+        protocolos_pdf = get_capa_processo(protocolos)
+        return pdf_capa_processo_gerar.principal(imagem,
+                                                 protocolos_pdf,
+                                                 cabecalho,
+                                                 rodape)
+
+    return resposta_relatorio(request, 'relatorio_processo.pdf',
+                              MODELOS_RELATORIO_PROCESSO, gera)
 
 
 def get_ordem_dia(ordem, sessao):
@@ -294,7 +325,7 @@ def relatorio_ordem_dia(request):
     response['Content-Disposition'] = (
         'inline; filename="relatorio_ordem_dia.pdf"')
 
-    casa = CasaLegislativa.objects.first()
+    casa = get_casa_legislativa()
 
     cabecalho = get_cabecalho(casa)
     rodape = get_rodape(casa)
@@ -322,27 +353,25 @@ def relatorio_documento_administrativo(request):
         pdf_documento_administrativo_gerar.py
     '''
 
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = (
-        'inline; filename="relatorio_documento_administrativo.pdf"')
-
-    casa = CasaLegislativa.objects.first()
+    def gera():
+        casa = get_casa_legislativa()
 
-    cabecalho = get_cabecalho(casa)
-    rodape = get_rodape(casa)
-    imagem = get_imagem(casa)
+        cabecalho = get_cabecalho(casa)
+        rodape = get_rodape(casa)
+        imagem = get_imagem(casa)
 
-    docs = DocumentoAdministrativo.objects.all()[:50]
-    doc_pdf = get_documento_administrativo(docs)
+        docs = DocumentoAdministrativo.objects.all()[:50]
+        doc_pdf = get_documento_administrativo(docs)
 
-    pdf = pdf_documento_administrativo_gerar.principal(
-        imagem,
-        doc_pdf,
-        cabecalho,
-        rodape)
-    response.write(pdf)
+        return pdf_documento_administrativo_gerar.principal(
+            imagem,
+            doc_pdf,
+            cabecalho,
+            rodape)
 
-    return response
+    return resposta_relatorio(
+        request, 'relatorio_documento_administrativo.pdf',
+        MODELOS_RELATORIO_DOCUMENTO, gera)
 
 
 def get_documento_administrativo(docs):
@@ -388,64 +417,46 @@ def relatorio_espelho(request):
         pdf_espelho_gerar.py
     '''
 
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = (
-        'inline; filename="relatorio_espelho.pdf"')
+    def gera():
+        casa = get_casa_legislativa()
 
-    casa = CasaLegislativa.objects.first()
+        cabecalho = get_cabecalho(casa)
+        rodape = get_rodape(casa)
+        imagem = get_imagem(casa)
 
-    cabecalho = get_cabecalho(casa)
-    rodape = get_rodape(casa)
-    imagem = get_imagem(casa)
+        mats = MateriaLegislativa.objects.all()[:50]
+        mat_pdf = get_espelho(mats)
 
-    mats = MateriaLegislativa.objects.all()[:50]
-    mat_pdf = get_espelho(mats)
+        return pdf_espelho_gerar.principal(
+            imagem,
+            mat_pdf,
+            cabecalho,
+            rodape)
 
-    pdf = pdf_espelho_gerar.principal(
-        imagem,
-        mat_pdf,
-        cabecalho,
-        rodape)
-    response.write(pdf)
-
-    return response
+    return resposta_relatorio(request, 'relatorio_espelho.pdf',
+                              MODELOS_RELATORIO_ESPELHO, gera)
 
 
 def get_espelho(mats):
     materias = []
-    for m in mats:
+    for m in prefetch_materias(mats):
         dic = {}
         dic['titulo'] = str(m)
         dic['materia'] = str(m.numero) + '/' + str(m.ano)
         dic['dat_apresentacao'] = str(m.data_apresentacao)
         dic['txt_ementa'] = m.ementa
 
-        dic['nom_autor'] = []
-        for autoria in Autoria.objects.filter(materia=m, primeiro_autor=True):
-            dic['nom_autor'].append(str(autoria.autor))
-
-        dic['nom_autor'] = ', '.join(dic['nom_autor'])
+        dic['nom_autor'] = ', '.join(
+            [str(autoria.autor) for autoria in m.primeiras_autorias])
 
         des_status = ''
         txt_tramitacao = ''
         data_ultima_acao = ''
 
         dic['localizacao_atual'] = " "
-        for tramitacao in Tramitacao.objects.filter(materia=m):
-            if tramitacao.unidade_tramitacao_destino:
-                cod_unid_tram = tramitacao.unidade_tramitacao_destino
-            else:
-                cod_unid_tram = tramitacao.unidade_tramitacao_local
-
-            for unidade_tramitacao in UnidadeTramitacao.objects.filter(
-                    id=cod_unid_tram.id):
-                if unidade_tramitacao.orgao:
-                    dic['localizacao_atual'] = unidade_tramitacao.orgao
-                elif unidade_tramitacao.parlamentar:
-                    dic['localizacao_atual'] = unidade_tramitacao.parlamentar
-                else:
-                    dic['localizacao_atual'] = unidade_tramitacao.comissao
-
+        tramitacao = m.ultima_tramitacao
+        if tramitacao:
+            dic['localizacao_atual'] = get_localizacao_atual(tramitacao)
             des_status = tramitacao.status
             txt_tramitacao = tramitacao.texto
             data_ultima_acao = tramitacao.data_tramitacao
@@ -489,6 +500,35 @@ def remove_html_comments(text):
     return clean_text if len(clean_text) > 0 else text
 
 
+def dic_materia_da_pauta(materia):
+    """
+    Dados comuns às matérias do expediente e da ordem do dia no relatório
+    da sessão, a partir de um item do resumo da sessão.
+    """
+    dic = {}
+    dic["num_ordem"] = materia['numero']
+    dic["id_materia"] = materia['identificacao']
+    dic["des_numeracao"] = materia['numeracao'] or ' '
+    dic["des_turno"] = materia['turno'] or ''
+
+    if materia['autor_nomes']:
+        dic['nom_autor'] = ', '.join(materia['autor_nomes'])
+    elif materia['autor']:
+        dic['nom_autor'] = ''
+    else:
+        dic['nom_autor'] = 'Desconhecido'
+    dic['num_autores'] = 'Autores' if len(materia['autor']) > 1 else 'Autor'
+
+    votacao = materia['votacao']
+    if votacao:
+        dic["nom_resultado"] = votacao['resultado']
+        dic["votacao_observacao"] = votacao['observacao'] or ' '
+    else:
+        dic["nom_resultado"] = 'Matéria não votada'
+        dic["votacao_observacao"] = ' '
+    return dic
+
+
 def get_sessao_plenaria(sessao, casa):
 
     inf_basicas_dic = {}
@@ -507,46 +547,33 @@ def get_sessao_plenaria(sessao, casa):
     inf_basicas_dic["hr_fim_sessao"] = sessao.hora_fim
     inf_basicas_dic["nom_camara"] = casa.nome
 
+    resumo = get_resumo_sessao(sessao)
+
     # Lista da composicao da mesa diretora
     lst_mesa = []
-    for composicao in IntegranteMesa.objects.filter(sessao_plenaria=sessao):
-        for parlamentar in Parlamentar.objects.filter(
-                id=composicao.parlamentar.id):
-            for cargo in CargoMesa.objects.filter(id=composicao.cargo.id):
-                dic_mesa = {}
-                dic_mesa['nom_parlamentar'] = parlamentar.nome_parlamentar
-                partido_sigla = Filiacao.objects.filter(
-                    parlamentar=parlamentar).first()
-                if not partido_sigla:
-                    sigla = ''
-                else:
-                    sigla = partido_sigla.partido.sigla
-                dic_mesa['sgl_partido'] = sigla
-                dic_mesa['des_cargo'] = cargo.descricao
-                lst_mesa.append(dic_mesa)
+    for integrante in resumo['mesa']:
+        dic_mesa = {}
+        dic_mesa['nom_parlamentar'] = (
+            integrante['parlamentar']['nome_parlamentar'])
+        dic_mesa['sgl_partido'] = integrante['parlamentar']['filiacao_atual']
+        dic_mesa['des_cargo'] = integrante['cargo']['descricao']
+        lst_mesa.append(dic_mesa)
 
     # Lista de presença na sessão
     lst_presenca_sessao = []
-    presenca = SessaoPlenariaPresenca.objects.filter(
-        sessao_plenaria=sessao).order_by('parlamentar__nome_parlamentar')
-
-    for parlamentar in [p.parlamentar for p in presenca]:
+    for parlamentar in resumo['presenca_sessao']:
         dic_presenca = {}
-        dic_presenca["nom_parlamentar"] = parlamentar.nome_parlamentar
-        partido_sigla = filiacao_data(parlamentar, sessao.data_inicio)
-
-        dic_presenca['sgl_partido'] = partido_sigla
+        dic_presenca["nom_parlamentar"] = parlamentar['nome_parlamentar']
+        dic_presenca['sgl_partido'] = parlamentar['sgl_partido']
         lst_presenca_sessao.append(dic_presenca)
 
     # Lista de ausencias na sessão
     lst_ausencia_sessao = []
-    ausencia = JustificativaAusencia.objects.filter(
-        sessao_plenaria=sessao).order_by('parlamentar__nome_parlamentar')
-    for ausente in ausencia:
+    for ausente in resumo['justificativa_ausencia']:
         dic_ausencia = {}
-        dic_ausencia['parlamentar'] = ausente.parlamentar
-        dic_ausencia['justificativa'] = ausente.tipo_ausencia
-        if ausente.ausencia == 1:
+        dic_ausencia['parlamentar'] = ausente['parlamentar']
+        dic_ausencia['justificativa'] = ausente['tipo_ausencia']
+        if ausente['ausencia'] == 1:
             dic_ausencia['tipo'] = 'Matéria'
         else:
             dic_ausencia['tipo'] = 'Sessão'
@@ -555,13 +582,10 @@ def get_sessao_plenaria(sessao, casa):
 
     # Exibe os Expedientes
     lst_expedientes = []
-    expedientes = ExpedienteSessao.objects.filter(
-        sessao_plenaria=sessao).order_by('tipo__nome')
-
-    for e in expedientes:
+    for e in resumo['expedientes']:
         dic_expedientes = {}
-        dic_expedientes["nom_expediente"] = e.tipo.nome
-        conteudo = e.conteudo
+        dic_expedientes["nom_expediente"] = e['tipo']
+        conteudo = e['conteudo']
 
         # unescape HTML codes
         # https://github.com/interlegis/sapl/issues/1046
@@ -582,171 +606,59 @@ def get_sessao_plenaria(sessao, casa):
 
     # Lista das matérias do Expediente, incluindo o resultado das votacoes
     lst_expediente_materia = []
-    for expediente_materia in ExpedienteMateria.objects.filter(
-            sessao_plenaria=sessao):
-        # seleciona os detalhes de uma matéria
-        materia = expediente_materia.materia
-        dic_expediente_materia = {}
-        dic_expediente_materia["num_ordem"] = expediente_materia.numero_ordem
-        dic_expediente_materia["id_materia"] = (materia.tipo.sigla + ' ' +
-                                                materia.tipo.descricao + ' ' +
-                                                str(materia.numero) + '/' +
-                                                str(materia.ano))
-        dic_expediente_materia["des_numeracao"] = ' '
-
-        numeracao = Numeracao.objects.filter(
-            materia=expediente_materia.materia).first()
-        if numeracao:
-            dic_expediente_materia["des_numeracao"] = (
-                str(numeracao.numero_materia) + '/' + str(
-                    numeracao.ano_materia))
-
-        turno, _ = get_turno(materia)
-
-        dic_expediente_materia["des_turno"] = turno
-        dic_expediente_materia["txt_ementa"] = str(materia.ementa)
-        dic_expediente_materia["ordem_observacao"] = expediente_materia.observacao
-        dic_expediente_materia["nom_resultado"] = ''
-
-        dic_expediente_materia["nom_autor"] = ''
-        autoria = materia.autoria_set.all()
-        dic_expediente_materia['num_autores'] = 'Autores' if len(
-            autoria) > 1 else 'Autor'
-        if autoria:
-            for a in autoria:
-                if a.autor.nome:
-                    dic_expediente_materia['nom_autor'] += a.autor.nome + ', '
-            dic_expediente_materia['nom_autor'] = dic_expediente_materia['nom_autor'][:-2]
-        else:
-            dic_expediente_materia["nom_autor"] = 'Desconhecido'
-
-        dic_expediente_materia["votacao_observacao"] = ' '
-        resultados = expediente_materia.registrovotacao_set.all()
-        if resultados:
-            for i in resultados:
-                dic_expediente_materia["nom_resultado"] = (
-                    i.tipo_resultado_votacao.nome)
-                dic_expediente_materia["votacao_observacao"] = (
-                    i.observacao)
-        else:
-            dic_expediente_materia["nom_resultado"] = 'Matéria não votada'
-            dic_expediente_materia["votacao_observacao"] = ' '
+    for materia in resumo['materia_expediente']:
+        dic_expediente_materia = dic_materia_da_pauta(materia)
+        dic_expediente_materia["txt_ementa"] = str(materia['ementa'])
+        dic_expediente_materia["ordem_observacao"] = materia['observacao']
         lst_expediente_materia.append(dic_expediente_materia)
 
     # Lista dos oradores do Expediente
     lst_oradores_expediente = []
-    for orador_expediente in OradorExpediente.objects.filter(
-            sessao_plenaria=sessao).order_by('numero_ordem'):
-        parlamentar = Parlamentar.objects.get(
-            id=orador_expediente.parlamentar.id)
+    for orador_expediente in resumo['oradores']:
         dic_oradores_expediente = {}
         dic_oradores_expediente["num_ordem"] = (
-            orador_expediente.numero_ordem)
+            orador_expediente['numero_ordem'])
         dic_oradores_expediente["nom_parlamentar"] = (
-            parlamentar.nome_parlamentar)
+            orador_expediente['parlamentar']['nome_parlamentar'])
         dic_oradores_expediente["observacao"] = (
-            orador_expediente.observacao)
-        partido_sigla = Filiacao.objects.filter(
-            parlamentar=parlamentar).first()
-        if not partido_sigla:
-            sigla = ''
-        else:
-            sigla = partido_sigla.partido.sigla
-        dic_oradores_expediente['sgl_partido'] = sigla
+            orador_expediente['observacao'])
+        dic_oradores_expediente['sgl_partido'] = (
+            orador_expediente['parlamentar']['filiacao_atual'])
         lst_oradores_expediente.append(dic_oradores_expediente)
 
     # Lista presença na ordem do dia
     lst_presenca_ordem_dia = []
-    presenca_ordem_dia = PresencaOrdemDia.objects.filter(
-        sessao_plenaria=sessao).order_by('parlamentar__nome_parlamentar')
-    for parlamentar in [p.parlamentar for p in presenca_ordem_dia]:
+    for parlamentar in resumo['presenca_ordem']:
         dic_presenca_ordem_dia = {}
         dic_presenca_ordem_dia['nom_parlamentar'] = (
-            parlamentar.nome_parlamentar)
-        sigla = filiacao_data(parlamentar, sessao.data_inicio)
-
-        dic_presenca_ordem_dia['sgl_partido'] = sigla
+            parlamentar['nome_parlamentar'])
+        dic_presenca_ordem_dia['sgl_partido'] = parlamentar['sgl_partido']
         lst_presenca_ordem_dia.append(dic_presenca_ordem_dia)
 
     # Lista das matérias da Ordem do Dia, incluindo o resultado das votacoes
     lst_votacao = []
-    for votacao in OrdemDia.objects.filter(
-            sessao_plenaria=sessao):
-        # seleciona os detalhes de uma matéria
-        materia = votacao.materia
-        dic_votacao = {}
-        dic_votacao["nom_resultado"] = ''
-        dic_votacao["num_ordem"] = votacao.numero_ordem
-        dic_votacao["id_materia"] = (
-            materia.tipo.sigla + ' ' +
-            materia.tipo.descricao + ' ' +
-            str(materia.numero) + '/' +
-            str(materia.ano))
-        dic_votacao["des_numeracao"] = ' '
-
-        numeracao = materia.numeracao_set.first()
-        if numeracao:
-
-            dic_votacao["des_numeracao"] = (
-                str(numeracao.numero_materia) +
-                '/' +
-                str(numeracao.ano_materia))
-
-        turno, _ = get_turno(materia)
-
-        dic_votacao["des_turno"] = turno
+    for materia in resumo['materias_ordem']:
+        dic_votacao = dic_materia_da_pauta(materia)
 
         # https://github.com/interlegis/sapl/issues/1009
-        dic_votacao["txt_ementa"] = html.unescape(materia.ementa)
-        dic_votacao["ordem_observacao"] = html.unescape(votacao.observacao)
-
-        dic_votacao["nom_autor"] = ''
-        autoria = materia.autoria_set.all()
-        dic_votacao['num_autores'] = 'Autores' if len(autoria) > 1 else 'Autor'
-        if autoria:
-            for a in autoria:
-                if a.autor.nome:
-                    dic_votacao['nom_autor'] += a.autor.nome + ', '
-            dic_votacao['nom_autor'] = dic_votacao['nom_autor'][:-2]
-        else:
-            dic_votacao["nom_autor"] = 'Desconhecido'
-
-        dic_votacao["votacao_observacao"] = ' '
-        resultados = votacao.registrovotacao_set.all()
-        if resultados:
-            for i in resultados:
-                dic_votacao["nom_resultado"] = i.tipo_resultado_votacao.nome
-                if i.observacao:
-                    dic_votacao["votacao_observacao"] = i.observacao
-        else:
-            dic_votacao["nom_resultado"] = "Matéria não votada"
+        dic_votacao["txt_ementa"] = html.unescape(materia['ementa'])
+        dic_votacao["ordem_observacao"] = html.unescape(
+            materia['observacao'])
         lst_votacao.append(dic_votacao)
 
     # Lista dos oradores nas Explicações Pessoais
     lst_oradores = []
-    for orador in Orador.objects.filter(
-            sessao_plenaria=sessao).order_by('numero_ordem'):
-        for parlamentar in Parlamentar.objects.filter(
-                id=orador.parlamentar.id):
-            dic_oradores = {}
-            dic_oradores["num_ordem"] = orador.numero_ordem
-            dic_oradores["nom_parlamentar"] = parlamentar.nome_parlamentar
-            partido_sigla = Filiacao.objects.filter(
-                parlamentar=parlamentar).first()
-            if not partido_sigla:
-                sigla = ''
-            else:
-                sigla = partido_sigla.partido.sigla
-            dic_oradores['sgl_partido'] = sigla
-            lst_oradores.append(dic_oradores)
+    for orador in resumo['oradores_explicacoes']:
+        dic_oradores = {}
+        dic_oradores["num_ordem"] = orador['numero_ordem']
+        dic_oradores["nom_parlamentar"] = (
+            orador['parlamentar']['nome_parlamentar'])
+        dic_oradores['sgl_partido'] = orador['parlamentar']['filiacao_atual']
+        lst_oradores.append(dic_oradores)
 
     # Ocorrências da Sessão
     lst_ocorrencias = []
-    ocorrencias = OcorrenciaSessao.objects.filter(
-        sessao_plenaria=sessao)
-
-    for o in ocorrencias:
-        conteudo = o.conteudo
+    for conteudo in resumo['ocorrencias_da_sessao']:
 
         # unescape HTML codes
         # https://github.com/interlegis/sapl/issues/1046
@@ -757,9 +669,7 @@ def get_sessao_plenaria(sessao, casa):
         #   https://github.com/interlegis/sapl/issues/1009
         conteudo = conteudo.replace('&', '&amp;')
 
-        o.conteudo = conteudo
-
-        lst_ocorrencias.append(o)
+        lst_ocorrencias.append({'conteudo': conteudo})
 
     return (inf_basicas_dic,
             lst_mesa,
@@ -795,18 +705,12 @@ def relatorio_sessao_plenaria(request, pk):
     '''
     logger = logging.getLogger(__name__)
     username = request.user.username
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = (
-        'inline; filename="relatorio_protocolo.pdf"')
 
-    casa = CasaLegislativa.objects.first()
+    casa = get_casa_legislativa()
 
     if not casa:
         raise Http404
 
-    rodape = get_rodape(casa)
-    imagem = get_imagem(casa)
-
     try:
         logger.debug("user=" + username +
                      ". Tentando obter SessaoPlenaria com id={}.".format(pk))
@@ -816,41 +720,45 @@ def relatorio_sessao_plenaria(request, pk):
                      ". Essa SessaoPlenaria não existe (pk={}). ".format(pk) + str(e))
         raise Http404('Essa página não existe')
 
-    (inf_basicas_dic,
-     lst_mesa,
-     lst_presenca_sessao,
-     lst_ausencia_sessao,
-     lst_expedientes,
-     lst_expediente_materia,
-     lst_oradores_expediente,
-     lst_presenca_ordem_dia,
-     lst_votacao,
-     lst_oradores,
-     lst_ocorrencias) = get_sessao_plenaria(sessao, casa)
-
-    for idx in range(len(lst_expedientes)):
-        txt_expedientes = lst_expedientes[idx]['txt_expediente']
-        txt_expedientes = TrocaTag(txt_expedientes, '<table', 'table>', 6, 6,
-                                   'expedientes', '</para><blockTable style = "', 'blockTable><para>')
-        lst_expedientes[idx]['txt_expediente'] = txt_expedientes
-
-    pdf = pdf_sessao_plenaria_gerar.principal(
-        rodape,
-        imagem,
-        inf_basicas_dic,
-        lst_mesa,
-        lst_presenca_sessao,
-        lst_ausencia_sessao,
-        lst_expedientes,
-        lst_expediente_materia,
-        lst_oradores_expediente,
-        lst_presenca_ordem_dia,
-        lst_votacao,
-        lst_oradores,
-        lst_ocorrencias)
+    def gera():
+        rodape = get_rodape(casa)
+        imagem = get_imagem(casa)
+
+        (inf_basicas_dic,
+         lst_mesa,
+         lst_presenca_sessao,
+         lst_ausencia_sessao,
+         lst_expedientes,
+         lst_expediente_materia,
+         lst_oradores_expediente,
+         lst_presenca_ordem_dia,
+         lst_votacao,
+         lst_oradores,
+         lst_ocorrencias) = get_sessao_plenaria(sessao, casa)
+
+        for idx in range(len(lst_expedientes)):
+            txt_expedientes = lst_expedientes[idx]['txt_expediente']
+            txt_expedientes = TrocaTag(txt_expedientes, '<table', 'table>', 6, 6,
+                                       'expedientes', '</para><blockTable style = "', 'blockTable><para>')
+            lst_expedientes[idx]['txt_expediente'] = txt_expedientes
+
+        return pdf_sessao_plenaria_gerar.principal(
+            rodape,
+            imagem,
+            inf_basicas_dic,
+            lst_mesa,
+            lst_presenca_sessao,
+            lst_ausencia_sessao,
+            lst_expedientes,
+            lst_expediente_materia,
+            lst_oradores_expediente,
+            lst_presenca_ordem_dia,
+            lst_votacao,
+            lst_oradores,
+            lst_ocorrencias)
 
-    response.write(pdf)
-    return response
+    return resposta_relatorio(request, 'relatorio_sessao_plenaria.pdf',
+                              grupos_da_sessao(sessao.pk), gera)
 
 
 def get_protocolos(prots):
@@ -907,17 +815,6 @@ def relatorio_protocolo(request):
         pdf_protocolo_gerar.py
     '''
 
-    response = HttpResponse(content_type='application/pdf')
-    response[
-        'Content-Disposition'] = (
-            'inline; filename="relatorio_protocolo.pdf"')
-
-    casa = CasaLegislativa.objects.first()
-
-    cabecalho = get_cabecalho(casa)
-    rodape = get_rodape(casa)
-    imagem = get_imagem(casa)
-
     kwargs = get_kwargs_params(request, ['numero',
                                          'ano',
                                          'tipo_protocolo',
@@ -926,18 +823,24 @@ def relatorio_protocolo(request):
                                          'assunto__icontains',
                                          'interessado__icontains'])
 
-    protocolos = Protocolo.objects.filter(**kwargs)
+    def gera():
+        casa = get_casa_legislativa()
 
-    protocolo_data = get_protocolos(protocolos)
+        cabecalho = get_cabecalho(casa)
+        rodape = get_rodape(casa)
+        imagem = get_imagem(casa)
 
-    pdf = pdf_protocolo_gerar.principal(imagem,
-                                        protocolo_data,
-                                        cabecalho,
-                                        rodape)
+        protocolos = Protocolo.objects.filter(**kwargs)
 
-    response.write(pdf)
+        protocolo_data = get_protocolos(protocolos)
 
-    return response
+        return pdf_protocolo_gerar.principal(imagem,
+                                             protocolo_data,
+                                             cabecalho,
+                                             rodape)
+
+    return resposta_relatorio(request, 'relatorio_protocolo.pdf',
+                              MODELOS_RELATORIO_PROTOCOLO, gera)
 
 
 def relatorio_etiqueta_protocolo(request, nro, ano):
@@ -950,7 +853,7 @@ def relatorio_etiqueta_protocolo(request, nro, ano):
         'Content-Disposition'] = (
             'inline; filename="relatorio_etiqueta_protocolo.pdf"')
 
-    casa = CasaLegislativa.objects.first()
+    casa = get_casa_legislativa()
 
     cabecalho = get_cabecalho(casa)
     rodape = get_rodape(casa)
@@ -1026,29 +929,25 @@ def relatorio_pauta_sessao(request, pk):
         pdf__pauta_sessao_gerar.py
     '''
 
-    response = HttpResponse(content_type='application/pdf')
-    response[
-        'Content-Disposition'] = (
-            'inline; filename="relatorio_pauta_sessao.pdf"')
-
-    casa = CasaLegislativa.objects.first()
-
-    rodape = get_rodape(casa)
-    imagem = get_imagem(casa)
+    casa = get_casa_legislativa()
 
     sessao = SessaoPlenaria.objects.get(id=pk)
 
-    lst_expediente_materia, lst_votacao, inf_basicas_dic = get_pauta_sessao(
-        sessao, casa)
-    pdf = pdf_pauta_sessao_gerar.principal(rodape,
-                                           imagem,
-                                           inf_basicas_dic,
-                                           lst_expediente_materia,
-                                           lst_votacao)
-
-    response.write(pdf)
-
-    return response
+    def gera():
+        rodape = get_rodape(casa)
+        imagem = get_imagem(casa)
+
+        (lst_expediente_materia,
+         lst_votacao,
+         inf_basicas_dic) = get_pauta_sessao(sessao, casa)
+        return pdf_pauta_sessao_gerar.principal(rodape,
+                                                imagem,
+                                                inf_basicas_dic,
+                                                lst_expediente_materia,
+                                                lst_votacao)
+
+    return resposta_relatorio(request, 'relatorio_pauta_sessao.pdf',
+                              grupos_da_sessao(sessao.pk), gera)
 
 
 def get_pauta_sessao(sessao, casa):
@@ -140,6 +140,7 @@ rules_group_norma = {
         (norma.AnexoNormaJuridica, __base__),
         (norma.AutoriaNorma, __base__),
         (norma.NormaEstatisticas, __base__),
+        (norma.NormaEstatisticasDia, __base__),
 
         # Publicacao está com permissão apenas para norma e não para matéria
         # e proposições apenas por análise do contexto, não é uma limitação
@@ -216,6 +217,10 @@ rules_group_geral = {
         ]),
 
         (base.CasaLegislativa, __listdetailchange__ + [RP_ADD]),
+        (base.SequenciaNumeracao, __base__),
+        (base.TextoExtraido, __base__),
+        (base.ObjetoIndexado, __base__),
+        (base.ModeloIndexado, __base__),
         (base.TipoAutor, __base__),
         (base.Autor, __base__),
 
@@ -244,6 +249,7 @@ rules_group_geral = {
         (norma.TipoNormaJuridica, __base__),
         (norma.TipoVinculoNormaJuridica, __base__),
         (norma.NormaEstatisticas, __base__),
+        (norma.NormaEstatisticasDia, __base__),
 
         (parlamentares.Legislatura, __base__),
         (parlamentares.SessaoLegislativa, __base__),
@@ -0,0 +1,78 @@
+"""
+Ordenação das matérias da pauta (expediente e ordem do dia).
+
+As operações alteram numero_ordem com instruções UPDATE em lote, sem
+carregar nem salvar cada item. Como elas não disparam signals, os caches
+que dependem da sessão são invalidados explicitamente.
+"""
+from django.db import transaction
+from django.db.models import F
+
+from sapl.sessao.votacao import invalida_caches_sessao
+from sapl.utils import update_em_lote
+
+
+def _move(model, sessao_id, posicao_inicial, posicao_final):
+    pk = model.objects.filter(
+        sessao_plenaria_id=sessao_id,
+        numero_ordem=posicao_inicial).values_list('pk', flat=True).first()
+    if pk is None:
+        raise model.DoesNotExist(
+            'Matéria com sessao_plenaria={} e numero_ordem={} '
+            'não existe.'.format(sessao_id, posicao_inicial))
+
+    if posicao_inicial < posicao_final:
+        # quem está entre a posição inicial e a final sobe uma posição
+        model.objects.filter(
+            sessao_plenaria_id=sessao_id,
+            numero_ordem__gt=posicao_inicial,
+            numero_ordem__lte=posicao_final).update(
+                numero_ordem=F('numero_ordem') - 1)
+    elif posicao_inicial > posicao_final:
+        # quem está entre a posição final e a inicial desce uma posição
+        model.objects.filter(
+            sessao_plenaria_id=sessao_id,
+            numero_ordem__gte=posicao_final,
+            numero_ordem__lt=posicao_inicial).update(
+                numero_ordem=F('numero_ordem') + 1)
+    else:
+        return
+
+    model.objects.filter(pk=pk).update(numero_ordem=posicao_final)
+
+
+def move_itens_pauta(model, sessao_id, movimentos):
+    """
+    Aplica, em sequência e numa única transação, os `movimentos` da pauta
+    da sessão `sessao_id`. Cada movimento é uma tupla
+    (posição inicial, posição final), em numero_ordem. Cada movimento
+    custa uma consulta e duas instruções UPDATE, independente do tamanho
+    da pauta.
+    """
+    with transaction.atomic():
+        for posicao_inicial, posicao_final in movimentos:
+            _move(model, sessao_id, posicao_inicial, posicao_final)
+    invalida_caches_sessao(sessao_id)
+
+
+def reordena_pauta(model, sessao_id, pks=None):
+    """
+    Renumera a pauta da sessão `sessao_id` a partir de 1, na ordem de
+    `pks`. Itens da sessão ausentes de `pks` (ou todos, se `pks` não for
+    informado) seguem na ordem atual, após os informados. Apenas os itens
+    cujo número muda são atualizados.
+    """
+    atuais = list(model.objects.filter(
+        sessao_plenaria_id=sessao_id).order_by(
+            'numero_ordem', 'id').values_list('pk', 'numero_ordem'))
+
+    numeros = dict(atuais)
+    ordem = [pk for pk in (pks or []) if pk in numeros]
+    informados = set(ordem)
+    ordem += [pk for pk, __ in atuais if pk not in informados]
+
+    novos = {pk: numero for numero, pk in enumerate(ordem, 1)
+             if numeros[pk] != numero}
+    update_em_lote(model, 'numero_ordem', novos)
+    if novos:
+        invalida_caches_sessao(sessao_id)
@@ -0,0 +1,65 @@
+from itertools import chain
+
+from django.apps import apps
+from django.db.models.signals import post_delete, post_save
+
+from sapl.materia.models import (Autoria, MateriaLegislativa, Numeracao,
+                                 Tramitacao)
+from sapl.sessao.models import (ExpedienteMateria, OrdemDia, RegistroVotacao,
+                                RetiradaPauta, SessaoPlenaria,
+                                VotoParlamentar)
+from sapl.sessao.resumo import invalida_resumo_sessao
+
+# dados das matérias que fazem parte do resumo das sessões em que a matéria
+# esteve em pauta
+MODELOS_DA_MATERIA = (Autoria, Numeracao, Tramitacao)
+
+
+def sessao_da_votacao(instance):
+    if instance.ordem_id:
+        return OrdemDia.objects.filter(
+            pk=instance.ordem_id).values_list(
+                'sessao_plenaria_id', flat=True).first()
+    if instance.expediente_id:
+        return ExpedienteMateria.objects.filter(
+            pk=instance.expediente_id).values_list(
+                'sessao_plenaria_id', flat=True).first()
+    return None
+
+
+def sessao_da_instancia(sender, instance):
+    """
+    Sessão plenária à qual pertence `instance` (de um model do app
+    sessao), ou None.
+    """
+    if sender is SessaoPlenaria:
+        return instance.pk
+    if sender in (RegistroVotacao, VotoParlamentar):
+        return sessao_da_votacao(instance)
+    if sender is RetiradaPauta and not instance.sessao_plenaria_id:
+        return sessao_da_votacao(instance)
+    return getattr(instance, 'sessao_plenaria_id', None)
+
+
+def sessoes_da_materia(materia_id):
+    return set(OrdemDia.objects.filter(
+        materia_id=materia_id).values_list(
+            'sessao_plenaria_id', flat=True)) | set(
+        ExpedienteMateria.objects.filter(
+            materia_id=materia_id).values_list(
+                'sessao_plenaria_id', flat=True))
+
+
+def invalida_resumo(sender, instance, **kwargs):
+    if sender is MateriaLegislativa:
+        invalida_resumo_sessao(*sessoes_da_materia(instance.pk))
+    elif sender in MODELOS_DA_MATERIA:
+        invalida_resumo_sessao(*sessoes_da_materia(instance.materia_id))
+    else:
+        invalida_resumo_sessao(sessao_da_instancia(sender, instance))
+
+
+for model in chain(apps.get_app_config('sessao').get_models(),
+                   (MateriaLegislativa, ) + MODELOS_DA_MATERIA):
+    post_save.connect(invalida_resumo, sender=model)
+    post_delete.connect(invalida_resumo, sender=model)
@@ -0,0 +1,220 @@
+"""
+Retrato (snapshot) dos dados de uma sessão plenária.
+
+Reúne, em um número fixo de consultas, tudo o que é exibido no resumo, no
+extrato (ata) e no relatório em PDF da sessão: mesa, presenças, ausências,
+expedientes, matérias do expediente e da ordem do dia com seus resultados,
+oradores e ocorrências. O retrato contém apenas dados simples (dicionários,
+listas, textos e números), de forma que pode ser serializado.
+
+O retrato de uma sessão finalizada é congelado: serializado em JSON na
+primeira requisição após o encerramento e, daí em diante, servido do cache
+até que algo pertencente à sessão seja alterado (ver receivers.py).
+"""
+import json
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+from django.utils.translation import ugettext as _
+
+from sapl.materia.models import Tramitacao
+from sapl.sessao.models import (ExpedienteMateria, ExpedienteSessao,
+                                IntegranteMesa, JustificativaAusencia,
+                                OcorrenciaSessao, Orador, OradorExpediente,
+                                OrdemDia, PresencaOrdemDia, RegistroVotacao,
+                                RetiradaPauta, SessaoPlenariaPresenca)
+from sapl.utils import filiacoes_atuais, filiacoes_data
+
+TURNOS = dict(Tramitacao.TURNO_CHOICES)
+
+CHAVE_RESUMO_SESSAO = 'sessao:resumo:%s'
+
+
+def _parlamentar(parlamentar, siglas_sessao, siglas_atuais):
+    return {
+        'id': parlamentar.id,
+        'nome_parlamentar': parlamentar.nome_parlamentar,
+        # partido(s) na data da sessão
+        'sgl_partido': siglas_sessao.get(parlamentar.id, ''),
+        # partido atual, como Parlamentar.filiacao_atual
+        'filiacao_atual': siglas_atuais.get(parlamentar.id,
+                                            str(_('Sem Partido'))),
+    }
+
+
+def _itens_de_pauta(model, sessao):
+    return model.objects.filter(
+        sessao_plenaria=sessao
+    ).select_related(
+        'materia__tipo',
+        'materia__ultima_tramitacao__status',
+    ).prefetch_related(
+        'materia__numeracao_set',
+        'materia__autoria_set__autor__autor_related',
+        Prefetch('registrovotacao_set',
+                 queryset=RegistroVotacao.objects.select_related(
+                     'tipo_resultado_votacao').order_by('id')),
+        Prefetch('retiradapauta_set',
+                 queryset=RetiradaPauta.objects.select_related(
+                     'tipo_de_retirada').order_by('id')),
+    ).order_by('numero_ordem', 'id')
+
+
+def _materia_da_pauta(item):
+    materia = item.materia
+
+    tramitacao = materia.ultima_tramitacao
+    turno = str(TURNOS.get(tramitacao.turno, '')) if tramitacao else None
+    if tramitacao and tramitacao.status:
+        situacao = tramitacao.status.descricao
+    else:
+        situacao = _('Não informada')
+
+    registros = [r for r in item.registrovotacao_set.all()
+                 if r.materia_id == materia.id]
+    retiradas = [r for r in item.retiradapauta_set.all()
+                 if r.materia_id == materia.id]
+
+    votacao = None
+    if registros:
+        votacao = {'resultado': registros[0].tipo_resultado_votacao.nome,
+                   'observacao': registros[0].observacao}
+
+    if votacao:
+        resultado = votacao['resultado']
+        resultado_observacao = votacao['observacao']
+    elif retiradas:
+        resultado = retiradas[0].tipo_de_retirada.descricao
+        resultado_observacao = retiradas[0].observacao
+    else:
+        resultado = _('Matéria não votada')
+        resultado_observacao = ' '
+
+    numeracoes = list(materia.numeracao_set.all())
+    autorias = list(materia.autoria_set.all())
+
+    return {
+        'id': materia.id,
+        'numero': item.numero_ordem,
+        'titulo': str(materia),
+        'identificacao': '%s %s %s/%s' % (
+            materia.tipo.sigla, materia.tipo.descricao,
+            materia.numero, materia.ano),
+        'ementa': materia.ementa,
+        'observacao': item.observacao,
+        'turno': turno,
+        'situacao': situacao,
+        'votacao': votacao,
+        'resultado': str(resultado),
+        'resultado_observacao': resultado_observacao,
+        'autor': [str(a.autor) for a in autorias],
+        'autor_nomes': [a.autor.nome for a in autorias if a.autor.nome],
+        'numero_protocolo': materia.numero_protocolo,
+        'numero_processo': str(numeracoes[-1]) if numeracoes else None,
+        'numeracao': '%s/%s' % (numeracoes[0].numero_materia,
+                                numeracoes[0].ano_materia)
+        if numeracoes else None,
+    }
+
+
+def monta_resumo_sessao(sessao):
+    """
+    Monta o retrato da `sessao` plenária. O número de consultas não
+    depende da quantidade de matérias, presenças ou oradores da sessão.
+    """
+    mesa = list(IntegranteMesa.objects.filter(
+        sessao_plenaria=sessao).select_related('parlamentar', 'cargo'))
+    presencas = list(SessaoPlenariaPresenca.objects.filter(
+        sessao_plenaria=sessao).select_related('parlamentar').order_by(
+            'parlamentar__nome_parlamentar'))
+    presencas_ordem = list(PresencaOrdemDia.objects.filter(
+        sessao_plenaria=sessao).select_related('parlamentar').order_by(
+            'parlamentar__nome_parlamentar'))
+    oradores_expediente = list(OradorExpediente.objects.filter(
+        sessao_plenaria=sessao).select_related('parlamentar').order_by(
+            'numero_ordem'))
+    oradores = list(Orador.objects.filter(
+        sessao_plenaria=sessao).select_related('parlamentar').order_by(
+            'numero_ordem'))
+
+    parlamentares = {
+        p.id: p for p in
+        [m.parlamentar for m in mesa] +
+        [p.parlamentar for p in presencas + presencas_ordem] +
+        [o.parlamentar for o in oradores_expediente + oradores]}
+    siglas_sessao = filiacoes_data(list(parlamentares), sessao.data_inicio)
+    siglas_atuais = filiacoes_atuais(list(parlamentares))
+
+    def parlamentar(p):
+        return _parlamentar(p, siglas_sessao, siglas_atuais)
+
+    integrantes = sorted(
+        [{'parlamentar': parlamentar(m.parlamentar),
+          'cargo': {'id': m.cargo.id, 'descricao': m.cargo.descricao}}
+         for m in mesa],
+        key=lambda m: m['cargo']['id'])
+
+    ausencias = [
+        {'parlamentar': str(j.parlamentar),
+         'tipo_ausencia': str(j.tipo_ausencia),
+         'ausencia': j.ausencia}
+        for j in JustificativaAusencia.objects.filter(
+            sessao_plenaria=sessao).select_related(
+                'parlamentar', 'tipo_ausencia').order_by(
+                    'parlamentar__nome_parlamentar')]
+
+    expedientes = [
+        {'tipo': e.tipo.nome, 'conteudo': e.conteudo}
+        for e in ExpedienteSessao.objects.filter(
+            sessao_plenaria=sessao).select_related('tipo').order_by(
+                'tipo__nome')]
+
+    return {
+        'mesa': integrantes,
+        'presenca_sessao': [parlamentar(p.parlamentar) for p in presencas],
+        'justificativa_ausencia': ausencias,
+        'expedientes': expedientes,
+        'materia_expediente': [
+            _materia_da_pauta(m)
+            for m in _itens_de_pauta(ExpedienteMateria, sessao)],
+        'oradores': [
+            {'numero_ordem': o.numero_ordem,
+             'url_discurso': o.url_discurso,
+             'observacao': o.observacao,
+             'parlamentar': parlamentar(o.parlamentar)}
+            for o in oradores_expediente],
+        'presenca_ordem': [parlamentar(p.parlamentar)
+                           for p in presencas_ordem],
+        'materias_ordem': [
+            _materia_da_pauta(o)
+            for o in _itens_de_pauta(OrdemDia, sessao)],
+        'oradores_explicacoes': [
+            {'numero_ordem': o.numero_ordem,
+             'url_discurso': o.url_discurso,
+             'parlamentar': parlamentar(o.parlamentar)}
+            for o in oradores],
+        'ocorrencias_da_sessao': list(OcorrenciaSessao.objects.filter(
+            sessao_plenaria=sessao).values_list('conteudo', flat=True)),
+    }
+
+
+def get_resumo_sessao(sessao):
+    """
+    Retrato da `sessao`. Se a sessão estiver finalizada, o retrato é lido
+    do cache (ou montado e congelado nele, se ainda não estiver).
+    """
+    if not sessao.finalizada:
+        return monta_resumo_sessao(sessao)
+
+    congelado = cache.get(CHAVE_RESUMO_SESSAO % sessao.pk)
+    if congelado is None:
+        resumo = monta_resumo_sessao(sessao)
+        cache.set(CHAVE_RESUMO_SESSAO % sessao.pk,
+                  json.dumps(resumo, cls=DjangoJSONEncoder), None)
+        return resumo
+    return json.loads(congelado)
+
+
+def invalida_resumo_sessao(*pks):
+    cache.delete_many([CHAVE_RESUMO_SESSAO % pk for pk in set(pks) if pk])
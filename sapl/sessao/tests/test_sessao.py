@@ -1,18 +1,25 @@
 import pytest
 from datetime import datetime
 from django.core.exceptions import ValidationError
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.template.loader import render_to_string
+from django.test.utils import CaptureQueriesContext
 from django.utils.translation import ugettext_lazy as _
 from model_mommy import mommy
 
 from sapl.materia.models import MateriaLegislativa, TipoMateriaLegislativa
 from sapl.parlamentares.models import Legislatura, Parlamentar, Partido,SessaoLegislativa
 from sapl.sessao import forms
+from sapl.sessao.resumo import get_resumo_sessao, monta_resumo_sessao
 from sapl.sessao.models import (ExpedienteMateria, ExpedienteSessao,
                                 IntegranteMesa, Orador, OrdemDia,
                                 PresencaOrdemDia, RegistroVotacao,
                                 SessaoPlenaria, SessaoPlenariaPresenca,
                                 TipoResultadoVotacao, TipoSessaoPlenaria,
                                 VotoParlamentar)
+from sapl.sessao.pauta import move_itens_pauta, reordena_pauta
+from sapl.sessao.votacao import registra_votacao_nominal
 
 def test_valida_campos_obrigatorios_sessao_plenaria_form():
     form = forms.SessaoPlenariaForm(data={})
@@ -294,3 +301,151 @@ def test_delete_sessao_plenaria_cascade_orador():
     sessao_plenaria.delete()
     orador_filter = Orador.objects.filter(sessao_plenaria=sessao_plenaria).exists()
     assert not orador_filter
+
+
+def _consultas_resumo(sessao, quantidade):
+    for _i in range(quantidade):
+        parlamentar = mommy.make(Parlamentar)
+        mommy.make(SessaoPlenariaPresenca, sessao_plenaria=sessao,
+                   parlamentar=parlamentar)
+        mommy.make(PresencaOrdemDia, sessao_plenaria=sessao,
+                   parlamentar=parlamentar)
+        mommy.make(Orador, sessao_plenaria=sessao, parlamentar=parlamentar)
+        mommy.make(ExpedienteSessao, sessao_plenaria=sessao)
+        ordem = mommy.make(OrdemDia, sessao_plenaria=sessao)
+        mommy.make(RegistroVotacao, ordem=ordem, materia=ordem.materia)
+        mommy.make(ExpedienteMateria, sessao_plenaria=sessao)
+
+    with CaptureQueriesContext(connection) as consultas:
+        resumo = monta_resumo_sessao(sessao)
+
+    assert len(resumo['materias_ordem']) == OrdemDia.objects.filter(
+        sessao_plenaria=sessao).count()
+    assert all(m['votacao'] for m in resumo['materias_ordem'])
+    return len(consultas)
+
+
+@pytest.mark.django_db(transaction=False)
+def test_resumo_sessao_com_numero_fixo_de_consultas():
+    sessao = mommy.make(SessaoPlenaria)
+
+    assert _consultas_resumo(sessao, 2) == _consultas_resumo(sessao, 10)
+
+
+@pytest.mark.django_db(transaction=False)
+def test_resumo_de_sessao_finalizada_congelado_ate_alteracao():
+    sessao = mommy.make(SessaoPlenaria, finalizada=True)
+    mommy.make(OrdemDia, sessao_plenaria=sessao,
+               observacao='Observação da ordem do dia')
+
+    resumo = get_resumo_sessao(sessao)
+    assert len(resumo['materias_ordem']) == 1
+    assert (resumo['materias_ordem'][0]['observacao'] ==
+            'Observação da ordem do dia')
+    assert 'Observação da ordem do dia' in render_to_string(
+        'sessao/blocos_resumo/materias_ordem_dia.html', resumo)
+
+    with CaptureQueriesContext(connection) as consultas:
+        resumo = get_resumo_sessao(sessao)
+    assert len(consultas) == 0
+    assert len(resumo['materias_ordem']) == 1
+
+    mommy.make(OrdemDia, sessao_plenaria=sessao)
+    assert len(get_resumo_sessao(sessao)['materias_ordem']) == 2
+
+
+def _consultas_votacao_nominal(sessao, quantidade):
+    ordens = [mommy.make(OrdemDia, sessao_plenaria=sessao)
+              for _i in range(quantidade)]
+    parlamentares = [mommy.make(Parlamentar) for _i in range(quantidade)]
+    resultado = mommy.make(TipoResultadoVotacao, nome='Aprovado')
+    votos = [('Sim', p.id) for p in parlamentares]
+
+    # voto lançado antes do registro da votação
+    interativo = mommy.make(VotoParlamentar, ordem=ordens[0],
+                            parlamentar=parlamentares[0], voto='Não',
+                            user=None, votacao=None)
+
+    with CaptureQueriesContext(connection) as consultas:
+        registra_votacao_nominal(ordens, votos, resultado, 'obs')
+
+    assert RegistroVotacao.objects.filter(
+        ordem__in=ordens, numero_votos_sim=quantidade).count() == quantidade
+    assert VotoParlamentar.objects.filter(
+        ordem__in=ordens, voto='Sim',
+        votacao__isnull=False).count() == quantidade * quantidade
+    interativo.refresh_from_db()
+    assert interativo.voto == 'Sim'
+    assert not OrdemDia.objects.filter(
+        id__in=[o.id for o in ordens]).exclude(
+            resultado='Aprovado', votacao_aberta=False).exists()
+    return len(consultas)
+
+
+@pytest.mark.django_db(transaction=False)
+def test_votacao_nominal_em_bloco_com_numero_fixo_de_consultas():
+    assert (_consultas_votacao_nominal(mommy.make(SessaoPlenaria), 2) ==
+            _consultas_votacao_nominal(mommy.make(SessaoPlenaria), 10))
+
+
+def _pauta(quantidade):
+    sessao = mommy.make(SessaoPlenaria)
+    ordens = [mommy.make(OrdemDia, sessao_plenaria=sessao, numero_ordem=i)
+              for i in range(1, quantidade + 1)]
+    return sessao, [o.pk for o in ordens]
+
+
+def _ordem_atual(sessao):
+    return list(OrdemDia.objects.filter(sessao_plenaria=sessao).order_by(
+        'numero_ordem').values_list('pk', flat=True))
+
+
+@pytest.mark.django_db(transaction=False)
+def test_move_itens_pauta_em_lote():
+    sessao, pks = _pauta(30)
+
+    with CaptureQueriesContext(connection) as consultas:
+        move_itens_pauta(OrdemDia, sessao.pk, [(1, 30), (29, 2)])
+
+    # uma consulta e dois UPDATE por movimento, mais a transação
+    assert len(consultas) <= 8
+    esperado = pks[1:] + pks[:1]
+    esperado.insert(1, esperado.pop(28))
+    assert _ordem_atual(sessao) == esperado
+    assert list(OrdemDia.objects.filter(sessao_plenaria=sessao).order_by(
+        'numero_ordem').values_list('numero_ordem', flat=True)) == list(
+            range(1, 31))
+
+
+@pytest.mark.django_db(transaction=False)
+def test_reordena_pauta_com_nova_ordem():
+    sessao, pks = _pauta(5)
+    OrdemDia.objects.filter(pk=pks[2]).update(numero_ordem=10)
+
+    reordena_pauta(OrdemDia, sessao.pk, [pks[4], pks[3]])
+
+    assert _ordem_atual(sessao) == [pks[4], pks[3], pks[0], pks[1], pks[2]]
+    assert sorted(OrdemDia.objects.filter(
+        sessao_plenaria=sessao).values_list(
+            'numero_ordem', flat=True)) == [1, 2, 3, 4, 5]
+
+
+@pytest.mark.django_db(transaction=False)
+def test_mudar_ordem_materia_sessao_entrada_invalida(admin_client):
+    sessao, pks = _pauta(3)
+    url = reverse('sapl.sessao:mudar_ordem_materia_sessao')
+
+    for dados in ({'pk_sessao': sessao.pk, 'materia': 'ordem',
+                   'movimentos': '[[0, '},
+                  {'pk_sessao': sessao.pk, 'materia': 'ordem',
+                   'movimentos': '[0, 1]'},
+                  {'pk_sessao': sessao.pk, 'materia': 'ordem',
+                   'pos_ini': 'a', 'pos_fim': '1'},
+                  {'pk_sessao': sessao.pk, 'materia': 'ordem'},
+                  {'pk_sessao': 'x', 'materia': 'ordem'}):
+        response = admin_client.post(url, dados)
+        assert response.status_code == 400
+        assert 'erro' in response.json()
+
+    assert _ordem_atual(sessao) == pks
+
@@ -1,4 +1,5 @@
 
+import json
 import logging
 from operator import itemgetter
 from re import sub
@@ -24,6 +25,7 @@ from django.views.generic.detail import DetailView
 from django.views.generic.edit import FormMixin
 from django_filters.views import FilterView
 
+from sapl.base.configuracoes import get_config_aplicacao
 from sapl.base.models import AppConfig as AppsAppConfig
 from sapl.crud.base import (RP_DETAIL, RP_LIST, Crud, CrudAux,
                             MasterDetailCrud,
@@ -32,10 +34,14 @@ from sapl.materia.forms import filtra_tramitacao_status
 from sapl.materia.models import (Autoria, DocumentoAcessorio,
                                  TipoMateriaLegislativa, Tramitacao)
 from sapl.materia.views import MateriaLegislativaPesquisaView
-from sapl.parlamentares.models import (Filiacao, Legislatura, Mandato,
+from sapl.parlamentares.models import (Legislatura, Mandato,
                                        Parlamentar, SessaoLegislativa)
 from sapl.sessao.apps import AppConfig
 from sapl.sessao.forms import ExpedienteMateriaForm, OrdemDiaForm
+from sapl.sessao.pauta import move_itens_pauta, reordena_pauta
+from sapl.sessao.resumo import get_resumo_sessao
+from sapl.sessao.votacao import (contagem_votos, registra_votacao_nominal,
+                                 votos_do_post)
 from sapl.utils import show_results_filter_set, remover_acentos
 
 from .forms import (AdicionarVariasMateriasFilterSet, BancadaForm, BlocoForm,
@@ -63,23 +69,13 @@ TipoRetiradaPautaCrud = CrudAux.build(TipoRetiradaPauta, 'tipo_retirada_pauta')
 
 
 def reordernar_materias_expediente(request, pk):
-    expedientes = ExpedienteMateria.objects.filter(
-        sessao_plenaria_id=pk)
-
-    for exp_num, e in enumerate(expedientes, 1):
-        e.numero_ordem = exp_num
-        e.save()
+    reordena_pauta(ExpedienteMateria, pk)
     return HttpResponseRedirect(
         reverse('sapl.sessao:expedientemateria_list', kwargs={'pk': pk}))
 
 
 def reordernar_materias_ordem(request, pk):
-    ordens = OrdemDia.objects.filter(
-        sessao_plenaria_id=pk)
-    for ordem_num, o in enumerate(ordens, 1):
-        o.numero_ordem = ordem_num
-        o.save()
-
+    reordena_pauta(OrdemDia, pk)
     return HttpResponseRedirect(
         reverse('sapl.sessao:ordemdia_list', kwargs={'pk': pk}))
 
@@ -1290,14 +1286,6 @@ class ResumoOrdenacaoView(PermissionRequiredMixin, FormView):
         return HttpResponseRedirect(self.get_success_url())
 
 
-def get_turno(turno):
-    for i in Tramitacao.TURNO_CHOICES:
-        if i[0] == turno:
-            return str(i[1])
-    else:
-        return ''
-
-
 class ResumoView(DetailView):
     template_name = 'sessao/resumo.html'
     model = SessaoPlenaria
@@ -1336,135 +1324,23 @@ class ResumoView(DetailView):
             context.update({'multimidia_video': _('Video: Indisponível')})
 
         # =====================================================================
-        # Mesa Diretora
-        mesa = IntegranteMesa.objects.filter(
-            sessao_plenaria=self.object)
-
-        integrantes = []
-        for m in mesa:
-            parlamentar = Parlamentar.objects.get(
-                id=m.parlamentar_id)
-            cargo = CargoMesa.objects.get(
-                id=m.cargo_id)
-            integrante = {'parlamentar': parlamentar, 'cargo': cargo}
-            integrantes.append(integrante)
-
-        context.update({'mesa': ordenar_integrantes_por_cargo(integrantes)})
+        # Mesa, presenças, expedientes, matérias, oradores e ocorrências
+        resumo = get_resumo_sessao(self.object)
+        context.update(resumo)
 
         # =====================================================================
-        # Presença Sessão
-        presencas = SessaoPlenariaPresenca.objects.filter(
-            sessao_plenaria_id=self.object.id
-        ).order_by('parlamentar__nome_parlamentar')
-
-        parlamentares_sessao = [p.parlamentar for p in presencas]
-
-        ausentes_sessao = JustificativaAusencia.objects.filter(
-            sessao_plenaria_id=self.object.id
-        ).order_by('parlamentar__nome_parlamentar')
-
-        context.update({'presenca_sessao': parlamentares_sessao,
-                        'justificativa_ausencia': ausentes_sessao})
-
-        # =====================================================================
-        # Expedientes
-        expediente = ExpedienteSessao.objects.filter(
-            sessao_plenaria_id=self.object.id).order_by('tipo__nome')
-
-        expedientes = []
-        for e in expediente:
-            tipo = TipoExpediente.objects.get(id=e.tipo_id)
-            conteudo = e.conteudo
-            ex = {'tipo': tipo, 'conteudo': conteudo}
-            expedientes.append(ex)
-        context.update({'expedientes': expedientes})
-
-        # =====================================================================
-        # Matérias Expediente
-        materias = ExpedienteMateria.objects.filter(
-            sessao_plenaria_id=self.object.id)
-
-        materias_expediente = []
-        for m in materias:
-
-            ementa = m.materia.ementa
-            titulo = m.materia
-            numero = m.numero_ordem
-            tramitacao = m.materia.tramitacao_set.last()
-            turno = None
-
-            if tramitacao:
-                turno = get_turno(tramitacao.turno)
-
-            rv = m.registrovotacao_set.first()
-            rp = m.retiradapauta_set.filter(materia=m.materia).first()
-            if rv:
-                resultado = rv.tipo_resultado_votacao.nome
-                resultado_observacao = rv.observacao
-            elif rp:
-                resultado = rp.tipo_de_retirada.descricao
-                resultado_observacao = rp.observacao
-            else:
-                resultado = _('Matéria não votada')
-                resultado_observacao = _(' ')
-
-            autoria = Autoria.objects.filter(materia_id=m.materia_id)
-            autor = [str(x.autor) for x in autoria]
-
-            mat = {'ementa': ementa,
-                   'titulo': titulo,
-                   'numero': numero,
-                   'turno': turno,
-                   'resultado': resultado,
-                   'resultado_observacao': resultado_observacao,
-                   'autor': autor,
-                   'numero_protocolo': m.materia.numero_protocolo,
-                   'numero_processo': m.materia.numeracao_set.last(),
-                   'observacao': m.observacao
-                   }
-            materias_expediente.append(mat)
-
-        context.update({'materia_expediente': materias_expediente})
-
-        # =====================================================================
-        # Oradores Expediente
-        oradores = []
-        for orador in OradorExpediente.objects.filter(
-                sessao_plenaria_id=self.object.id).order_by('numero_ordem'):
-            numero_ordem = orador.numero_ordem
-            url_discurso = orador.url_discurso
-            observacao = orador.observacao
-            parlamentar = Parlamentar.objects.get(
-                id=orador.parlamentar_id)
-            ora = {'numero_ordem': numero_ordem,
-                   'url_discurso': url_discurso,
-                   'parlamentar': parlamentar,
-                   'observacao': observacao
-                   }
-            oradores.append(ora)
-
-        context.update({'oradores': oradores})
-
-        # =====================================================================
-        # Presença Ordem do Dia
-        presencas = PresencaOrdemDia.objects.filter(
-            sessao_plenaria_id=self.object.id
-        ).order_by('parlamentar__nome_parlamentar')
-
-        parlamentares_mesa_dia = [m['parlamentar'] for m in context['mesa']]
-        # composicao_mesa = ComposicaoMesa.objects.filter(sessao_legislativa=sessao)
+        # Assinaturas da ata
+        parlamentares_mesa_dia = [m['parlamentar'] for m in resumo['mesa']]
 
         presidente_dia = ''
-        for m in context['mesa']:
-            if m['cargo'].descricao == 'Presidente':
+        for m in resumo['mesa']:
+            if m['cargo']['descricao'] == 'Presidente':
                 presidente_dia = [m['parlamentar']]
                 break
 
-        parlamentares_ordem = [p.parlamentar for p in presencas]
+        parlamentares_ordem = resumo['presenca_ordem']
 
-        context.update({'presenca_ordem': parlamentares_ordem})
-
-        config_assinatura_ata = AppsAppConfig.objects.first().assinatura_ata
+        config_assinatura_ata = get_config_aplicacao().assinatura_ata
         if config_assinatura_ata == 'T' and parlamentares_ordem:
             context.update(
                 {'texto_assinatura': 'Assinatura de Todos os Parlamentares Presentes na Sessão'})
@@ -1478,81 +1354,6 @@ class ResumoView(DetailView):
                 {'texto_assinatura': 'Assinatura do Presidente da Sessão'})
             context.update({'assinatura_presentes': presidente_dia})
 
-        # =====================================================================
-        # Matérias Ordem do Dia
-        ordem = OrdemDia.objects.filter(
-            sessao_plenaria_id=self.object.id)
-        materias_ordem = []
-        for o in ordem:
-            ementa = o.materia.ementa
-            ementa_observacao = o.observacao
-            titulo = o.materia
-            numero = o.numero_ordem
-            tramitacao = o.materia.tramitacao_set.last()
-            turno = None
-            if tramitacao:
-                turno = get_turno(tramitacao.turno)
-
-            # Verificar resultado
-            rv = o.registrovotacao_set.filter(materia=o.materia).first()
-            rp = o.retiradapauta_set.filter(materia=o.materia).first()
-            if rv:
-                resultado = rv.tipo_resultado_votacao.nome
-                resultado_observacao = rv.observacao
-            elif rp:
-                resultado = rp.tipo_de_retirada.descricao
-                resultado_observacao = rp.observacao
-            else:
-                resultado = _('Matéria não votada')
-                resultado_observacao = _(' ')
-
-            autoria = Autoria.objects.filter(
-                materia_id=o.materia_id)
-            autor = [str(x.autor) for x in autoria]
-
-            mat = {'ementa': ementa,
-                   'ementa_observacao': ementa_observacao,
-                   'titulo': titulo,
-                   'numero': numero,
-                   'turno': turno,
-                   'resultado': resultado,
-                   'resultado_observacao': resultado_observacao,
-                   'autor': autor,
-                   'numero_protocolo': o.materia.numero_protocolo,
-                   'numero_processo': o.materia.numeracao_set.last()
-                   }
-            materias_ordem.append(mat)
-
-        context.update({'materias_ordem': materias_ordem})
-
-        # =====================================================================
-        # Oradores nas Explicações Pessoais
-        oradores_explicacoes = []
-        for orador in Orador.objects.filter(
-                sessao_plenaria_id=self.object.id).order_by('numero_ordem'):
-            for parlamentar in Parlamentar.objects.filter(
-                    id=orador.parlamentar.id):
-                partido_sigla = Filiacao.objects.filter(
-                    parlamentar=parlamentar).last()
-                if not partido_sigla:
-                    sigla = ''
-                else:
-                    sigla = partido_sigla.partido.sigla
-                oradores = {
-                    'numero_ordem': orador.numero_ordem,
-                    'parlamentar': parlamentar,
-                    'sgl_partido': sigla
-                }
-                oradores_explicacoes.append(oradores)
-        context.update({'oradores_explicacoes': oradores_explicacoes})
-
-        # =====================================================================
-        # Ocorrẽncias da Sessão
-        ocorrencias_sessao = OcorrenciaSessao.objects.filter(
-            sessao_plenaria_id=self.object.id)
-
-        context.update({'ocorrencias_da_sessao': ocorrencias_sessao})
-
         # =====================================================================
         # Indica a ordem com a qual o template será renderizado
         ordenacao = ResumoOrdenacao.objects.first()
@@ -2083,11 +1884,6 @@ class VotacaoNominalAbstract(SessaoPermissionMixin):
                 raise Http404()
 
         if form.is_valid():
-            votos_sim = 0
-            votos_nao = 0
-            abstencoes = 0
-            nao_votou = 0
-
             if 'cancelar-votacao' in request.POST:
                 fechar_votacao_materia(materia_votacao)
                 if self.ordem:
@@ -2103,86 +1899,22 @@ class VotacaoNominalAbstract(SessaoPermissionMixin):
                                          'nenhum resultado da votação')
                     return self.form_invalid(form)
 
-            for votos in request.POST.getlist('voto_parlamentar'):
-                v = votos.split(':')
-                voto = v[0]
-                parlamentar_id = v[1]
-
-                if voto == 'Sim':
-                    votos_sim += 1
-                elif voto == 'Não':
-                    votos_nao += 1
-                elif voto == 'Abstenção':
-                    abstencoes += 1
-                elif voto == 'Não Votou':
-                    nao_votou += 1
+            votos = votos_do_post(request.POST.getlist('voto_parlamentar'))
+            votos_sim, votos_nao, abstencoes, nao_votou = contagem_votos(votos)
 
             # Caso todas as opções sejam 'Não votou', fecha a votação
-            if nao_votou == len(request.POST.getlist('voto_parlamentar')):
+            if nao_votou == len(votos):
                 self.logger.error('user=' + username + '. Não é possível finalizar a votação sem '
                                   'nenhum voto')
                 form.add_error(None, 'Não é possível finalizar a votação sem '
                                      'nenhum voto')
                 return self.form_invalid(form)
-            # Remove todas as votação desta matéria, caso existam
-            if self.ordem:
-                RegistroVotacao.objects.filter(ordem_id=ordem_id).delete()
-            elif self.expediente:
-                RegistroVotacao.objects.filter(
-                    expediente_id=expediente_id).delete()
-
-            votacao = RegistroVotacao()
-            votacao.numero_votos_sim = votos_sim
-            votacao.numero_votos_nao = votos_nao
-            votacao.numero_abstencoes = abstencoes
-            votacao.observacao = request.POST.get('observacao', None)
-
-            votacao.materia_id = materia_votacao.materia.id
-            if self.ordem:
-                votacao.ordem_id = ordem_id
-            elif self.expediente:
-                votacao.expediente_id = expediente_id
-
-            votacao.tipo_resultado_votacao = form.cleaned_data['resultado_votacao']
-            votacao.save()
-
-            for votos in request.POST.getlist('voto_parlamentar'):
-                v = votos.split(':')
-                voto = v[0]
-                parlamentar_id = v[1]
 
-                if self.ordem:
-                    voto_parlamentar = VotoParlamentar.objects.get_or_create(
-                        parlamentar_id=parlamentar_id,
-                        ordem_id=ordem_id)[0]
-                elif self.expediente:
-                    voto_parlamentar = VotoParlamentar.objects.get_or_create(
-                        parlamentar_id=parlamentar_id,
-                        expediente_id=expediente_id)[0]
-
-                voto_parlamentar.voto = voto
-                voto_parlamentar.parlamentar_id = parlamentar_id
-                voto_parlamentar.votacao_id = votacao.id
-                voto_parlamentar.save()
-
-                resultado = form.cleaned_data['resultado_votacao']
-
-                materia_votacao.resultado = resultado.nome
-                materia_votacao.votacao_aberta = False
-                materia_votacao.save()
-
-            # Verifica se existe algum VotoParlamentar sem RegistroVotacao
-            # Por exemplo, se algum parlamentar votar e sua presença for
-            # removida da ordem do dia/expediente antes da conclusão da
-            # votação
-            if self.ordem:
-                VotoParlamentar.objects.filter(
-                    ordem_id=ordem_id,
-                    votacao__isnull=True).delete()
-            elif self.expediente:
-                VotoParlamentar.objects.filter(
-                    expediente_id=expediente_id,
-                    votacao__isnull=True).delete()
+            registra_votacao_nominal(
+                [materia_votacao], votos,
+                form.cleaned_data['resultado_votacao'],
+                request.POST.get('observacao', None),
+                username=username)
             return self.form_valid(form)
 
         else:
@@ -2774,110 +2506,10 @@ class PautaSessaoDetailView(DetailView):
                 'encerramento': encerramento},
         ]})
         # =====================================================================
-        # Matérias Expediente
-        materias = ExpedienteMateria.objects.filter(
-            sessao_plenaria_id=self.object.id)
-
-        materias_expediente = []
-        for m in materias:
-            ementa = m.materia.ementa
-            titulo = m.materia
-            numero = m.numero_ordem
-
-            ultima_tramitacao = m.materia.tramitacao_set.last()
-
-            situacao = ultima_tramitacao.status if ultima_tramitacao else None
-
-            if situacao is None:
-                situacao = _("Não informada")
-            rv = m.registrovotacao_set.all()
-            if rv:
-                resultado = rv[0].tipo_resultado_votacao.nome
-                resultado_observacao = rv[0].observacao
-            else:
-                resultado = _('Matéria não votada')
-                resultado_observacao = _(' ')
-
-            autoria = Autoria.objects.filter(materia_id=m.materia_id)
-            autor = [str(x.autor) for x in autoria]
-
-            mat = {'id': m.materia_id,
-                   'ementa': ementa,
-                   'observacao': m.observacao,
-                   'titulo': titulo,
-                   'numero': numero,
-                   'resultado': resultado,
-                   'resultado_observacao': resultado_observacao,
-                   'situacao': situacao,
-                   'autor': autor
-                   }
-            materias_expediente.append(mat)
-
-        context.update({'materia_expediente': materias_expediente})
-        # =====================================================================
-        # Expedientes
-        expediente = ExpedienteSessao.objects.filter(
-            sessao_plenaria_id=self.object.id)
-
-        expedientes = []
-        for e in expediente:
-            tipo = TipoExpediente.objects.get(
-                id=e.tipo_id)
-            conteudo = sub(
-                '&nbsp;', ' ', strip_tags(e.conteudo.replace('<br/>', '\n')))
-
-            ex = {'tipo': tipo, 'conteudo': conteudo}
-            expedientes.append(ex)
-
-        context.update({'expedientes': expedientes})
-        # =====================================================================
-        # Orador Expediente
-        oradores = OradorExpediente.objects.filter(
-            sessao_plenaria_id=self.object.id).order_by('numero_ordem')
-        context.update({'oradores': oradores})
-        # =====================================================================
-        # Matérias Ordem do Dia
-        ordem = OrdemDia.objects.filter(
-            sessao_plenaria_id=self.object.id)
-
-        materias_ordem = []
-        for o in ordem:
-            ementa = o.materia.ementa
-            titulo = o.materia
-            numero = o.numero_ordem
-
-            ultima_tramitacao = o.materia.tramitacao_set.last()
-
-            situacao = ultima_tramitacao.status if ultima_tramitacao else None
-
-            if situacao is None:
-                situacao = _("Não informada")
-            # Verificar resultado
-            rv = o.registrovotacao_set.all()
-            if rv:
-                resultado = rv[0].tipo_resultado_votacao.nome
-                resultado_observacao = rv[0].observacao
-            else:
-                resultado = _('Matéria não votada')
-                resultado_observacao = _(' ')
-
-            autoria = Autoria.objects.filter(
-                materia_id=o.materia_id)
-            autor = [str(x.autor) for x in autoria]
-
-            mat = {'id': o.materia_id,
-                   'ementa': ementa,
-                   'observacao': o.observacao,
-                   'titulo': titulo,
-                   'numero': numero,
-                   'resultado': resultado,
-                   'resultado_observacao': resultado_observacao,
-                   'situacao': situacao,
-                   'autor': autor
-                   }
-            materias_ordem.append(mat)
-
-        context.update({'materias_ordem': materias_ordem})
+        # Matérias do Expediente e da Ordem do Dia
+        resumo = get_resumo_sessao(self.object)
+        context.update({'materia_expediente': resumo['materia_expediente'],
+                        'materias_ordem': resumo['materias_ordem']})
         context.update({'subnav_template_name': 'sessao/pauta_subnav.yaml'})
 
         return self.render_to_response(context)
@@ -3145,59 +2777,44 @@ class AdicionarVariasMateriasOrdemDia(AdicionarVariasMateriasExpediente):
 @permission_required('sessao.change_expedientemateria',
                      'sessao.change_ordemdia')
 def mudar_ordem_materia_sessao(request):
-    # Pega os dados vindos da requisição
-    posicao_inicial = int(request.POST['pos_ini']) + 1
-    posicao_final = int(request.POST['pos_fim']) + 1
-    pk_sessao = int(request.POST['pk_sessao'])
+    """
+    Reordena a pauta a partir do arrastar e soltar das listagens.
+
+    Aceita um movimento (pos_ini, pos_fim), uma lista de movimentos em
+    'movimentos' (JSON [[pos_ini, pos_fim], ...]) ou a nova ordem completa
+    em 'ordem' (lista de pks). As posições são contadas a partir de 0.
+    """
     logger = logging.getLogger(__name__)
 
-    materia = request.POST['materia']
+    try:
+        pk_sessao = int(request.POST['pk_sessao'])
+        materia = request.POST['materia']
+
+        # Verifica se está nas Matérias do Expediente ou da Ordem do Dia
+        if materia == 'expediente':
+            materia = ExpedienteMateria
+        elif materia == 'ordem':
+            materia = OrdemDia
+        else:
+            return JsonResponse({}, safe=False)
+
+        if 'ordem' in request.POST:
+            reordena_pauta(materia, pk_sessao,
+                           [int(pk) for pk in request.POST.getlist('ordem')])
+            return JsonResponse({}, safe=False)
 
-    # Verifica se está nas Matérias do Expediente ou da Ordem do Dia
-    if materia == 'expediente':
-        materia = ExpedienteMateria
-    elif materia == 'ordem':
-        materia = OrdemDia
-    else:
-        return JsonResponse({}, safe=False)
+        if 'movimentos' in request.POST:
+            movimentos = json.loads(request.POST['movimentos'])
+        else:
+            movimentos = [(request.POST['pos_ini'], request.POST['pos_fim'])]
 
-    # Testa se existe alguma matéria na posição recebida
-    try:
-        materia_1 = materia.objects.get(
-            sessao_plenaria=pk_sessao,
-            numero_ordem=posicao_inicial)
-    except ObjectDoesNotExist:
+        move_itens_pauta(materia, pk_sessao,
+                         [(int(ini) + 1, int(fim) + 1)
+                          for ini, fim in movimentos])
+    except (ObjectDoesNotExist, KeyError, TypeError, ValueError) as e:
         username = request.user.username
-        logger.error("user=" + username +
-                     ". Materia com sessao_plenaria={} e numero_ordem={}.".format(pk_sessao, posicao_inicial))
-        raise  # TODO tratar essa exceção
-
-    # Se a posição inicial for menor que a final, todos que
-    # estiverem acima da nova posição devem ter sua ordem decrementada
-    # em uma posição
-    if posicao_inicial < posicao_final:
-        materias_expediente = materia.objects.filter(
-            sessao_plenaria=pk_sessao,
-            numero_ordem__lte=posicao_final,
-            numero_ordem__gte=posicao_inicial)
-        for m in materias_expediente:
-            m.numero_ordem = m.numero_ordem - 1
-            m.save()
-
-    # Se a posição inicial for maior que a final, todos que
-    # estiverem abaixo da nova posição devem ter sua ordem incrementada
-    # em uma posição
-    elif posicao_inicial > posicao_final:
-        materias_expediente = materia.objects.filter(
-            sessao_plenaria=pk_sessao,
-            numero_ordem__gte=posicao_final,
-            numero_ordem__lte=posicao_inicial)
-        for m in materias_expediente:
-            m.numero_ordem = m.numero_ordem + 1
-            m.save()
-
-    materia_1.numero_ordem = posicao_final
-    materia_1.save()
+        logger.error("user=" + username + ". " + str(e))
+        return JsonResponse({'erro': str(e)}, status=400)
 
     return JsonResponse({}, safe=False)
 
@@ -3582,87 +3199,21 @@ class VotacaoEmBlocoNominalView(PermissionRequiredForAppCrudMixin, TemplateView)
                     return self.form_invalid(form, context)
 
                 if request.POST['origem'] == 'ordem':
-                    for ordem_id in request.POST.getlist('ordens'):
-                        ordem = OrdemDia.objects.get(id=ordem_id)
-                        # Remove todas as votação desta matéria, caso existam
-                        RegistroVotacao.objects.filter(
-                            ordem_id=ordem_id).delete()
-                        votacao = RegistroVotacao()
-                        votacao.numero_votos_sim = int(
-                            request.POST['votos_sim'])
-                        votacao.numero_votos_nao = int(
-                            request.POST['votos_nao'])
-                        votacao.numero_abstencoes = int(
-                            request.POST['abstencoes'])
-                        votacao.observacao = request.POST['observacao']
-                        votacao.materia = ordem.materia
-                        votacao.ordem = ordem
-                        votacao.tipo_resultado_votacao = form.cleaned_data['resultado_votacao']
-                        votacao.save()
-
-                        for votos in request.POST.getlist('voto_parlamentar'):
-                            v = votos.split(':')
-                            voto = v[0]
-                            parlamentar_id = v[1]
-
-                            voto_parlamentar = VotoParlamentar.objects.get_or_create(
-                                parlamentar_id=parlamentar_id,
-                                ordem_id=ordem_id)[0]
-
-                            voto_parlamentar.voto = voto
-                            voto_parlamentar.parlamentar_id = parlamentar_id
-                            voto_parlamentar.votacao_id = votacao.id
-                            voto_parlamentar.save()
-
-                            ordem.resultado = form.cleaned_data['resultado_votacao'].nome
-                            ordem.votacao_aberta = False
-                            ordem.save()
-
-                    VotoParlamentar.objects.filter(
-                        ordem_id=ordem_id,
-                        votacao__isnull=True).delete()
-
+                    itens = list(OrdemDia.objects.filter(
+                        id__in=request.POST.getlist('ordens')))
                 else:
-                    for expediente_id in request.POST.getlist('expedientes'):
-                        expediente = ExpedienteMateria.objects.get(
-                            id=expediente_id)
-                        RegistroVotacao.objects.filter(
-                            expediente_id=expediente_id).delete()
-                        votacao = RegistroVotacao()
-                        votacao.numero_votos_sim = int(
-                            request.POST['votos_sim'])
-                        votacao.numero_votos_nao = int(
-                            request.POST['votos_nao'])
-                        votacao.numero_abstencoes = int(
-                            request.POST['abstencoes'])
-                        votacao.observacao = request.POST['observacao']
-                        votacao.materia = expediente.materia
-                        votacao.expediente = expediente
-                        votacao.tipo_resultado_votacao = form.cleaned_data['resultado_votacao']
-                        votacao.save()
-
-                        # Salva os votos de cada parlamentar
-                        for votos in request.POST.getlist('voto_parlamentar'):
-                            v = votos.split(':')
-                            voto = v[0]
-                            parlamentar_id = v[1]
-
-                            voto_parlamentar = VotoParlamentar.objects.get_or_create(
-                                parlamentar_id=parlamentar_id,
-                                expediente_id=expediente_id)[0]
-
-                            voto_parlamentar.voto = voto
-                            voto_parlamentar.parlamentar_id = parlamentar_id
-                            voto_parlamentar.votacao_id = votacao.id
-                            voto_parlamentar.save()
-
-                            expediente.resultado = form.cleaned_data['resultado_votacao'].nome
-                            expediente.votacao_aberta = False
-                            expediente.save()
-
-                    VotoParlamentar.objects.filter(
-                        expediente_id=expediente_id,
-                        votacao__isnull=True).delete()
+                    itens = list(ExpedienteMateria.objects.filter(
+                        id__in=request.POST.getlist('expedientes')))
+
+                registra_votacao_nominal(
+                    itens,
+                    votos_do_post(request.POST.getlist('voto_parlamentar')),
+                    form.cleaned_data['resultado_votacao'],
+                    request.POST['observacao'],
+                    contagem=(int(request.POST['votos_sim']),
+                              int(request.POST['votos_nao']),
+                              int(request.POST['abstencoes'])),
+                    username=username)
 
                 return HttpResponseRedirect(self.get_success_url())
 
@@ -0,0 +1,134 @@
+"""
+Registro das votações nominais.
+
+Grava, para um conjunto de matérias da ordem do dia ou do expediente, os
+registros de votação e os votos de cada parlamentar com um número fixo de
+instruções, dentro de uma única transação. Como as gravações em lote não
+disparam signals, os caches que dependem da sessão (painel, resumo e
+relatórios) são invalidados explicitamente ao final.
+"""
+import logging
+import time
+
+from django.db import transaction
+
+from sapl.painel.estado import invalida_estado_painel
+from sapl.relatorios.geracao import invalida_grupos
+from sapl.relatorios.receivers import GRUPO_SESSAO
+from sapl.sessao.models import OrdemDia, RegistroVotacao, VotoParlamentar
+from sapl.sessao.resumo import invalida_resumo_sessao
+from sapl.utils import update_em_lote
+
+logger = logging.getLogger(__name__)
+
+
+def votos_do_post(valores):
+    """
+    Converte os valores 'voto:parlamentar_id' enviados pelo formulário de
+    votação nominal em uma lista de tuplas (voto, parlamentar_id).
+    """
+    votos = []
+    for valor in valores:
+        voto, parlamentar_id = valor.split(':')[:2]
+        votos.append((voto, int(parlamentar_id)))
+    return votos
+
+
+def contagem_votos(votos):
+    """
+    :return: tupla (sim, não, abstenções, não votou)
+    """
+    escolhas = [voto for voto, __ in votos]
+    return (escolhas.count('Sim'), escolhas.count('Não'),
+            escolhas.count('Abstenção'), escolhas.count('Não Votou'))
+
+
+def invalida_caches_sessao(*pks):
+    for pk in set(pks):
+        invalida_estado_painel(pk)
+        invalida_grupos(GRUPO_SESSAO % pk)
+    invalida_resumo_sessao(*pks)
+
+
+def registra_votacao_nominal(itens, votos, tipo_resultado, observacao,
+                             contagem=None, username=''):
+    """
+    Registra a votação nominal de `itens` (OrdemDia ou ExpedienteMateria,
+    todos do mesmo tipo) com os mesmos `votos` para todos eles.
+
+    Registros de votação anteriores dos itens são substituídos. Votos já
+    existentes (lançados pela votação interativa) são atualizados,
+    preservando usuário, IP e horário; os demais são criados.
+
+    :param votos: lista de tuplas (voto, parlamentar_id)
+    :param contagem: tupla (sim, não, abstenções); calculada a partir de
+        `votos` se não for informada
+    :return: lista dos RegistroVotacao criados
+    """
+    if not itens:
+        return []
+
+    inicio = time.time()
+    campo = 'ordem' if isinstance(itens[0], OrdemDia) else 'expediente'
+    model = type(itens[0])
+    ids = [item.id for item in itens]
+    if contagem is None:
+        contagem = contagem_votos(votos)[:3]
+    sim, nao, abstencoes = contagem
+
+    with transaction.atomic():
+        RegistroVotacao.objects.filter(**{campo + '__in': ids}).delete()
+
+        registros = RegistroVotacao.objects.bulk_create([
+            RegistroVotacao(**{
+                campo: item,
+                'materia_id': item.materia_id,
+                'numero_votos_sim': sim,
+                'numero_votos_nao': nao,
+                'numero_abstencoes': abstencoes,
+                'observacao': observacao,
+                'tipo_resultado_votacao': tipo_resultado})
+            for item in itens])
+        registro_do_item = {getattr(r, campo + '_id'): r.id
+                            for r in registros}
+
+        existentes = {
+            (item_id, parlamentar_id): pk
+            for pk, item_id, parlamentar_id in VotoParlamentar.objects.filter(
+                **{campo + '__in': ids}).values_list(
+                    'pk', campo + '_id', 'parlamentar_id')}
+
+        atualizados = {}
+        novos = []
+        for item_id in ids:
+            for voto, parlamentar_id in votos:
+                pk = existentes.get((item_id, parlamentar_id))
+                if pk:
+                    atualizados[pk] = (voto, registro_do_item[item_id])
+                else:
+                    novos.append(VotoParlamentar(**{
+                        campo + '_id': item_id,
+                        'parlamentar_id': parlamentar_id,
+                        'voto': voto,
+                        'votacao_id': registro_do_item[item_id]}))
+
+        update_em_lote(VotoParlamentar, ('voto', 'votacao'), atualizados)
+        VotoParlamentar.objects.bulk_create(novos)
+
+        model.objects.filter(id__in=ids).update(
+            resultado=tipo_resultado.nome, votacao_aberta=False)
+
+        # Remove votos sem RegistroVotacao. Por exemplo, se algum
+        # parlamentar votar e sua presença for removida da ordem do
+        # dia/expediente antes da conclusão da votação
+        VotoParlamentar.objects.filter(
+            **{campo + '__in': ids, 'votacao__isnull': True}).delete()
+
+    invalida_caches_sessao(*{item.sessao_plenaria_id for item in itens})
+
+    logger.info(
+        'user={}. Votação nominal registrada: {} {}(s), {} votos por item '
+        '({} atualizados, {} criados) em {:.3f}s.'.format(
+            username, len(ids), model.__name__, len(votos),
+            len(atualizados), len(novos), time.time() - inicio))
+    return registros
@@ -111,10 +111,23 @@ SOLR_URL = config('SOLR_URL', cast=str, default='http://localhost:8983')
 SOLR_COLLECTION = config('SOLR_COLLECTION', cast=str, default='sapl')
 
 if USE_SOLR:
-    HAYSTACK_SIGNAL_PROCESSOR = 'haystack.signals.RealtimeSignalProcessor'  # enable auto-index
+    HAYSTACK_SIGNAL_PROCESSOR = 'sapl.base.indexacao.BackgroundSignalProcessor'  # enable auto-index
     SEARCH_BACKEND = 'haystack.backends.solr_backend.SolrEngine'
     SEARCH_URL = ('URL', '{}/solr/{}'.format(SOLR_URL, SOLR_COLLECTION))
 
+# Relê o conteúdo da proposição no recebimento, conferindo-o com o hash
+# gravado no envio (o recebimento normal é só uma consulta pelo hash)
+VERIFICAR_HASH_PROPOSICAO = config(
+    'VERIFICAR_HASH_PROPOSICAO', cast=bool, default=False)
+
+# PDFs dos relatórios já gerados (fora de MEDIA_ROOT, que é público)
+RELATORIOS_DIR = config(
+    'RELATORIOS_DIR', cast=str, default='/var/tmp/sapl_relatorios')
+# Relatórios gerados fora dos workers web, pelo comando gera_relatorios; se
+# desligado (ex.: desenvolvimento), são gerados na própria requisição
+RELATORIOS_EM_SEGUNDO_PLANO = config(
+    'RELATORIOS_EM_SEGUNDO_PLANO', cast=bool, default=True)
+
 #  BATCH_SIZE: default is 1000 if omitted, avoid Too Large Entity Body errors
 HAYSTACK_CONNECTIONS = {
     'default': {
@@ -189,6 +202,7 @@ TEMPLATES = [
                 'django.contrib.messages.context_processors.messages',
                 'sapl.context_processors.parliament_info',
                 'sapl.context_processors.mail_service_configured',
+                'sapl.context_processors.contadores_configuracoes',
             ],
             'debug': DEBUG
         },
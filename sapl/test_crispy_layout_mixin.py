@@ -1,8 +1,14 @@
+import time
 from unittest import mock
 
+from django.core.urlresolvers import reverse
+from model_mommy import mommy
+import pytest
 import rtyaml
 
-from sapl.crispy_layout_mixin import read_layout_from_yaml
+from sapl.crispy_layout_mixin import (invalida_cache_layouts,
+                                      read_layout_from_yaml)
+from sapl.materia.models import MateriaLegislativa
 
 
 def test_read_layout_from_yaml(tmpdir):
@@ -17,6 +23,7 @@ ModelName:
   - equalA  equalB  equalC
   - highlander '''
 
+    invalida_cache_layouts()
     with mock.patch('sapl.crispy_layout_mixin.read_yaml_from_file') as ryff:
         ryff.return_value = rtyaml.load(stub_content)
         assert read_layout_from_yaml('....', 'ModelName') == [
@@ -30,3 +37,45 @@ ModelName:
              [('highlander', 12)],
              ],
         ]
+    invalida_cache_layouts()
+
+
+def test_layout_compilado_uma_unica_vez():
+    invalida_cache_layouts()
+    with mock.patch('sapl.crispy_layout_mixin.rtyaml.load',
+                    wraps=rtyaml.load) as load:
+        layout = read_layout_from_yaml('materia/layouts.yaml',
+                                       'MateriaLegislativa')
+        layout[0].append('alterado')
+        assert read_layout_from_yaml('materia/layouts.yaml',
+                                     'MateriaLegislativa') != layout
+        assert load.call_count == 1
+
+    invalida_cache_layouts()
+    with mock.patch('sapl.crispy_layout_mixin.rtyaml.load',
+                    wraps=rtyaml.load) as load:
+        read_layout_from_yaml('materia/layouts.yaml', 'MateriaLegislativa')
+        assert load.call_count == 1
+
+
+@pytest.mark.django_db(transaction=False)
+def test_benchmark_layout_detail_materia(admin_client):
+    materia = mommy.make(MateriaLegislativa)
+    url = reverse('sapl.materia:materialegislativa_detail',
+                  kwargs={'pk': materia.pk})
+
+    def tempo_requisicao():
+        inicio = time.time()
+        response = admin_client.get(url)
+        assert response.status_code == 200
+        return time.time() - inicio
+
+    invalida_cache_layouts()
+    frio = tempo_requisicao()
+    with mock.patch('sapl.crispy_layout_mixin.read_yaml_from_file') as ryff:
+        quente = min(tempo_requisicao() for _ in range(5))
+        assert not ryff.called
+
+    print('\ndetail de MateriaLegislativa: %.4fs sem cache de layout, '
+          '%.4fs com cache (economia de %.4fs por requisição)' % (
+              frio, quente, frio - quente))
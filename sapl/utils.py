@@ -592,15 +592,30 @@ class AnoNumeroOrderingFilter(django_filters.OrderingFilter):
         return super().filter(qs, _value)
 
 
-def gerar_hash_arquivo(arquivo, pk, block_size=2**20):
+def md5_arquivo(arquivo, block_size=2**20):
+    """
+    MD5 do arquivo, lido em blocos.
+
+    :param arquivo: caminho do arquivo ou File do Django (inclusive um
+        arquivo recém enviado, ainda não gravado no storage)
+    """
     md5 = hashlib.md5()
-    arq = open(arquivo, 'rb')
-    while True:
-        data = arq.read(block_size)
-        if not data:
-            break
-        md5.update(data)
-    return 'P' + md5.hexdigest() + SEPARADOR_HASH_PROPOSICAO + pk
+    if isinstance(arquivo, str):
+        with open(arquivo, 'rb') as arq:
+            while True:
+                data = arq.read(block_size)
+                if not data:
+                    break
+                md5.update(data)
+    else:
+        for data in arquivo.chunks(block_size):
+            md5.update(data)
+    return md5.hexdigest()
+
+
+def gerar_hash_arquivo(arquivo, pk, block_size=2**20):
+    return 'P' + md5_arquivo(arquivo, block_size) + \
+        SEPARADOR_HASH_PROPOSICAO + pk
 
 
 class ChoiceWithoutValidationField(forms.ChoiceField):
@@ -744,24 +759,101 @@ def qs_override_django_filter(self):
     return self._qs
 
 
+def update_em_lote(model, campos, valores, batch_size=1000):
+    """
+    Atualiza campos de vários registros de `model` com uma instrução
+    UPDATE ... CASE por lote, sem carregar as instâncias nem disparar
+    save() ou signals.
+
+    :param campos: nome de um campo ou sequência de nomes de campos
+    :param valores: dicionário pk -> novo valor do campo (ou tupla de
+        valores, na ordem de `campos`)
+    :return: número de registros atualizados
+    """
+    from django.db.models import Case, Value, When
+
+    if isinstance(campos, str):
+        campos = (campos, )
+        valores = {pk: (valor, ) for pk, valor in valores.items()}
+
+    output_fields = [model._meta.get_field(campo) for campo in campos]
+    pks = list(valores.keys())
+    total = 0
+    for i in range(0, len(pks), batch_size):
+        lote = pks[i:i + batch_size]
+        total += model.objects.filter(pk__in=lote).update(**{
+            campo: Case(*[When(pk=pk, then=Value(valores[pk][j]))
+                          for pk in lote],
+                        output_field=output_fields[j])
+            for j, campo in enumerate(campos)})
+    return total
+
+
+def reserva_ids(model, quantidade):
+    """
+    Reserva `quantidade` ids da sequência da chave primária de `model`
+    (PostgreSQL), permitindo montar em memória registros que apontam uns
+    para os outros antes de gravá-los com bulk_create.
+    """
+    from django.db import connection
+
+    if not quantidade:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'select nextval(pg_get_serial_sequence(%s, %s)) '
+            'from generate_series(1, %s)',
+            [model._meta.db_table, model._meta.pk.column, quantidade])
+        return [row[0] for row in cursor.fetchall()]
+
+
 def filiacao_data(parlamentar, data_inicio, data_fim=None):
-    from sapl.parlamentares.models import Filiacao
+    """
+    Siglas dos partidos do parlamentar vigentes em data_inicio ou, se
+    data_fim for informada, iniciadas no período, consultadas no índice de
+    filiações em memória.
+    """
+    from sapl.parlamentares.filiacoes import get_indice_filiacoes
 
-    filiacoes_parlamentar = Filiacao.objects.filter(
-        parlamentar=parlamentar)
+    return get_indice_filiacoes().siglas_data(
+        parlamentar, data_inicio, data_fim)
 
-    filiacoes = filiacoes_parlamentar.filter(Q(
-        data__lte=data_inicio,
-        data_desfiliacao__isnull=True) | Q(
-        data__lte=data_inicio,
-        data_desfiliacao__gte=data_inicio))
 
-    if data_fim:
-        filiacoes = filiacoes | filiacoes_parlamentar.filter(
-            data__gte=data_inicio,
-            data__lte=data_fim)
+def filiacoes_data(parlamentares, data_inicio, data_fim=None):
+    """
+    Versão de filiacao_data para um conjunto de parlamentares, resolvida
+    em uma única consulta.
 
-    return ' | '.join([f.partido.sigla for f in filiacoes])
+    :return: dicionário parlamentar_id -> siglas dos partidos (' | ')
+    """
+    from sapl.parlamentares.filiacoes import IndiceFiliacoes
+
+    indice = IndiceFiliacoes(parlamentares)
+    siglas = {}
+    for parlamentar_id in indice.parlamentares:
+        sigla = indice.siglas_data(parlamentar_id, data_inicio, data_fim)
+        if sigla:
+            siglas[parlamentar_id] = sigla
+    return siglas
+
+
+def filiacoes_atuais(parlamentares):
+    """
+    Versão de Parlamentar.filiacao_atual para um conjunto de
+    parlamentares, resolvida em uma única consulta. Parlamentares sem
+    filiação vigente não aparecem no resultado.
+
+    :return: dicionário parlamentar_id -> sigla do partido atual
+    """
+    from sapl.parlamentares.filiacoes import IndiceFiliacoes
+
+    indice = IndiceFiliacoes(parlamentares)
+    atuais = {}
+    for parlamentar_id in indice.parlamentares:
+        partido = indice.partido_atual(parlamentar_id)
+        if partido:
+            atuais[parlamentar_id] = partido.sigla
+    return atuais
 
 
 def parlamentares_ativos(data_inicio, data_fim=None):
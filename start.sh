@@ -106,5 +106,8 @@ if [ $lack_pwd -eq 0 ]; then
 fi
 
 
+# gera os relatórios em PDF fora dos workers do gunicorn
+python3 manage.py gera_relatorios --continuo &
+
 /bin/sh gunicorn_start.sh no-venv &
 /usr/sbin/nginx -g "daemon off;"